@@ -3,164 +3,1286 @@ REST API a gépi tanulási modell predikciójához FastAPI-val.
 A modell az MLflow model registry-ből töltődik be.
 """
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-import mlflow.pyfunc
+import asyncio
+import hmac
+import queue
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional
 import numpy as np
-from mlflow.exceptions import MlflowException
-import mlflow.tracking
+import json
+import math
 import os
 import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, deque
 
-# Configure MLflow properly for Docker
-os.environ["MLFLOW_TRACKING_URI"] = "http://localhost:5000"
-os.environ["MLFLOW_ARTIFACT_ROOT"] = "file:///app/mlruns"
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import compact_model
+from model_loading import (FEATURE_NAMES, FLOAT32_MAX, LOCAL_MODEL_PATH, MODEL_NAME, MODEL_STAGE, ModelHolder,
+                           check_finite, errors, logger, metrics)
+from observability import MetricsMiddleware
+from prediction_log import PredictionLogger
+from profiler import SamplingProfiler
+
+# Egy /predict/batch kérésben megengedett sorok maximális száma
+MAX_BATCH_SIZE = int(os.environ.get("MAX_BATCH_SIZE", "10000"))
+
+# /predict/stream: ennyi sort értékelünk ki egyszerre, és ennél hosszabb sort nem pufferelünk
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", "1000"))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", "65536"))
+# ?buffered=true (félduplex kliensekhez): a kimenet a törzs végéig egy ideiglenes fájlba gyűlik,
+# ennyi bájtig memóriában; a bemenet és a kimenet is legfeljebb STREAM_BUFFERED_MAX_BYTES, felette 413
+STREAM_SPOOL_MEMORY_BYTES = int(os.environ.get("STREAM_SPOOL_MEMORY_BYTES", str(8 * 1024 * 1024)))
+STREAM_BUFFERED_MAX_BYTES = int(os.environ.get("STREAM_BUFFERED_MAX_BYTES", str(64 * 1024 * 1024)))
+STREAM_READ_BYTES = 64 * 1024
+
+# /predict/binary: nyers N x 4 little-endian float32 sorok vagy Arrow IPC stream, uint8 predikciók
+BINARY_CONTENT_TYPE = "application/octet-stream"
+ARROW_STREAM_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+BINARY_ROW_DTYPE = np.dtype("<f4")
+
+# Opcionális micro-batching az egysoros /predict kérésekhez
+MICROBATCH_ENABLED = os.environ.get("MICROBATCH_ENABLED", "false").lower() == "true"
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.environ.get("MICROBATCH_MAX_WAIT_MS", "2"))
+
+
+# Opcionális predikció cache a /predict végponthoz (kulcs: a 4 jellemző, opcionálisan kerekítve)
+PREDICTION_CACHE_ENABLED = os.environ.get("PREDICTION_CACHE_ENABLED", "false").lower() == "true"
+PREDICTION_CACHE_MAX_ENTRIES = int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", "100000"))
+PREDICTION_CACHE_MAX_BYTES = int(os.environ.get("PREDICTION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", "300"))
+PREDICTION_CACHE_ROUND_DIGITS = os.environ.get("PREDICTION_CACHE_ROUND_DIGITS")
+
+# Nem blokkoló predikció-napló (bemenet, kimenet, verzió, késleltetés) rotáló Parquet/NDJSON fájlokba
+PREDICTION_LOG_ENABLED = os.environ.get("PREDICTION_LOG_ENABLED", "false").lower() == "true"
+PREDICTION_LOG_DIR = os.environ.get("PREDICTION_LOG_DIR", "prediction_logs")
+PREDICTION_LOG_FORMAT = os.environ.get("PREDICTION_LOG_FORMAT", "parquet")
+PREDICTION_LOG_CAPACITY = int(os.environ.get("PREDICTION_LOG_CAPACITY", "100000"))
+# Tele buffer esetén: "drop" (eldob és számol) vagy "block" (legfeljebb BLOCK_TIMEOUT_MS-ig vár)
+PREDICTION_LOG_POLICY = os.environ.get("PREDICTION_LOG_POLICY", "drop")
+PREDICTION_LOG_BLOCK_TIMEOUT_MS = float(os.environ.get("PREDICTION_LOG_BLOCK_TIMEOUT_MS", "100"))
+PREDICTION_LOG_FLUSH_ROWS = int(os.environ.get("PREDICTION_LOG_FLUSH_ROWS", "10000"))
+PREDICTION_LOG_FLUSH_SECONDS = float(os.environ.get("PREDICTION_LOG_FLUSH_SECONDS", "1"))
+PREDICTION_LOG_ROTATE_ROWS = int(os.environ.get("PREDICTION_LOG_ROTATE_ROWS", "1000000"))
+# A nyitott Parquet fájl csak lezárás (rotáció) után olvasható, mert a lábléce akkor íródik ki; a drift
+# monitoring (neptuneai_monitoring.py) így legfeljebb egy rotációnyit késik. Ha be van kapcsolva
+# (DRIFT_MONITORING_ENABLED), a rotáció alapértéke egy drift szelet (DRIFT_BUCKET_SECONDS) az óra helyett,
+# különben az ablak (alapból 12 x 300 s) rekordjai jórészt csak késve, "late"-ként érkeznének meg.
+DRIFT_MONITORING_ENABLED = os.environ.get("DRIFT_MONITORING_ENABLED", "false").lower() == "true"
+PREDICTION_LOG_ROTATE_SECONDS = float(os.environ.get(
+    "PREDICTION_LOG_ROTATE_SECONDS",
+    os.environ.get("DRIFT_BUCKET_SECONDS", "300") if DRIFT_MONITORING_ENABLED else "3600"))
+
+
+# Árnyék (shadow) kiértékelés: egy challenger verzió a kiszolgált bemeneteken, a kérés útján kívül.
+# A challenger a SHADOW_VERSION rögzített verzió, vagy a SHADOW_STAGE stage legújabb verziója.
+SHADOW_ENABLED = os.environ.get("SHADOW_ENABLED", "false").lower() == "true"
+SHADOW_STAGE = os.environ.get("SHADOW_STAGE", "Staging")
+SHADOW_VERSION = os.environ.get("SHADOW_VERSION") or None
+# A sorban várakozó tételek (kérések/batch-ek) maximális száma; tele sornál a munka eldobódik
+SHADOW_QUEUE_SIZE = int(os.environ.get("SHADOW_QUEUE_SIZE", "1000"))
+# Egy challenger predict hívásba összefűzött sorok felső korlátja
+SHADOW_MAX_BATCH_ROWS = int(os.environ.get("SHADOW_MAX_BATCH_ROWS", "10000"))
+# Ennyi legutóbbi eltérő predikciót tartunk meg mintaként
+SHADOW_SAMPLE_SIZE = int(os.environ.get("SHADOW_SAMPLE_SIZE", "100"))
+
+# Mintavételező profiler a kérés-úthoz: 1/N kérés (PROFILER_SAMPLE_EVERY, 0 = ki), vagy egy
+# időablak a POST /admin/profile végpontról. A collapsed-stack fájlok a PROFILER_OUTPUT_DIR mappába
+# kerülnek, PROFILER_MLFLOW_EXPERIMENT megadásakor MLflow artifactként is.
+PROFILER_SAMPLE_EVERY = int(os.environ.get("PROFILER_SAMPLE_EVERY", "0"))
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "5"))
+PROFILER_OUTPUT_DIR = os.environ.get("PROFILER_OUTPUT_DIR", "profiles")
+PROFILER_MAX_WINDOW_SECONDS = float(os.environ.get("PROFILER_MAX_WINDOW_SECONDS", "300"))
+PROFILER_DUMP_SECONDS = float(os.environ.get("PROFILER_DUMP_SECONDS", "60"))
+PROFILER_MLFLOW_EXPERIMENT = os.environ.get("PROFILER_MLFLOW_EXPERIMENT") or None
+
+# Az /admin/* végpontok csak ADMIN_TOKEN megadásakor érhetők el, az X-Admin-Token fejléccel
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN") or None
+
+# Metrikák (Prometheus szöveges formátum a /metrics végponton); a registry, az errors és a
+# model_load_seconds a model_loading modulé, itt csak a további metrikák kerülnek bele
+stage_seconds = metrics.histogram(
+    "iris_stage_seconds", "Latency of request path stages (parse, model, array, predict, serialize)", ["stage"])
+request_seconds = metrics.histogram("iris_request_seconds", "Total request latency by route", ["path"])
+responses = metrics.counter("iris_responses_total", "Responses by route and status code", ["path", "status"])
+served_by_source = metrics.counter(
+    "iris_predictions_by_source_total",
+    "Predicted rows by model source branch (local, stage, latest, pinned) or prediction cache (cache)", ["source"])
+microbatch_size = metrics.histogram(
+    "iris_microbatch_size", "Rows per micro-batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+shadow_rows = metrics.counter(
+    "iris_shadow_rows_total", "Shadow-scored rows by outcome (agree, disagree, shed, unavailable, error)", ["outcome"])
+shadow_predict_seconds = metrics.histogram("iris_shadow_predict_seconds", "Challenger predict latency per shadow batch")
+
+model_holder = ModelHolder(MODEL_NAME, MODEL_STAGE)
+
+
+class MicroBatcher:
+    """
+    Az egyidejű egysoros kéréseket egy numpy batch-be gyűjti, és egyetlen
+    model.predict hívással értékeli ki.
+
+    Egy batch akkor indul, ha összegyűlt `max_batch_size` kérés, vagy ha az első
+    kérés óta eltelt `max_wait_ms`; így a hozzáadott várakozás legfeljebb `max_wait_ms`.
+    Leállításkor a még várakozó (sorban álló vagy félbeszakadt batch-ben lévő) hívók hibát kapnak.
+    """
+
+    def __init__(self, holder, max_batch_size=MICROBATCH_MAX_SIZE, max_wait_ms=MICROBATCH_MAX_WAIT_MS):
+        self.holder = holder
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Counter()
+        self._queue = None
+        self._task = None
+        # Az aktuális, a sorból már kivett, de még meg nem válaszolt batch
+        self._batch = []
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        pending, self._batch = self._batch, []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    async def submit(self, row):
+        """Egy sor (4 float) predikciója; megvárja a batch eredményét: (predikció, modell verzió)."""
+        if self._task is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = self._batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _predict(self, data):
+        started = time.perf_counter()
+        loaded = self.holder.get()
+        resolved = time.perf_counter()
+        predictions = np.asarray(loaded.model.predict(data))
+        stage_seconds.observe(resolved - started, "model")
+        stage_seconds.observe(time.perf_counter() - resolved, "predict")
+        served_by_source.inc(loaded.source, amount=len(data))
+        return predictions, loaded.version
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self.batch_sizes[len(batch)] += 1
+            microbatch_size.observe(len(batch))
+            started = time.perf_counter()
+            data = np.array([row for row, _ in batch], dtype=np.float64)
+            stage_seconds.observe(time.perf_counter() - started, "array")
+            try:
+                predictions, version = await run_in_threadpool(self._predict, data)
+            except Exception as e:
+                errors.inc("prediction")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._batch = []
+                continue
+            # A micro-batch egy tételként megy az árnyék kiértékelésre
+            shadow_score(data, predictions, version)
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result((int(prediction), version))
+            self._batch = []
+
+    def stats(self):
+        return {
+            "enabled": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": sum(self.batch_sizes.values()),
+            "requests": sum(size * count for size, count in self.batch_sizes.items()),
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+        }
+
+
+micro_batcher = MicroBatcher(model_holder)
+
+
+class PredictionCache:
+    """
+    Korlátos LRU/TTL cache a predikciókhoz, a jellemző-tuple-re kulcsolva.
+
+    A bejegyzések a modell verziójához tartoznak: ha a kiszolgált verzió megváltozik,
+    a cache automatikusan kiürül. A méretet a bejegyzésszám és a becsült memória is korlátozza.
+    """
+
+    # Egy bejegyzés becsült mérete (kulcs tuple + 4 float + érték tuple + OrderedDict node)
+    ENTRY_BYTES = 400
+
+    def __init__(self, max_entries=PREDICTION_CACHE_MAX_ENTRIES, max_bytes=PREDICTION_CACHE_MAX_BYTES,
+                 ttl_seconds=PREDICTION_CACHE_TTL_SECONDS, round_digits=PREDICTION_CACHE_ROUND_DIGITS):
+        self.max_entries = max(1, min(max_entries, max_bytes // self.ENTRY_BYTES))
+        self.ttl_seconds = ttl_seconds
+        self.round_digits = int(round_digits) if round_digits not in (None, "") else None
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def key(self, row):
+        if self.round_digits is None:
+            return tuple(row)
+        return tuple(round(value, self.round_digits) for value in row)
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, row):
+        """A cache-elt predikció, vagy None."""
+        key = self.key(row)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            prediction, expires_at = entry
+            if self.ttl_seconds > 0 and expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, version, row, prediction):
+        key = self.key(row)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (prediction, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": PREDICTION_CACHE_ENABLED,
+                "model_version": self._version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "estimated_bytes": len(self._entries) * self.ENTRY_BYTES,
+                "ttl_seconds": self.ttl_seconds,
+                "round_digits": self.round_digits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+prediction_cache = PredictionCache()
+prediction_log = PredictionLogger(
+    PREDICTION_LOG_DIR, PREDICTION_LOG_FORMAT, capacity=PREDICTION_LOG_CAPACITY, policy=PREDICTION_LOG_POLICY,
+    block_timeout=PREDICTION_LOG_BLOCK_TIMEOUT_MS / 1000, flush_rows=PREDICTION_LOG_FLUSH_ROWS,
+    flush_seconds=PREDICTION_LOG_FLUSH_SECONDS, rotate_rows=PREDICTION_LOG_ROTATE_ROWS,
+    rotate_seconds=PREDICTION_LOG_ROTATE_SECONDS)
+
+
+class ShadowScorer:
+    """
+    Egy challenger modell kiértékelése ugyanazokon a bemeneteken, amelyeket a Production modell
+    kiszolgált, a kérés útján kívül.
+
+    A kérés csak egy put_nowait-et végez egy korlátos sorba; ha a sor tele van, a munka
+    eldobódik (shed, számolva), a válasz nem lassul. Egy háttérszál a várakozó tételeket egy
+    batch-be fűzi, egyetlen predict hívással értékeli ki, és összeveti a kiszolgált
+    predikciókkal: egyezési arány, a legutóbbi eltérések mintái, a challenger késleltetése.
+    Amíg a challenger nincs betöltve (pl. nincs Staging verzió), a sorok "unavailable"-ként számolódnak.
+    """
+
+    def __init__(self, holder, queue_size=SHADOW_QUEUE_SIZE, max_batch_rows=SHADOW_MAX_BATCH_ROWS,
+                 sample_size=SHADOW_SAMPLE_SIZE):
+        self.holder = holder
+        self.max_batch_rows = max_batch_rows
+        self.samples = deque(maxlen=sample_size)
+        self.outcomes = Counter()
+        self.batches = 0
+        self.items = 0
+        self.predict_seconds = 0.0
+        self.queue_delay_seconds = 0.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, features, predictions, version):
+        """A kiszolgált sorok átadása árnyék kiértékelésre; sosem blokkol. Visszatér: True, ha bekerült."""
+        try:
+            self._queue.put_nowait((features, predictions, version, time.perf_counter()))
+            return True
+        except queue.Full:
+            self._count("shed", len(features))
+            return False
+
+    def _count(self, outcome, rows):
+        with self._lock:
+            self.outcomes[outcome] += rows
+        shadow_rows.inc(outcome, amount=rows)
+
+    def _collect(self):
+        """Az első tétel (legfeljebb 0.5 s várakozással), majd ami még vár, a sorkorlátig."""
+        try:
+            items = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        rows = len(items[0][0])
+        while rows < self.max_batch_rows:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            rows += len(items[-1][0])
+        return items
+
+    def _score(self, items):
+        rows = sum(len(features) for features, _, _, _ in items)
+        challenger = self.holder.current
+        if challenger is None:
+            self._count("unavailable", rows)
+            return
+        data = np.concatenate([np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+                               for features, _, _, _ in items])
+        primary = np.concatenate([np.asarray(predictions).reshape(-1) for _, predictions, _, _ in items])
+        started = time.perf_counter()
+        try:
+            shadow = np.asarray(challenger.model.predict(data))
+        except Exception as e:
+            self._count("error", rows)
+            logger.error("shadow_prediction_failed", extra={"version": challenger.version, "error": str(e)})
+            return
+        predict_seconds = time.perf_counter() - started
+        shadow_predict_seconds.observe(predict_seconds)
+
+        differs = np.flatnonzero(shadow != primary)
+        disagreements = []
+        if len(differs):
+            # Az eltérő sor melyik tételből jött (a kiszolgált verzióhoz)
+            item_of_row = np.repeat(np.arange(len(items)), [len(features) for features, _, _, _ in items])
+            for row in differs[-self.samples.maxlen:] if self.samples.maxlen else []:
+                disagreements.append({"features": data[row].tolist(), "primary": int(primary[row]),
+                                      "challenger": int(shadow[row]),
+                                      "primary_version": items[item_of_row[row]][2],
+                                      "challenger_version": challenger.version, "ts": time.time()})
+        with self._lock:
+            self.batches += 1
+            self.items += len(items)
+            self.predict_seconds += predict_seconds
+            self.queue_delay_seconds += sum(started - submitted for _, _, _, submitted in items)
+            self.samples.extend(disagreements)
+        self._count("agree", rows - len(differs))
+        self._count("disagree", len(differs))
+
+    def _run(self):
+        while not self._stop.is_set():
+            items = self._collect()
+            if items:
+                self._score(items)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """A háttérszál leállítása; a sorban maradt tételek eldobódnak."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            compared = outcomes.get("agree", 0) + outcomes.get("disagree", 0)
+            batches = self.batches
+            return {
+                "enabled": self.running,
+                "challenger": self.holder.info(),
+                "queue_depth": self.queue_depth,
+                "queue_size": self._queue.maxsize,
+                "rows": {outcome: outcomes.get(outcome, 0)
+                         for outcome in ("agree", "disagree", "shed", "unavailable", "error")},
+                "compared": compared,
+                "agreement_rate": outcomes.get("agree", 0) / compared if compared else None,
+                "batches": batches,
+                "challenger_predict_ms_per_batch": 1000 * self.predict_seconds / batches if batches else None,
+                "challenger_predict_us_per_row": 1e6 * self.predict_seconds / compared if compared else None,
+                # A kiszolgálástól a challenger kiértékeléséig eltelt idő, tételenként átlagolva
+                "mean_queue_delay_ms": 1000 * self.queue_delay_seconds / self.items if self.items else None,
+                "disagreement_samples": list(self.samples),
+            }
+
+
+shadow_holder = ModelHolder(MODEL_NAME, SHADOW_STAGE, local_path=None, version=SHADOW_VERSION, fallback_latest=False)
+shadow_scorer = ShadowScorer(shadow_holder)
+
+
+def shadow_score(features, predictions, version):
+    """Kiszolgált predikciók átadása a challenger-nek, ha az árnyék kiértékelés be van kapcsolva."""
+    if shadow_scorer.running:
+        shadow_scorer.submit(features, predictions, version)
+
+
+profiler = SamplingProfiler(
+    PROFILER_OUTPUT_DIR, PROFILER_INTERVAL_MS / 1000, PROFILER_SAMPLE_EVERY, PROFILER_MAX_WINDOW_SECONDS,
+    PROFILER_DUMP_SECONDS, mlflow_experiment=PROFILER_MLFLOW_EXPERIMENT)
+
+
+# Pre-fork workerben a prefork_server állítja be (observability.WorkerMetrics), így a /metrics
+# minden worker számait tartalmazza; egy folyamatos kiszolgálásnál None
+worker_metrics = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    model_holder.start()
+    if worker_metrics is not None:
+        worker_metrics.start()
+    if MICROBATCH_ENABLED:
+        micro_batcher.start()
+    if PREDICTION_LOG_ENABLED:
+        prediction_log.start()
+    if SHADOW_ENABLED:
+        shadow_holder.start()
+        shadow_scorer.start()
+    if PROFILER_SAMPLE_EVERY > 0:
+        profiler.start()
+    yield
+    await micro_batcher.stop()
+    # A maradék rekordok kiírása a fájl lezárásával blokkol, ezért threadpool-ban
+    await run_in_threadpool(prediction_log.stop)
+    shadow_scorer.stop()
+    shadow_holder.stop()
+    # A ki nem írt minták kiírása (és MLflow log) blokkolhat
+    await run_in_threadpool(profiler.stop)
+    model_holder.stop()
+    if worker_metrics is not None:
+        worker_metrics.stop()
 
-# Set a local artifact location to avoid permission errors
-if os.environ.get("DOCKER_MODE") == "true":
-    # Make sure mlruns directory exists and is writable
-    os.makedirs("/app/mlruns", exist_ok=True)
-    # Fix permissions just to be sure
-    if os.path.exists("/app/mlruns"):
-        os.system("chmod -R 777 /app/mlruns")
 
 # FastAPI példány létrehozása
-app = FastAPI(title="Iris ML Model API", description="REST API MLflow modellel", version="1.0")
+app = FastAPI(title="Iris ML Model API", description="REST API MLflow modellel", version="1.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware, request_seconds=request_seconds, stage_seconds=stage_seconds,
+                   responses=responses, profiler=profiler)
+
+metrics.gauge("iris_model_info", "Currently served model (value is always 1)",
+              lambda: {(info["version"], info["source"], info["engine"]): 1}
+              if (info := model_holder.info())["loaded"] else {},
+              ["version", "source", "engine"])
+metrics.gauge("iris_prediction_cache_entries", "Entries in the prediction cache",
+              lambda: {(): prediction_cache.stats()["entries"]})
+metrics.gauge("iris_prediction_cache_events", "Prediction cache events since start",
+              lambda: {(event,): prediction_cache.stats()[key] for event, key in
+                       [("hit", "hits"), ("miss", "misses"), ("eviction", "evictions"),
+                        ("expiration", "expirations"), ("invalidation", "invalidations")]},
+              ["event"])
+metrics.gauge("iris_shadow_queue_depth", "Shadow scoring items waiting in the queue",
+              lambda: {(): shadow_scorer.queue_depth} if shadow_scorer.running else {})
+metrics.gauge("iris_prediction_log_records", "Prediction log records by outcome since start",
+              lambda: {(event,): prediction_log.stats()[event]
+                       for event in ("logged", "written", "dropped", "buffered")},
+              ["event"])
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    """
+    Mint a FastAPI alapértelmezett 422-es válasza, de a nem véges bemeneti értéket (NaN,
+    végtelen) szövegként adja vissza: a JSON nem ábrázolja, és a válasz különben 500-ra futna.
+    """
+    details = [{**error, "input": repr(error["input"])}
+               if isinstance(error.get("input"), float) and not math.isfinite(error["input"]) else error
+               for error in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(details)})
+
+
+def request_start_time(request):
+    """A middleware által rögzített kérés-kezdet (perf_counter), vagy None."""
+    return getattr(request.state, "request_started", None)
+
+
+def observe_parse(request):
+    """A kérés beérkezésétől a handler indulásáig eltelt idő (routing + pydantic validáció)."""
+    started = request_start_time(request)
+    if started is not None:
+        stage_seconds.observe(time.perf_counter() - started, "parse")
+
+
+def log_predictions(features, predictions, version, started, endpoint):
+    """
+    Kiszolgált predikciók a predikció-naplóba, ha be van kapcsolva. A késleltetés a
+    `started` (perf_counter) óta eltelt idő. "block" policy mellett várhat: threadpool-ból hívandó.
+    """
+    if prediction_log.running:
+        latency_ms = (time.perf_counter() - started) * 1000 if started is not None else float("nan")
+        prediction_log.log(features, predictions, version, latency_ms, endpoint)
+
+
+async def log_predictions_async(features, predictions, version, started, endpoint):
+    """Mint log_predictions, de az event loop-ból: ha a napló várakozna, threadpool-ban fut."""
+    if not prediction_log.running:
+        return
+    if prediction_log.policy == "block" and prediction_log.would_block(len(features)):
+        await run_in_threadpool(log_predictions, features, predictions, version, started, endpoint)
+    else:
+        log_predictions(features, predictions, version, started, endpoint)
+
+
+def handler_finished(request, result):
+    """Megjelöli a handler végét, hogy a middleware a válasz szerializálását mérhesse."""
+    request.state.handler_finished = time.perf_counter()
+    return result
+
+# A modell float32-ként hasonlít: NaN, végtelen és float32-ben nem ábrázolható érték nem fogadható el
+Feature = Annotated[float, Field(allow_inf_nan=False, ge=-FLOAT32_MAX, le=FLOAT32_MAX)]
 
 # Bemeneti adatok sémája
 class IrisInput(BaseModel):
-    sepal_length: float
-    sepal_width: float
-    petal_length: float
-    petal_width: float
+    sepal_length: Feature
+    sepal_width: Feature
+    petal_length: Feature
+    petal_width: Feature
+
+# Batch bemenet: vagy soronként (rows), vagy oszloponként (columns)
+class IrisColumns(BaseModel):
+    sepal_length: List[Feature]
+    sepal_width: List[Feature]
+    petal_length: List[Feature]
+    petal_width: List[Feature]
 
-# Modell neve és stage-je
-MODEL_NAME = "IrisDecisionTree"
-MODEL_STAGE = "Production"  # vagy "Staging"
+class IrisBatchInput(BaseModel):
+    rows: Optional[List[IrisInput]] = None
+    columns: Optional[IrisColumns] = None
+    return_proba: bool = False
+
+
+def get_model_or_error():
+    """
+    Visszaadja (loaded, None)-t, vagy hiba esetén (None, JSONResponse)-t.
+    """
+    started = time.perf_counter()
+    try:
+        loaded = model_holder.get()
+    except Exception as e:
+        errors.inc("model_load")
+        logger.exception("model_load_failed", extra={"error": str(e)})
+        return None, JSONResponse(status_code=500, content={"error": f"Failed to load model: {e}"})
+    stage_seconds.observe(time.perf_counter() - started, "model")
+    return loaded, None
+
+
+def predict_proba(model, data):
+    """
+    Osztályvalószínűségek; pyfunc modellnél a mögöttes sklearn modellt használja.
+    """
+    if not hasattr(model, "predict_proba") and hasattr(model, "get_raw_model"):
+        model = model.get_raw_model()
+    if not hasattr(model, "predict_proba"):
+        raise ValueError("The served model does not support predict_proba")
+    return model.predict_proba(data)
+
+
+def batch_to_array(batch):
+    """
+    IrisBatchInput -> N x 4 float64 tömb, FEATURE_NAMES sorrendben.
+    Hibás bemenetnél ValueError-t dob.
+    """
+    if (batch.rows is None) == (batch.columns is None):
+        raise ValueError("Exactly one of 'rows' or 'columns' must be given")
+    if batch.rows is not None:
+        return np.array([[row.sepal_length, row.sepal_width, row.petal_length, row.petal_width] for row in batch.rows],
+                        dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+    columns = [getattr(batch.columns, name) for name in FEATURE_NAMES]
+    if len({len(column) for column in columns}) != 1:
+        raise ValueError("All columns must have the same length")
+    return np.column_stack([np.asarray(column, dtype=np.float64) for column in columns])
+
+
+def predict_one(row, request_started=None):
+    loaded, error = get_model_or_error()
+    if error is not None:
+        return error
+
+    started = time.perf_counter()
+    data = np.array([row])
+    built = time.perf_counter()
+    prediction = int(loaded.model.predict(data)[0])
+    stage_seconds.observe(built - started, "array")
+    stage_seconds.observe(time.perf_counter() - built, "predict")
+    served_by_source.inc(loaded.source)
+    if PREDICTION_CACHE_ENABLED:
+        prediction_cache.put(loaded.version, row, prediction)
+    log_predictions(data, [prediction], loaded.version, request_started, "/predict")
+    shadow_score(data, [prediction], loaded.version)
+    return {"prediction": prediction}
 
 @app.post("/predict")
-def predict(input: IrisInput):
+async def predict(input: IrisInput, request: Request):
     """
     Predikció végpont. Bemenet: IrisInput, Kimenet: predikált osztály.
+    Ha a micro-batching be van kapcsolva, a kérés a MicroBatcher-en keresztül fut.
     """
+    observe_parse(request)
+    row = (input.sepal_length, input.sepal_width, input.petal_length, input.petal_width)
+    version = model_holder.version
+    if PREDICTION_CACHE_ENABLED and version is not None:
+        prediction = prediction_cache.get(version, row)
+        if prediction is not None:
+            served_by_source.inc("cache")
+            await log_predictions_async([row], [prediction], version, request_start_time(request), "/predict")
+            shadow_score([row], [prediction], version)
+            return handler_finished(request, {"prediction": prediction})
+
+    if not micro_batcher.running:
+        return handler_finished(request, await run_in_threadpool(predict_one, row, request_start_time(request)))
     try:
-        print(f"MLflow tracking URI: {mlflow.get_tracking_uri()}")
-        # First, check for local model availability as a fallback
-        local_model_path = "/tmp/iris_model.pkl"
-        
-        if os.path.exists(local_model_path):
-            print(f"Loading model from local path: {local_model_path}")
-            import joblib
-            model = joblib.load(local_model_path)
-        else:
-            # Try to load from MLflow registry
-            try:
-                print(f"Attempting to load model from MLflow registry: models:/{MODEL_NAME}/{MODEL_STAGE}")
-                model = mlflow.pyfunc.load_model(f"models:/{MODEL_NAME}/{MODEL_STAGE}")
-                print(f"Successfully loaded model from MLflow registry")
-            except MlflowException as e:
-                print(f"MLflow model registry error: {e}")
-                # If that fails, try to get the latest version
-                try:
-                    client = mlflow.tracking.MlflowClient()
-                    versions = [int(mv.version) for mv in client.search_model_versions(f"name='{MODEL_NAME}'")]
-                    if not versions:
-                        return JSONResponse(status_code=500, content={"error": f"No versions found for model {MODEL_NAME}"})
-                    
-                    latest_version = max(versions)
-                    print(f"Production model not found, using latest version: {latest_version}")
-                    model = mlflow.pyfunc.load_model(f"models:/{MODEL_NAME}/{latest_version}")
-                except Exception as inner_e:
-                    print(f"Error loading from registry: {inner_e}")
-                    import traceback
-                    traceback.print_exc()
-                    return JSONResponse(status_code=500, content={"error": f"Failed to load model: {inner_e}"})
+        prediction, version = await micro_batcher.submit(row)
     except Exception as e:
-        print(f"Unexpected error in prediction endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        return JSONResponse(status_code=500, content={"error": f"Unexpected error: {e}"})
-    
-    data = np.array([[input.sepal_length, input.sepal_width, input.petal_length, input.petal_width]])
-    prediction = model.predict(data)
-    return {"prediction": int(prediction[0])}
+        logger.error("microbatch_prediction_failed", extra={"error": str(e)})
+        return JSONResponse(status_code=500, content={"error": f"Prediction failed: {e}"})
+    if PREDICTION_CACHE_ENABLED:
+        prediction_cache.put(version, row, prediction)
+    await log_predictions_async([row], [prediction], version, request_start_time(request), "/predict")
+    return handler_finished(request, {"prediction": prediction})
 
-if __name__ == "__main__":
+@app.post("/predict/batch")
+def predict_batch(batch: IrisBatchInput, request: Request):
     """
-    Ha futtatod: python api.py
-    - Betanítja a modellt
-    - Logolja MLflow-ba
-    - Regisztrálja a model registry-be 'IrisDecisionTree' néven
+    Batch predikció végpont: egyetlen model.predict hívás N x 4 tömbön.
+    Kimenet: predikciók (és kérésre valószínűségek) a bemenet sorrendjében.
+    """
+    observe_parse(request)
+    started = time.perf_counter()
+    try:
+        data = batch_to_array(batch)
+        check_finite(data)
+    except ValueError as e:
+        errors.inc("batch_validation")
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    stage_seconds.observe(time.perf_counter() - started, "array")
+    if len(data) > MAX_BATCH_SIZE:
+        errors.inc("batch_too_large")
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Batch size {len(data)} exceeds the maximum of {MAX_BATCH_SIZE} rows"},
+        )
+
+    loaded, error = get_model_or_error()
+    if error is not None:
+        return error
+
+    if len(data) == 0:
+        result = {"predictions": [], "model_version": loaded.version}
+        if batch.return_proba:
+            result["probabilities"] = []
+        return handler_finished(request, result)
+
+    started = time.perf_counter()
+    predictions = np.asarray(loaded.model.predict(data))
+    stage_seconds.observe(time.perf_counter() - started, "predict")
+    served_by_source.inc(loaded.source, amount=len(data))
+    log_predictions(data, predictions, loaded.version, request_start_time(request), "/predict/batch")
+    shadow_score(data, predictions, loaded.version)
+    result = {"predictions": predictions.astype(int).tolist(), "model_version": loaded.version}
+    if batch.return_proba:
+        try:
+            result["probabilities"] = predict_proba(loaded.model, data).tolist()
+        except ValueError as e:
+            errors.inc("proba_unsupported")
+            return JSONResponse(status_code=400, content={"error": str(e)})
+    return handler_finished(request, result)
+
+
+def binary_to_array(body):
+    """
+    Nyers little-endian float32 buffer -> N x 4 csak olvasható nézet, másolás nélkül.
+    Hibás hossznál ValueError-t dob.
+    """
+    row_bytes = BINARY_ROW_DTYPE.itemsize * len(FEATURE_NAMES)
+    if len(body) % row_bytes:
+        raise ValueError(f"Body length {len(body)} is not a multiple of {row_bytes} bytes "
+                         f"(N x {len(FEATURE_NAMES)} little-endian float32)")
+    return np.frombuffer(body, dtype=BINARY_ROW_DTYPE).reshape(-1, len(FEATURE_NAMES))
+
+
+def arrow_to_array(body):
+    """
+    Arrow IPC stream -> N x 4 tömb. Egyetlen fixed_size_list<float32>[4] oszlopnál
+    másolás nélküli nézet; egyébként a FEATURE_NAMES nevű oszlopokból rakja össze.
+    Hibás bemenetnél ValueError-t dob.
+    """
+    import pyarrow as pa
+
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Invalid Arrow IPC stream: {e}")
+    if table.num_columns == 1 and pa.types.is_fixed_size_list(table.schema.field(0).type):
+        column = table.column(0)
+        column = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if column.type.list_size != len(FEATURE_NAMES):
+            raise ValueError(f"Expected fixed_size_list of {len(FEATURE_NAMES)} values per row")
+        if column.null_count:
+            raise ValueError("Rows must not be null")
+        return column.flatten().to_numpy(zero_copy_only=False).reshape(-1, len(FEATURE_NAMES))
+    missing = [name for name in FEATURE_NAMES if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    # A null értékek NaN-ként jönnek, ezeket a finiteness ellenőrzés kiszűri
+    return np.column_stack([table.column(name).to_numpy() for name in FEATURE_NAMES])
+
+
+def predictions_to_uint8(predictions):
+    predictions = np.asarray(predictions)
+    if predictions.size and (predictions.min() < 0 or predictions.max() > np.iinfo(np.uint8).max):
+        raise ValueError("Predicted classes do not fit in uint8; use /predict/batch")
+    return predictions.astype(np.uint8)
+
+
+def uint8_to_arrow(predictions):
+    import pyarrow as pa
+
+    batch = pa.record_batch([pa.array(predictions, type=pa.uint8())], names=["prediction"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def predict_binary_body(body, content_type, request_started=None):
+    """A /predict/binary törzsének dekódolása, ellenőrzése és kiértékelése; Response-t ad vissza."""
+    started = time.perf_counter()
+    try:
+        data = binary_to_array(body) if content_type == BINARY_CONTENT_TYPE else arrow_to_array(body)
+        check_finite(data)
+    except ValueError as e:
+        errors.inc("binary_validation")
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    stage_seconds.observe(time.perf_counter() - started, "array")
+    if len(data) > MAX_BATCH_SIZE:
+        errors.inc("batch_too_large")
+        return JSONResponse(
+            status_code=413,
+            content={"error": f"Batch size {len(data)} exceeds the maximum of {MAX_BATCH_SIZE} rows"},
+        )
+
+    loaded, error = get_model_or_error()
+    if error is not None:
+        return error
+
+    started = time.perf_counter()
+    predictions = loaded.model.predict(data) if len(data) else np.empty(0, dtype=np.uint8)
+    stage_seconds.observe(time.perf_counter() - started, "predict")
+    served_by_source.inc(loaded.source, amount=len(data))
+    try:
+        predictions = predictions_to_uint8(predictions)
+    except ValueError as e:
+        errors.inc("prediction")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    log_predictions(data, predictions, loaded.version, request_started, "/predict/binary")
+    shadow_score(data, predictions, loaded.version)
+    if content_type == BINARY_CONTENT_TYPE:
+        content = predictions.tobytes()
+    else:
+        content = uint8_to_arrow(predictions)
+    return Response(content, media_type=content_type, headers={"X-Model-Version": str(loaded.version)})
+
+
+@app.post("/predict/binary")
+async def predict_binary(request: Request):
+    """
+    Bináris batch predikció belső hívóknak, JSON kódolás és pydantic validáció nélkül.
+    Bemenet: application/octet-stream (N x 4 little-endian float32, soronként FEATURE_NAMES
+    sorrendben) vagy application/vnd.apache.arrow.stream.
+    Kimenet ugyanabban a formátumban: N darab uint8 predikció, ill. egy "prediction" (uint8)
+    oszlopú Arrow stream; a modell verziója az X-Model-Version fejlécben.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in (BINARY_CONTENT_TYPE, ARROW_STREAM_CONTENT_TYPE):
+        errors.inc("binary_validation")
+        return JSONResponse(status_code=415, content={
+            "error": f"Content-Type must be {BINARY_CONTENT_TYPE} or {ARROW_STREAM_CONTENT_TYPE}"})
+    body = await request.body()
+    observe_parse(request)
+    return handler_finished(request, await run_in_threadpool(predict_binary_body, body, content_type,
+                                                               request_start_time(request)))
+
+
+def parse_ndjson_row(line):
+    """
+    Egy NDJSON sor -> 4 float (FEATURE_NAMES sorrendben). Hibás sornál ValueError-t dob.
+    """
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    row = []
+    for name in FEATURE_NAMES:
+        value = record.get(name)
+        if (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)
+                or abs(value) > FLOAT32_MAX):
+            raise ValueError(f"Field '{name}' must be a finite number")
+        row.append(float(value))
+    return row, record.get("id")
+
+
+async def iter_ndjson_lines(chunks, max_line_bytes=STREAM_MAX_LINE_BYTES):
+    """
+    Bájt-darabokból teljes sorokat ad vissza: (sorszám, sor vagy None, hibaüzenet vagy None).
+    A túl hosszú sort nem puffereli, hanem hibaként jelzi, így a memória korlátos marad.
+    """
+    too_long = f"Line exceeds {max_line_bytes} bytes"
+    buffer = b""
+    line_number = 0
+    skipping = False
+    async for chunk in chunks:
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_number += 1
+            if skipping or len(line) > max_line_bytes:
+                skipping = False
+                yield line_number, None, too_long
+            elif line.strip():
+                yield line_number, line, None
+        if len(buffer) > max_line_bytes:
+            skipping = True
+            buffer = b""
+    if skipping:
+        yield line_number + 1, None, too_long
+    elif buffer.strip():
+        yield line_number + 1, buffer, None
+
+
+def score_stream_chunk(pending):
+    """
+    Egy darab (sorszám, sor, hiba) elem kiértékelése egyetlen predict hívással;
+    NDJSON kimenet a bemenet sorrendjében.
+    """
+    rows, scored, results = [], [], []
+    for line_number, line, error in pending:
+        result = {"line": line_number}
+        if error is None:
+            try:
+                row, row_id = parse_ndjson_row(line)
+                if row_id is not None:
+                    result["id"] = row_id
+                rows.append(row)
+                scored.append(result)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            errors.inc("stream_line")
+            result["error"] = error
+        results.append(result)
+
+    if rows:
+        try:
+            loaded = model_holder.get()
+        except Exception as e:
+            # Pl. a modell frissítése közben elérhetetlen registry: a darab sorai hibát kapnak, a stream folytatódik
+            errors.inc("model_load")
+            logger.exception("model_load_failed", extra={"error": str(e)})
+            for result in scored:
+                result["error"] = f"Failed to load model: {e}"
+            return "".join(json.dumps(result) + "\n" for result in results)
+        started = time.perf_counter()
+        data = np.array(rows, dtype=np.float64)
+        predictions = np.asarray(loaded.model.predict(data))
+        stage_seconds.observe(time.perf_counter() - started, "predict")
+        served_by_source.inc(loaded.source, amount=len(rows))
+        # Streamnél a késleltetés a darab kiértékelésének ideje
+        log_predictions(data, predictions, loaded.version, started, "/predict/stream")
+        shadow_score(data, predictions, loaded.version)
+        for result, prediction in zip(scored, predictions):
+            result["prediction"] = int(prediction)
+    return "".join(json.dumps(result) + "\n" for result in results)
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse, amely nem figyel külön a kliens bontására.
+    A body iterátor maga olvassa a kérés törzsét (request.stream()), és a
+    StreamingResponse disconnect-figyelője elvenné előle az üzeneteket.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+class StreamTooLarge(Exception):
+    pass
+
+
+async def limit_stream(chunks, max_bytes):
+    """A kérés törzsének darabjai; StreamTooLarge, amint a beolvasott bájtok száma meghaladja max_bytes-ot."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise StreamTooLarge()
+        yield chunk
+
+
+def spool_stream_chunk(spool, pending):
+    """Egy darab kiértékelése és a kimenet hozzáfűzése a spool fájlhoz. Visszatér: a spool mérete."""
+    spool.write(score_stream_chunk(pending).encode())
+    return spool.tell()
+
+
+def iter_spool(spool, chunk_bytes=STREAM_READ_BYTES):
+    """A spool fájl tartalma az elejéről, darabokban; a végén (vagy bontáskor) a fájl lezárul."""
+    try:
+        spool.seek(0)
+        while chunk := spool.read(chunk_bytes):
+            yield chunk
+    finally:
+        spool.close()
+
+
+def stream_too_large():
+    errors.inc("stream_too_large")
+    return JSONResponse(status_code=413, content={
+        "error": f"Buffered stream exceeds {STREAM_BUFFERED_MAX_BYTES} bytes; "
+                 "split the upload or use a full-duplex client without buffered=true"})
+
+
+async def buffered_stream_response(request):
+    """
+    ?buffered=true: a kimenet a törzs teljes beolvasásáig egy ideiglenes fájlba gyűlik
+    (STREAM_SPOOL_MEMORY_BYTES-ig memóriában), és csak utána streamelődik. A bemenet és a kimenet
+    is legfeljebb STREAM_BUFFERED_MAX_BYTES; ismert Content-Length esetén a 413 olvasás előtt jön.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > STREAM_BUFFERED_MAX_BYTES:
+        return stream_too_large()
+
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_MEMORY_BYTES)
+    try:
+        pending = []
+        async for line_number, line, error in iter_ndjson_lines(limit_stream(request.stream(),
+                                                                             STREAM_BUFFERED_MAX_BYTES)):
+            pending.append((line_number, line, error))
+            if len(pending) >= STREAM_CHUNK_ROWS:
+                size = await run_in_threadpool(spool_stream_chunk, spool, pending)
+                pending = []
+                if size > STREAM_BUFFERED_MAX_BYTES:
+                    raise StreamTooLarge()
+        if pending:
+            await run_in_threadpool(spool_stream_chunk, spool, pending)
+    except StreamTooLarge:
+        spool.close()
+        return stream_too_large()
+    except BaseException:
+        spool.close()
+        raise
+    return StreamingResponse(iter_spool(spool), media_type="application/x-ndjson")
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request, buffered: bool = False):
+    """
+    Streaming NDJSON predikció: soronként egy IrisInput-szerű JSON objektum (opcionális "id"-vel).
+    A bemenetet STREAM_CHUNK_ROWS soros darabokban olvassa és értékeli ki, a kimenet
+    NDJSON, soronként {"line", "id"?, "prediction"} vagy {"line", "error"}, darabonként,
+    ahogy elkészül (a feltöltés még tart). A hibás sorok nem szakítják meg a streamet.
+
+    A feltöltés alatt nem olvasó (félduplex) kliens nagy törzsnél elakadna (mindkét irány socket
+    puffere megtelik); ezek ?buffered=true-val kérhetik, hogy a válasz csak a törzs után induljon.
+    """
+    _, error = await run_in_threadpool(get_model_or_error)
+    if error is not None:
+        return error
+    if buffered:
+        return await buffered_stream_response(request)
+
+    async def results():
+        pending = []
+        async for line_number, line, error in iter_ndjson_lines(request.stream()):
+            pending.append((line_number, line, error))
+            if len(pending) >= STREAM_CHUNK_ROWS:
+                yield await run_in_threadpool(score_stream_chunk, pending)
+                pending = []
+        if pending:
+            yield await run_in_threadpool(score_stream_chunk, pending)
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/predict/microbatch/stats")
+def microbatch_stats():
+    """
+    A micro-batcher beállításai és a batch-méretek eloszlása (hangoláshoz).
+    Több worker esetén csak a válaszoló worker (worker_pid) adatai.
+    """
+    return {"worker_pid": os.getpid(), **micro_batcher.stats()}
+
+@app.get("/predict/log/stats")
+def prediction_log_stats():
+    """
+    A predikció-napló számlálói: naplózott, kiírt, eldobott és bufferelt rekordok, fájlok.
+    Több worker esetén csak a válaszoló worker (worker_pid) adatai.
+    """
+    if not prediction_log.running:
+        return {"worker_pid": os.getpid(), "enabled": False}
+    return {"worker_pid": os.getpid(), **prediction_log.stats()}
+
+@app.get("/predict/shadow/stats")
+def shadow_stats():
+    """
+    Árnyék kiértékelés: a challenger modell adatai, egyezési arány, eldobott (shed) sorok,
+    a challenger késleltetése és a legutóbbi eltérő predikciók.
+    Több worker esetén csak a válaszoló worker (worker_pid) adatai.
+    """
+    return {"worker_pid": os.getpid(), **shadow_scorer.stats()}
+
+@app.get("/predict/cache/stats")
+def cache_stats():
+    """
+    A predikció cache találat/tévesztés/kiürítés számlálói és mérete.
+    Több worker esetén csak a válaszoló worker (worker_pid) adatai.
+    """
+    return {"worker_pid": os.getpid(), **prediction_cache.stats()}
+
+def admin_error(request):
+    """
+    None, ha a kérés jogosult az /admin/* végpontokra; egyébként hibaválasz:
+    404, ha nincs ADMIN_TOKEN (alapértelmezés), 403, ha az X-Admin-Token fejléc hiányzik vagy hibás.
+    """
+    if ADMIN_TOKEN is None:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        errors.inc("admin_auth")
+        return JSONResponse(status_code=403, content={"error": "Invalid or missing X-Admin-Token"})
+    return None
+
+@app.post("/admin/profile")
+def start_profile(request: Request, seconds: float = 30.0, mlflow: bool = False):
+    """
+    Minden kérés profilozása `seconds` másodpercig (legfeljebb PROFILER_MAX_WINDOW_SECONDS).
+    Az ablak végén a collapsed-stack fájl a PROFILER_OUTPUT_DIR mappába kerül (mlflow=true: MLflow-ba is).
+    Több worker esetén csak a kérést fogadó workert (worker_pid) profilozza.
+    Csak ADMIN_TOKEN-nel (X-Admin-Token fejléc).
+    """
+    error = admin_error(request)
+    if error is not None:
+        return error
+    window = profiler.start_window(seconds, mlflow)
+    return {"worker_pid": os.getpid(), "window_seconds": window, **profiler.stats()}
+
+@app.get("/admin/profile")
+def profile_status(request: Request):
+    """
+    A profiler állapota: mód, hátralévő ablak, minták száma, a legutóbb kiírt profil fájlok.
+    Több worker esetén csak a válaszoló worker (worker_pid) profilere.
+    Csak ADMIN_TOKEN-nel (X-Admin-Token fejléc).
+    """
+    error = admin_error(request)
+    if error is not None:
+        return error
+    return {"worker_pid": os.getpid(), **profiler.stats()}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """
+    Metrikák Prometheus szöveges formátumban: szakaszonkénti késleltetés hisztogramok,
+    hibák típusonként, kiszolgált sorok modell-forrás szerint, cache és micro-batch adatok.
+    Pre-fork módban az összes worker mintái, worker_pid labellel (összesítés: sum without (worker_pid)).
+    """
+    text = metrics.render() if worker_metrics is None else worker_metrics.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/model")
+def model_info():
+    """
+    A kiszolgált modell adatai: verzió, forrás, betöltés ideje és időtartama.
+    """
+    return model_holder.info()
+
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: a folyamat válaszol. Nem nyúl a modellhez és nem fut threadpool-ban.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: csak akkor 200, ha a modell be van töltve és a bemelegítő predikció lefutott
+    (a ModelHolder csak bemelegített modellt tesz kiszolgálásba). Egyébként 503.
+    """
+    current = model_holder.current
+    if current is None:
+        return JSONResponse(status_code=503, content={"ready": False, "model_version": None})
+    return {
+        "ready": True,
+        "model_version": current.version,
+        "model_source": current.source,
+        "last_reload": current.loaded_at,
+        "warmup_seconds": current.warmup_seconds,
+    }
+
+
+def train_model(sweep=None, n_iter=20, workers=None, budget_seconds=None, cv=5, serial_baseline=False, tags=None,
+                raise_errors=False):
+    """
+    Betanítja a modellt (opcionálisan párhuzamos hiperparaméter-kereséssel: sweep="grid"|"random"),
+    logolja MLflow-ba, és regisztrálja 'IrisDecisionTree' néven (pontosan egy új verzió).
+    A tags az MLflow run-ra kerül. Visszatér: összegzés (run_id, version, accuracy, ...);
+    MLflow hiba esetén kiírja a hibát és a version None, hacsak raise_errors nem igaz.
     """
     import pandas as pd
-    from sklearn.datasets import load_iris
-    from sklearn.model_selection import train_test_split
     from sklearn.tree import DecisionTreeClassifier
     from sklearn.metrics import accuracy_score
     import mlflow
     import mlflow.sklearn
-    from mlflow.exceptions import MlflowException
-
-    # Adatok betöltése
-    iris = load_iris()
-    X = pd.DataFrame(iris.data, columns=iris.feature_names)
-    y = pd.Series(iris.target, name='target')
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)    # Modell tanítása
-    clf = DecisionTreeClassifier(random_state=42)
-    clf.fit(X_train, y_train)
-    y_pred = clf.predict(X_test)
-    acc = accuracy_score(y_test, y_pred)
-    
+    from dataset_cache import iris_split
+    from hyperparameter_sweep import register_and_promote, train_and_register
+
+    # Docker: az artifact mappát csak a tanítás írja; a jogosultságokat az image build
+    # állítja be, így itt (és import közben) nem járjuk be rekurzívan a kötetet
+    if os.environ.get("DOCKER_MODE") == "true":
+        os.makedirs("/app/mlruns", exist_ok=True)
+
+    # Adatok betöltése: a felosztás a tartalom-címzett cache-ből jön (memória-leképezett .npy)
+    split = iris_split(test_size=0.2, random_state=42)
+    print(f"Dataset split {split.key} ({'cache hit' if split.hit else 'cache miss'})")
+    X_train = pd.DataFrame(split.X_train, columns=split.feature_names)
+    X_test = pd.DataFrame(split.X_test, columns=split.feature_names)
+    y_train = pd.Series(split.y_train, name='target')
+    y_test = pd.Series(split.y_test, name='target')
+    summary = {"dataset_key": split.key, "run_id": None, "version": None}
+
     # MLflow logolás - bizonyosodjunk meg róla, hogy a helyes könyvtárat használjuk
     try:
         # Explicitly set the artifact location to avoid Windows path issues
         mlflow.set_tracking_uri(os.environ.get("MLFLOW_TRACKING_URI", "http://localhost:5000"))
         artifact_location = os.environ.get("MLFLOW_ARTIFACT_ROOT", "file:///app/mlruns")
-        
+
         print(f"Using MLflow tracking URI: {mlflow.get_tracking_uri()}")
         print(f"Using artifact location: {artifact_location}")
-        
-        with mlflow.start_run() as run:            # Save model to local disk first for direct access
-            import joblib
-            local_model_path = "/tmp/iris_model.pkl"
-            print(f"Saving model to local path: {local_model_path}")
-            joblib.dump(clf, local_model_path)
-            
-            # Log metrics and params first
-            mlflow.log_metric("accuracy", acc)
-            mlflow.log_param("model_type", "DecisionTreeClassifier")
-            
-            # Make sure the artifact path is correctly configured
-            os.environ["MLFLOW_TRACKING_DIR"] = "/app/mlruns"
-            
-            # Log model file as artifact
-            print("Logging model to MLflow")
-            mlflow.sklearn.log_model(
-                sk_model=clf,
-                artifact_path="model",
-                registered_model_name=MODEL_NAME  # Directly register the model
-            )
-            
-            model_uri = f"runs:/{run.info.run_id}/model"
-            print(f"Model logolva: {model_uri}")
-            
-            # Modell regisztrálása a registry-be
-            try:
-                result = mlflow.register_model(model_uri, MODEL_NAME)
-                print(f"Model regisztrálva: {MODEL_NAME}")
-                
-                # Automatikusan állítsuk be a Production stage-et a legújabb verzióra
-                client = mlflow.tracking.MlflowClient()
-                client.transition_model_version_stage(
-                    name=MODEL_NAME,
-                    version=result.version,
-                    stage="Production"
-                )
-                print(f"Modell verzió {result.version} beállítva mint Production")
-            except Exception as reg_error:
-                print(f"Modell regisztráció hiba: {reg_error}")
+
+        if sweep:
+            summary.update(train_and_register(split.X_train, split.y_train, split.X_test, split.y_test, MODEL_NAME,
+                                              MODEL_STAGE, LOCAL_MODEL_PATH, sweep, n_iter, workers, budget_seconds,
+                                              cv, serial_baseline=serial_baseline, tags=tags))
+            print(json.dumps(summary, indent=2, default=str))
+        else:
+            # Modell tanítása
+            clf = DecisionTreeClassifier(random_state=42)
+            clf.fit(X_train, y_train)
+            acc = accuracy_score(y_test, clf.predict(X_test))
+            summary["accuracy"] = acc
+
+            with mlflow.start_run() as run:
+                summary["run_id"] = run.info.run_id
+                # Save model to local disk first for direct access
+                import joblib
+                print(f"Saving model to local path: {LOCAL_MODEL_PATH}")
+                joblib.dump(clf, LOCAL_MODEL_PATH)
+
+                mlflow.log_metrics({"accuracy": acc})
+                mlflow.log_params({"model_type": "DecisionTreeClassifier"})
+                if tags:
+                    mlflow.set_tags(tags)
+
+                # Log model file as artifact; a regisztráció egyszer, alább történik.
+                # A kompakt (mmap) artifact a modell extra_files/ könyvtárába és a pickle mellé is kiíródik.
+                print("Logging model to MLflow")
+                with tempfile.TemporaryDirectory() as tmp:
+                    compact = compact_model.export_sklearn(clf, tmp, LOCAL_MODEL_PATH, model_name=MODEL_NAME,
+                                                           run_id=run.info.run_id)
+                    model_info = mlflow.sklearn.log_model(sk_model=clf, artifact_path="model",
+                                                          serialization_format="cloudpickle", extra_files=[compact])
+                print(f"Model logolva: {model_info.model_uri}")
+
+                # Modell regisztrálása a registry-be és a Production stage beállítása
+                try:
+                    summary["version"] = register_and_promote(model_info.model_uri, MODEL_NAME, MODEL_STAGE)
+                    print(f"Modell verzió {summary['version']} beállítva mint {MODEL_STAGE}")
+                except Exception as reg_error:
+                    if raise_errors:
+                        raise
+                    print(f"Modell regisztráció hiba: {reg_error}")
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"MLflow hiba: {e}")
         print(f"Error during MLflow operations: {e}")
         # Log the exact traceback for better debugging
@@ -168,3 +1290,31 @@ if __name__ == "__main__":
         traceback.print_exc()
 
     print("Tanítás, logolás, regisztráció kész.")
+    return summary
+
+
+if __name__ == "__main__":
+    """
+    Ha futtatod: python api.py
+    - Betanítja a modellt (opcionálisan párhuzamos hiperparaméter-kereséssel: --sweep grid|random)
+    - Logolja MLflow-ba
+    - Regisztrálja a model registry-be 'IrisDecisionTree' néven (pontosan egy új verzió)
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train, log and register the IrisDecisionTree model")
+    parser.add_argument("--sweep", choices=["grid", "random"], default=os.environ.get("TRAINING_SWEEP") or None,
+                        help="Hyperparameter search instead of a single default tree (default: $TRAINING_SWEEP)")
+    parser.add_argument("--n-iter", type=int, default=int(os.environ.get("TRAINING_SWEEP_ITER", "20")),
+                        help="Candidates for the random search")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TRAINING_SWEEP_WORKERS", "0")) or None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--budget-seconds", type=float,
+                        default=float(os.environ.get("TRAINING_SWEEP_BUDGET_SECONDS", "0")) or None,
+                        help="Wall-clock budget for the search; the best finished candidate wins")
+    parser.add_argument("--cv", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--serial-baseline", action="store_true",
+                        help="Also run the candidates serially and report the measured speedup")
+    args = parser.parse_args()
+
+    train_model(args.sweep, args.n_iter, args.workers, args.budget_seconds, args.cv, args.serial_baseline)
@@ -0,0 +1,191 @@
+"""
+Offline tömeges predikció az IrisDecisionTree modellel, HTTP réteg nélkül.
+
+A Production verziót egyszer oldja fel, a bemenetet (CSV, NDJSON vagy Parquet)
+memóriában korlátos darabokban olvassa, a darabokat egy process pool-ban értékeli ki
+(minden worker egyszer tölti be a modellt), és a kimenetet a bemenet sorrendjében írja.
+
+Használat:
+    python src/batch_score.py input.csv output.csv --id-column row_id --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from model_loading import FEATURE_NAMES, MODEL_NAME, MODEL_STAGE, ModelHolder, check_finite
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson", ".parquet": "parquet"}
+
+# A worker folyamatban egyszer betöltött modell
+_worker_model = None
+
+
+def detect_format(path, explicit=None):
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot detect format of {path}; use --input-format/--output-format")
+    return FORMATS[extension]
+
+
+def read_chunks(path, file_format, chunk_rows, columns):
+    """A bemenet DataFrame darabokban; egyszerre legfeljebb chunk_rows sor van memóriában."""
+    if file_format == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_rows, usecols=columns)
+    elif file_format == "ndjson":
+        for chunk in pd.read_json(path, lines=True, chunksize=chunk_rows):
+            yield chunk[columns]
+    elif file_format == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported input format: {file_format}")
+
+
+class ChunkWriter:
+    """Sorrendben kapott eredmény-darabok írása CSV, NDJSON vagy Parquet fájlba."""
+
+    def __init__(self, path, file_format):
+        self.path = path
+        self.format = file_format
+        self._file = None
+        self._parquet_writer = None
+
+    def write(self, frame):
+        if self.format == "csv":
+            header = self._file is None
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+            frame.to_csv(self._file, header=header, index=False)
+        elif self.format == "ndjson":
+            if self._file is None:
+                self._file = open(self.path, "w")
+            text = frame.to_json(orient="records", lines=True)
+            if text and not text.endswith("\n"):
+                text += "\n"
+            self._file.write(text)
+        elif self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            raise ValueError(f"Unsupported output format: {self.format}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def _use_tracking_uri(tracking_uri):
+    # Az mlflow csak a registry feloldáshoz és a models:/, runs:/ URI-khoz kell, a lokális pickle-höz nem
+    import mlflow
+    mlflow.set_tracking_uri(tracking_uri)
+
+
+def _init_worker(tracking_uri, source, version, uri):
+    global _worker_model
+    if source != "local":
+        _use_tracking_uri(tracking_uri)
+    _worker_model = ModelHolder(MODEL_NAME, MODEL_STAGE).load(source, version, uri).model
+
+
+def _score(data):
+    # A modell saját címke-dtype-ja marad (pl. 127 feletti vagy szöveges osztálycímkék)
+    return np.asarray(_worker_model.predict(data))
+
+
+def score_file(input_path, output_path, input_format=None, output_format=None, id_column=None,
+               chunk_rows=100_000, workers=None, tracking_uri=None, model_uri=None):
+    """
+    A teljes bemenet kiértékelése. Visszatér: (sorok száma, modell verzió).
+    """
+    tracking_uri = tracking_uri or os.environ.get("MLFLOW_TRACKING_URI", "http://localhost:5000")
+    if model_uri and model_uri.endswith(".pkl"):
+        source, version, uri = "local", model_uri, model_uri
+    elif model_uri:
+        _use_tracking_uri(tracking_uri)
+        source, version, uri = "uri", model_uri, model_uri
+    else:
+        # Egyszeri feloldás; minden worker ugyanezt a verziót tölti be
+        _use_tracking_uri(tracking_uri)
+        source, version, uri = ModelHolder(MODEL_NAME, MODEL_STAGE).resolve()
+    print(f"Scoring with {MODEL_NAME} version {version} ({uri})")
+
+    input_format = detect_format(input_path, input_format)
+    writer = ChunkWriter(output_path, detect_format(output_path, output_format))
+    columns = FEATURE_NAMES + ([id_column] if id_column else [])
+    workers = workers or os.cpu_count() or 1
+    # Legfeljebb ennyi darab van egyszerre úton, így a memória korlátos marad
+    max_in_flight = 2 * workers
+    rows = rows_read = 0
+
+    def write_result(ids, future):
+        nonlocal rows
+        frame = pd.DataFrame({"prediction": future.result()})
+        if ids is not None:
+            frame.insert(0, id_column, ids)
+        writer.write(frame)
+        rows += len(frame)
+
+    in_flight = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tracking_uri, source, version, uri)) as executor:
+            for chunk in read_chunks(input_path, input_format, chunk_rows, columns):
+                data = chunk[FEATURE_NAMES].to_numpy(dtype=np.float64)
+                # Az üres mező NaN-ként jön; nem sorolódhat be csendben egy osztályba
+                check_finite(data, rows_read)
+                rows_read += len(data)
+                ids = chunk[id_column].to_numpy() if id_column else None
+                in_flight.append((ids, executor.submit(_score, data)))
+                while len(in_flight) >= max_in_flight:
+                    write_result(*in_flight.popleft())
+            while in_flight:
+                write_result(*in_flight.popleft())
+    finally:
+        writer.close()
+    return rows, version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline bulk scoring with the IrisDecisionTree model")
+    parser.add_argument("input", help="CSV, NDJSON or Parquet input with the feature columns " + ", ".join(FEATURE_NAMES))
+    parser.add_argument("output", help="CSV, NDJSON or Parquet output path")
+    parser.add_argument("--input-format", choices=["csv", "ndjson", "parquet"])
+    parser.add_argument("--output-format", choices=["csv", "ndjson", "parquet"])
+    parser.add_argument("--id-column", help="Column copied unchanged from the input to the output")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per chunk (default: 100000)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--tracking-uri", help="MLflow tracking URI (default: $MLFLOW_TRACKING_URI)")
+    parser.add_argument("--model-uri", help="Score with this model URI instead of resolving the Production version")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        rows, version = score_file(args.input, args.output, args.input_format, args.output_format, args.id_column,
+                                   args.chunk_rows, args.workers, args.tracking_uri, args.model_uri)
+    except ValueError as e:
+        parser.exit(1, f"Scoring failed: {e}\n")
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"rows": rows, "model_version": version, "seconds": round(elapsed, 3),
+                      "rows_per_second": round(rows / elapsed) if elapsed > 0 else None}))
+
+
+if __name__ == "__main__":
+    main()
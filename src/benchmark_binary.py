@@ -0,0 +1,186 @@
+"""
+A bináris /predict/binary és a JSON /predict/batch végpont összehasonlítása.
+
+Ellenőrzi, hogy minden formátum (JSON rows, JSON columns, octet-stream, Arrow IPC)
+ugyanazt a predikciót adja ugyanarra a bemenetre, majd batch-méretenként méri a
+kérés-válasz időt (kliens oldali kódolással/dekódolással együtt) és a payload méretét.
+
+Alapból in-process fut (ASGI, hálózat nélkül) egy ideiglenesen betanított modellel;
+--url megadásával egy futó szervert mér HTTP-n keresztül.
+
+Használat:
+    python src/benchmark_binary.py --batch-sizes 1,64,1000,10000
+    python src/benchmark_binary.py --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+OCTET_STREAM = "application/octet-stream"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def make_rows(n, seed=0):
+    """Véletlen sorok az Iris tartományban; float32-ben pontosan ábrázolható értékek."""
+    rng = np.random.default_rng(seed)
+    low, high = np.array([4.3, 2.0, 1.0, 0.1]), np.array([7.9, 4.4, 6.9, 2.5])
+    return rng.uniform(low, high, size=(n, 4)).round(1).astype("<f4")
+
+
+def arrow_payload(rows):
+    import pyarrow as pa
+
+    values = pa.array(rows.ravel(), type=pa.float32())
+    batch = pa.record_batch([pa.FixedSizeListArray.from_arrays(values, 4)], names=["features"])
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def arrow_predictions(content):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(content).read_all().column("prediction").to_numpy()
+
+
+# Formátumonként: (végpont, kérés összeállítása, válasz dekódolása)
+FORMATS = {
+    "json_rows": (
+        "/predict/batch",
+        lambda rows: {"content": json.dumps({"rows": [dict(zip(FEATURE_NAMES, map(float, row))) for row in rows]}),
+                      "headers": {"content-type": "application/json"}},
+        lambda response: np.asarray(response.json()["predictions"]),
+    ),
+    "json_columns": (
+        "/predict/batch",
+        lambda rows: {"content": json.dumps({"columns": {name: rows[:, i].astype(float).tolist()
+                                                         for i, name in enumerate(FEATURE_NAMES)}}),
+                      "headers": {"content-type": "application/json"}},
+        lambda response: np.asarray(response.json()["predictions"]),
+    ),
+    "octet_stream": (
+        "/predict/binary",
+        lambda rows: {"content": np.ascontiguousarray(rows, dtype="<f4").tobytes(),
+                      "headers": {"content-type": OCTET_STREAM}},
+        lambda response: np.frombuffer(response.content, dtype=np.uint8),
+    ),
+    "arrow": (
+        "/predict/binary",
+        lambda rows: {"content": arrow_payload(rows), "headers": {"content-type": ARROW_STREAM}},
+        lambda response: arrow_predictions(response.content),
+    ),
+}
+
+
+async def call(client, fmt, rows):
+    path, encode, decode = FORMATS[fmt]
+    request = encode(rows)
+    response = await client.post(path, **request)
+    response.raise_for_status()
+    return decode(response), len(request["content"]), len(response.content)
+
+
+async def check_equal(client, n=5000):
+    """Minden formátum ugyanazt adja-e; visszatér: {formátum: egyezik}."""
+    rows = make_rows(n, seed=1)
+    reference, _, _ = await call(client, "json_rows", rows)
+    results = {}
+    for fmt in FORMATS:
+        predictions, _, _ = await call(client, fmt, rows)
+        results[fmt] = bool(np.array_equal(predictions.astype(np.int64), reference.astype(np.int64)))
+    return results
+
+
+async def measure(client, fmt, rows, min_seconds):
+    latencies = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_seconds or len(latencies) < 5:
+        t0 = time.perf_counter()
+        _, request_bytes, response_bytes = await call(client, fmt, rows)
+        latencies.append(time.perf_counter() - t0)
+    p50 = statistics.median(latencies)
+    return {
+        "p50_ms": round(p50 * 1000, 3),
+        "rows_per_second": round(len(rows) / p50),
+        "request_bytes": request_bytes,
+        "response_bytes": response_bytes,
+    }
+
+
+async def run(client, batch_sizes, min_seconds):
+    report = {"same_predictions": await check_equal(client), "batches": {}}
+    for size in batch_sizes:
+        rows = make_rows(size)
+        report["batches"][size] = {fmt: await measure(client, fmt, rows, min_seconds) for fmt in FORMATS}
+    return report
+
+
+async def run_in_process(batch_sizes, min_seconds):
+    import httpx
+    import joblib
+    from sklearn.datasets import load_iris
+    from sklearn.tree import DecisionTreeClassifier
+
+    with tempfile.TemporaryDirectory() as root:
+        iris = load_iris()
+        model_path = os.path.join(root, "model.pkl")
+        joblib.dump(DecisionTreeClassifier(random_state=42).fit(iris.data, iris.target), model_path)
+        os.environ.update(LOCAL_MODEL_PATH=model_path, API_LOG_ENABLED="false", MODEL_REFRESH_SECONDS="0",
+                          MAX_BATCH_SIZE=str(max(batch_sizes + [5000])))
+        sys.path.insert(0, SRC_DIR)
+        import api
+
+        async with api.lifespan(api.app):
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                return await run(client, batch_sizes, min_seconds)
+
+
+async def run_remote(url, batch_sizes, min_seconds):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        return await run(client, batch_sizes, min_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the binary and JSON prediction paths")
+    parser.add_argument("--batch-sizes", default="1,64,1000,10000")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Minimum measuring time per case")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    if args.url:
+        report = asyncio.run(run_remote(args.url, batch_sizes, args.seconds))
+    else:
+        report = asyncio.run(run_in_process(batch_sizes, args.seconds))
+
+    print("Same predictions as JSON rows:", ", ".join(f"{fmt}={ok}" for fmt, ok in report["same_predictions"].items()))
+    print(f"{'rows':>6} {'format':<13} {'p50 ms':>9} {'rows/s':>11} {'req bytes':>10} {'resp bytes':>10} {'speedup':>8}")
+    for size, formats in report["batches"].items():
+        baseline = formats["json_rows"]["p50_ms"]
+        for fmt, result in formats.items():
+            print(f"{size:>6} {fmt:<13} {result['p50_ms']:>9.3f} {result['rows_per_second']:>11} "
+                  f"{result['request_bytes']:>10} {result['response_bytes']:>10} {baseline / result['p50_ms']:>7.1f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not all(report["same_predictions"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Reprodukálható terheléses benchmark a kiszolgáló stack-hez (src/api.py).
+
+Az MLflow registry helyett egy ideiglenes, lokális SQLite store-t használ: betanítja és
+regisztrálja az IrisDecisionTree modellt, majd az API-t elindítja in-process (ASGI)
+vagy uvicorn alfolyamatként, és fix konkurenciaszinteken méri a /predict és a
+/predict/batch végpontokat.
+
+Forgatókönyvek:
+- cold_start: indulástól az első sikeres predikcióig eltelt idő
+- steady: p50/p95/p99 késleltetés, áteresztőképesség, RSS konkurenciaszintenként
+- reload: új Production verzió regisztrálása forgalom közben; hibák és a verzióváltás ideje
+
+Módok: inprocess (ASGI, hálózat nélkül), uvicorn (`--workers N`: minden worker külön tölti
+be a modellt), prefork (src/prefork_server.py, közös modell). A memória folyamatonként
+RSS/PSS/USS bontásban kerül az eredménybe, így a több workeres módok összevethetők.
+
+Használat:
+    python src/benchmark_serving.py --mode inprocess --output benchmark_results.json
+    python src/benchmark_serving.py --baseline src/benchmark_baseline.json   # regresszió esetén exit 1
+    python src/benchmark_serving.py --update-baseline src/benchmark_baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(SRC_DIR)
+MODEL_NAME = "IrisDecisionTree"
+
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+BATCH_ROWS = 100
+
+# Ezek a metrikák számítanak regressziónak, ha a baseline-hoz képest romlanak
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "seconds_to_first_prediction")
+HIGHER_IS_BETTER = ("requests_per_second", "rows_per_second")
+
+
+def setup_registry(root):
+    """
+    Lokális registry stand-in: SQLite tracking store a `root` alatt, egy Production verzióval.
+    Visszatér: (tracking URI, regisztráló függvény új verziókhoz).
+    """
+    import mlflow
+    import mlflow.sklearn
+    import pandas as pd
+    from mlflow.tracking import MlflowClient
+    from sklearn.datasets import load_iris
+    from sklearn.model_selection import train_test_split
+    from sklearn.tree import DecisionTreeClassifier
+
+    tracking_uri = "sqlite:///" + os.path.join(root, "mlflow.db")
+    mlflow.set_tracking_uri(tracking_uri)
+    mlflow.set_experiment(experiment_id=mlflow.create_experiment(
+        "serving-benchmark", artifact_location="file://" + os.path.join(root, "artifacts")))
+    iris = load_iris()
+    X = pd.DataFrame(iris.data, columns=iris.feature_names)
+    X_train, _, y_train, _ = train_test_split(X, iris.target, test_size=0.2, random_state=42)
+
+    def register_version(max_depth=None):
+        clf = DecisionTreeClassifier(random_state=42, max_depth=max_depth).fit(X_train, y_train)
+        with mlflow.start_run():
+            info = mlflow.sklearn.log_model(clf, artifact_path="model", serialization_format="cloudpickle")
+        version = mlflow.register_model(info.model_uri, MODEL_NAME).version
+        MlflowClient().transition_model_version_stage(MODEL_NAME, version, "Production",
+                                                       archive_existing_versions=True)
+        return str(version)
+
+    register_version()
+    return tracking_uri, register_version
+
+
+def server_env(tracking_uri, root, refresh_seconds):
+    env = dict(os.environ)
+    env.update({
+        "MLFLOW_TRACKING_URI": tracking_uri,
+        # Nem létező lokális pickle, hogy a registry ágat mérjük
+        "LOCAL_MODEL_PATH": os.path.join(root, "missing.pkl"),
+        "MODEL_REFRESH_SECONDS": str(refresh_seconds),
+        "API_LOG_ENABLED": os.environ.get("API_LOG_ENABLED", "false"),
+        "PYTHONPATH": REPO_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def process_memory(pid):
+    """
+    A folyamat és gyermekei memóriája MB-ban: összesített RSS és PSS, valamint
+    folyamatonként RSS/PSS/USS (a PSS/USS mutatja a copy-on-write megosztást).
+    """
+    import psutil
+
+    root = psutil.Process(pid)
+    processes = []
+    for process in [root] + root.children(recursive=True):
+        try:
+            info = process.memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        entry = {"pid": process.pid, "rss_mb": round(info.rss / 2**20, 1)}
+        for field in ("pss", "uss"):
+            if hasattr(info, field):
+                entry[f"{field}_mb"] = round(getattr(info, field) / 2**20, 1)
+        processes.append(entry)
+    return {
+        "rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        "pss_mb": round(sum(p.get("pss_mb", 0) for p in processes), 1),
+        "processes": processes,
+    }
+
+
+class InProcessServer:
+    """Az API ASGI-n keresztül, hálózat nélkül, ugyanebben a folyamatban."""
+
+    def __init__(self, env):
+        self.env = env
+        self.pid = os.getpid()
+        self._lifespan = None
+
+    async def __aenter__(self):
+        import httpx
+        os.environ.update(self.env)
+        sys.path.insert(0, REPO_DIR)
+        from src import api
+        self._lifespan = api.lifespan(api.app)
+        await self._lifespan.__aenter__()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench")
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        await self._lifespan.__aexit__(*exc)
+
+
+class UvicornServer:
+    """Az API uvicorn alfolyamatként, HTTP-n keresztül (workerenként külön betöltött modellel)."""
+
+    def __init__(self, env, workers=1):
+        self.env = env
+        self.workers = workers
+
+    def command(self, port):
+        return [sys.executable, "-m", "uvicorn", "src.api:app", "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(self.workers), "--log-level", "warning"]
+
+    async def __aenter__(self):
+        import httpx
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.process = subprocess.Popen(self.command(port), cwd=REPO_DIR, env=self.env)
+        self.pid = self.process.pid
+        limits = httpx.Limits(max_connections=1024, max_keepalive_connections=1024)
+        self.client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+class PreforkServer(UvicornServer):
+    """Az API src/prefork_server.py-jal: a master egyszer tölti be a modellt, a workerek osztoznak rajta."""
+
+    def command(self, port):
+        return [sys.executable, os.path.join(SRC_DIR, "prefork_server.py"), "--host", "127.0.0.1",
+                "--port", str(port), "--workers", str(self.workers), "--log-level", "warning"]
+
+
+SERVERS = {"inprocess": InProcessServer, "uvicorn": UvicornServer, "prefork": PreforkServer}
+
+
+async def wait_for_prediction(client, timeout=120):
+    """Addig próbálkozik, amíg a /predict sikeres nem lesz. Visszatér: eltelt másodpercek."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            response = await client.post("/predict", json=ROW)
+            if response.status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        await asyncio.sleep(0.05)
+    raise TimeoutError("The API did not serve a prediction in time")
+
+
+async def drive(client, endpoint, concurrency, duration, on_tick=None):
+    """
+    `concurrency` párhuzamos kliens `duration` másodpercig.
+    Visszatér: (késleltetések másodpercben, hibák száma, eltelt idő).
+    """
+    if endpoint == "batch":
+        path, payload = "/predict/batch", {"rows": [ROW] * BATCH_ROWS}
+    else:
+        path, payload = "/predict", ROW
+    latencies, failures = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal failures
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures += 1
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    if on_tick is not None:
+        tasks.append(asyncio.create_task(on_tick(deadline)))
+    await asyncio.gather(*tasks)
+    return latencies, failures, time.perf_counter() - started
+
+
+def summarize(latencies, failures, elapsed, rows_per_request):
+    result = {"requests": len(latencies), "errors": failures}
+    if latencies:
+        p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+        result.update({"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3)})
+    result["requests_per_second"] = round(len(latencies) / elapsed, 1)
+    result["rows_per_second"] = round(len(latencies) * rows_per_request / elapsed, 1)
+    return result
+
+
+async def run_benchmark(mode, concurrency_levels, duration, endpoints, workers=1):
+    results = {
+        "meta": {
+            "mode": mode,
+            "workers": workers,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "duration_seconds": duration,
+        },
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as root:
+        tracking_uri, register_version = setup_registry(root)
+        env = server_env(tracking_uri, root, refresh_seconds=0.5)
+        server_args = (env,) if mode == "inprocess" else (env, workers)
+
+        started = time.perf_counter()
+        async with SERVERS[mode](*server_args) as server:
+            client = server.client
+            cold = await wait_for_prediction(client)
+            results["scenarios"]["cold_start"] = {
+                "seconds_to_first_prediction": round(time.perf_counter() - started, 3),
+                "seconds_waiting_for_model": round(cold, 3),
+                "memory": process_memory(server.pid),
+            }
+
+            for endpoint in endpoints:
+                rows = BATCH_ROWS if endpoint == "batch" else 1
+                # Bemelegítés
+                await drive(client, endpoint, max(concurrency_levels), min(1.0, duration))
+                for concurrency in concurrency_levels:
+                    latencies, failures, elapsed = await drive(client, endpoint, concurrency, duration)
+                    summary = summarize(latencies, failures, elapsed, rows)
+                    summary["memory"] = process_memory(server.pid)
+                    results["scenarios"][f"steady/{endpoint}/c{concurrency}"] = summary
+
+            # Új verzió forgalom közben
+            switch = {}
+
+            async def promote(deadline):
+                await asyncio.sleep(1.0)
+                before = (await client.get("/model")).json().get("version")
+                switch["registered_at"] = time.perf_counter()
+                new_version = await asyncio.to_thread(register_version, 3)
+                while time.perf_counter() < deadline:
+                    if (await client.get("/model")).json().get("version") == new_version:
+                        switch["seconds_to_switch"] = round(time.perf_counter() - switch["registered_at"], 3)
+                        break
+                    await asyncio.sleep(0.05)
+                switch.update({"from_version": before, "to_version": new_version})
+
+            concurrency = max(concurrency_levels)
+            reload_duration = max(2 * duration, 10.0)
+            latencies, failures, elapsed = await drive(client, "predict", concurrency, reload_duration, promote)
+            summary = summarize(latencies, failures, elapsed, 1)
+            summary.update(switch)
+            summary.pop("registered_at", None)
+            summary["memory"] = process_memory(server.pid)
+            results["scenarios"][f"reload/predict/c{concurrency}"] = summary
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    A baseline-hoz képest romló metrikák listája (tolerancia: relatív, pl. 0.25 = 25%).
+    """
+    regressions = []
+    for scenario, metrics in baseline.get("scenarios", {}).items():
+        current = results["scenarios"].get(scenario)
+        if current is None:
+            continue
+        for key, expected in metrics.items():
+            actual = current.get(key)
+            if not isinstance(expected, (int, float)) or not isinstance(actual, (int, float)) or expected <= 0:
+                continue
+            if key in LOWER_IS_BETTER and actual > expected * (1 + tolerance):
+                regressions.append(f"{scenario} {key}: {actual} > {expected} (+{tolerance:.0%})")
+            elif key in HIGHER_IS_BETTER and actual < expected * (1 - tolerance):
+                regressions.append(f"{scenario} {key}: {actual} < {expected} (-{tolerance:.0%})")
+        if current.get("errors", 0) > metrics.get("errors", 0):
+            regressions.append(f"{scenario} errors: {current['errors']} > {metrics.get('errors', 0)}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-testing benchmark for the Iris serving stack")
+    parser.add_argument("--mode", choices=sorted(SERVERS), default="inprocess")
+    parser.add_argument("--workers", type=int, default=1, help="Server workers (uvicorn and prefork modes)")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per measurement")
+    parser.add_argument("--endpoints", default="predict,batch", help="Comma-separated: predict, batch")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Compare against this baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown (default: 0.25)")
+    parser.add_argument("--update-baseline", help="Write the results to this baseline file")
+    args = parser.parse_args(argv)
+
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",")]
+    results = asyncio.run(run_benchmark(args.mode, concurrency_levels, args.duration, endpoints, args.workers))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    if args.update_baseline:
+        with open(args.update_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline updated: {args.update_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Kompakt, pickle nélküli, memória-leképezhető modell artifact a TreeEngine-hez.
+
+Fájlformátum (little-endian):
+- 16 bájt előtag: MAGIC (8 bájt), formátum verzió (uint32), a JSON fejléc hossza (uint32)
+- JSON fejléc: max_depth, n_features, a tömbök dtype/alak/offset adatai, az adatrész
+  blake2b ellenőrzőösszege és a metaadatok (modell neve, run, sklearn verzió, létrehozás ideje)
+- az adatrész: a TreeEngine előkészített tömbjei egymás után, 64 bájtra igazítva
+
+Betöltéskor a fájl `mmap`-pel, csak olvashatóan nyílik meg, a tömbök `np.frombuffer` nézetek
+másolás nélkül; a lapokat az operációs rendszer a folyamatok között megosztja. Nincs pickle,
+YAML és környezet-ellenőrzés, így a betöltés tört ezredmásodperc.
+
+A tanítás a modell mellé (az MLflow artifact `extra_files/model.tree` fájljaként és helyben
+a lokális pickle mellett, `.tree` kiterjesztéssel) is kiírja. A lokális párnál a fejléc a
+forrás pickle azonosítóját (méret, tartalom-hash) is tárolja; ha a pickle közben lecserélődött,
+a kompakt fájl nem használható (`matches_source`). Parancssor:
+    python src/compact_model.py export /tmp/iris_model.pkl /tmp/iris_model.tree
+    python src/compact_model.py inspect /tmp/iris_model.tree
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tree_engine import TreeEngine
+
+MAGIC = b"IRISTREE"
+FORMAT_VERSION = 2
+PREFIX = struct.Struct("<8sII")
+ALIGNMENT = 64
+
+# A fájl neve az MLflow modell artifact extra_files/ könyvtárában
+ARTIFACT_FILENAME = "model.tree"
+ARTIFACT_SUBDIR = "extra_files"
+
+# Tárolt dtype-ok: fix szélességű little-endian, a betöltés így platformtól független
+ARRAY_DTYPES = {"children": "<i8", "feature": "<i8", "threshold": "<f8", "missing_left": "|b1", "leaf_proba": "<f8"}
+
+# A betöltéshez kötelező fejléc mezők és tömbök (a TreeEngine.from_arrays bemenete)
+HEADER_KEYS = ("max_depth", "n_features", "arrays", "data_bytes", "checksum")
+ARRAY_NAMES = ("children", "feature", "threshold", "missing_left", "leaf_proba", "classes", "leaf_class")
+
+# pickle útvonal -> ((méret, mtime_ns), file_identity): a változatlan pickle-t nem hash-eljük újra
+_identity_cache = {}
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _stored_dtype(name, array):
+    if name in ARRAY_DTYPES:
+        return np.dtype(ARRAY_DTYPES[name])
+    # classes / leaf_class: az osztálycímkék numerikus dtype-ja marad
+    if array.dtype.kind not in "iuf":
+        raise ValueError(f"Only numeric class labels can be stored, got dtype {array.dtype}")
+    return array.dtype.newbyteorder("<")
+
+
+def save(engine, path, metadata=None):
+    """A TreeEngine kiírása atomi cserével (ideiglenes fájl + átnevezés). Visszatér: a fejléc."""
+    arrays = {name: np.ascontiguousarray(array, dtype=_stored_dtype(name, np.asarray(array)))
+              for name, array in engine.arrays().items()}
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    data = bytearray(offset)
+    for name, array in arrays.items():
+        start = layout[name]["offset"]
+        data[start:start + array.nbytes] = array.tobytes()
+
+    header = {
+        "format": FORMAT_VERSION,
+        "max_depth": engine.max_depth,
+        "n_features": engine.n_features,
+        "n_nodes": len(arrays["feature"]),
+        "arrays": layout,
+        "data_bytes": len(data),
+        "checksum": hashlib.blake2b(data, digest_size=16).hexdigest(),
+        "metadata": {"created": time.time(), **(metadata or {})},
+    }
+    header_bytes = json.dumps(header, sort_keys=True).encode()
+    data_offset = _aligned(PREFIX.size + len(header_bytes))
+
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_offset - PREFIX.size - len(header_bytes)))
+        f.write(data)
+    os.replace(tmp, path)
+    return header
+
+
+def local_path_for(pickle_path):
+    """A lokális pickle kompakt párjának útvonala: ugyanaz a név `.tree` kiterjesztéssel."""
+    return os.path.splitext(pickle_path)[0] + ".tree"
+
+
+def file_identity(path, chunk_bytes=1 << 20):
+    """Egy fájl azonosítója a fejléc számára: méret és blake2b tartalom-hash."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return {"size": os.path.getsize(path), "blake2b": digest.hexdigest()}
+
+
+def matches_source(header, pickle_path):
+    """
+    Igaz, ha a kompakt fájl ebből a pickle-ből (ugyanebből a tartalomból) készült.
+    A pickle hash-e (méret, mtime_ns) szerint gyorsítótárazott, így csak változás után számolódik újra.
+    """
+    source = header.get("metadata", {}).get("source_pickle")
+    if not source:
+        return False
+    try:
+        stat = os.stat(pickle_path)
+    except FileNotFoundError:
+        return False
+    if stat.st_size != source.get("size"):
+        return False
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _identity_cache.get(pickle_path)
+    if cached is None or cached[0] != key:
+        cached = _identity_cache[pickle_path] = (key, file_identity(pickle_path))
+    return cached[1] == source
+
+
+def save_sklearn(clf, path, **metadata):
+    """Egy betanított DecisionTreeClassifier kiírása; az sklearn verzió a metaadatokba kerül."""
+    import sklearn
+
+    return save(TreeEngine.from_sklearn(clf), path, {"sklearn": sklearn.__version__, **metadata})
+
+
+def export_sklearn(clf, directory, pickle_path=None, **metadata):
+    """
+    Kiírás a tanításhoz: `directory/model.tree` (az MLflow log_model extra_files-ához) és ha
+    meg van adva a már kiírt lokális pickle, mellé a párja (`local_path_for`), a pickle
+    azonosítójával. Visszatér: a directory-beli útvonal.
+    """
+    path = os.path.join(directory, ARTIFACT_FILENAME)
+    save_sklearn(clf, path, **metadata)
+    if pickle_path:
+        save_sklearn(clf, local_path_for(pickle_path), source_pickle=file_identity(pickle_path), **metadata)
+    return path
+
+
+def _check_header(path, header):
+    """A fejléc szerkezetének ellenőrzése; hiányzó vagy rossz típusú mezőnél ValueError."""
+    if not isinstance(header, dict):
+        raise ValueError(f"{path}: malformed header")
+    missing = [key for key in HEADER_KEYS if key not in header]
+    if missing:
+        raise ValueError(f"{path}: header is missing {', '.join(missing)}")
+    arrays = header["arrays"]
+    if not isinstance(arrays, dict):
+        raise ValueError(f"{path}: malformed array layout")
+    missing = [name for name in ARRAY_NAMES if name not in arrays]
+    if missing:
+        raise ValueError(f"{path}: header is missing arrays {', '.join(missing)}")
+    for name, spec in arrays.items():
+        try:
+            np.dtype(spec["dtype"])
+            valid = (isinstance(spec["offset"], int) and spec["offset"] >= 0 and isinstance(spec["shape"], list)
+                     and all(isinstance(size, int) and size >= 0 for size in spec["shape"]))
+        except (KeyError, TypeError):
+            valid = False
+        if not valid:
+            raise ValueError(f"{path}: malformed layout for array {name}")
+    if not all(isinstance(header[key], int) for key in ("max_depth", "n_features", "data_bytes")):
+        raise ValueError(f"{path}: malformed header")
+
+
+def load(path, verify=True):
+    """
+    A fájl megnyitása mmap-pel; visszatér: (TreeEngine, fejléc). A tömbök csak olvasható nézetek.
+    Hibás fájlnál (formátum, verzió, csonka vagy hiányos fejléc, méret, ellenőrzőösszeg) ValueError-t dob.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < PREFIX.size:
+        raise ValueError(f"{path}: file too short")
+    magic, version, header_size = PREFIX.unpack_from(mapped, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: not a compact model file")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format version {version}")
+    if PREFIX.size + header_size > len(mapped):
+        raise ValueError(f"{path}: truncated header")
+    header = json.loads(mapped[PREFIX.size:PREFIX.size + header_size])
+    _check_header(path, header)
+    data_offset = _aligned(PREFIX.size + header_size)
+    if len(mapped) != data_offset + header["data_bytes"]:
+        raise ValueError(f"{path}: expected {data_offset + header['data_bytes']} bytes, got {len(mapped)}")
+    if verify:
+        checksum = hashlib.blake2b(memoryview(mapped)[data_offset:], digest_size=16).hexdigest()
+        if checksum != header["checksum"]:
+            raise ValueError(f"{path}: checksum mismatch")
+
+    arrays = {}
+    for name in ARRAY_NAMES:
+        spec = header["arrays"][name]
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(mapped, dtype=spec["dtype"], count=count,
+                                     offset=data_offset + spec["offset"]).reshape(spec["shape"])
+    return TreeEngine.from_arrays(max_depth=header["max_depth"], n_features=header["n_features"], **arrays), header
+
+
+def artifact_path(model_dir):
+    """A kompakt fájl egy helyi MLflow modell könyvtárban, vagy None, ha nincs ilyen."""
+    path = os.path.join(model_dir, ARTIFACT_SUBDIR, ARTIFACT_FILENAME)
+    return path if os.path.isfile(path) else None
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or inspect compact (mmap) tree model files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Convert a joblib pickle or an MLflow model URI")
+    export.add_argument("source", help="joblib .pkl file or MLflow model URI (models:/..., runs:/...)")
+    export.add_argument("output")
+    inspect = commands.add_parser("inspect", help="Verify a compact file and print its header and load time")
+    inspect.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        metadata = {"source": args.source}
+        if os.path.isfile(args.source):
+            import joblib
+            model = joblib.load(args.source)
+            metadata["source_pickle"] = file_identity(args.source)
+        else:
+            import mlflow.pyfunc
+            model = mlflow.pyfunc.load_model(args.source)
+        engine = TreeEngine.from_model(model)
+        if engine is None:
+            parser.error("The model is not a single-output DecisionTreeClassifier")
+        import sklearn
+        header = save(engine, args.output, {**metadata, "sklearn": sklearn.__version__})
+        print(json.dumps(header, indent=2))
+        return
+
+    started = time.perf_counter()
+    engine, header = load(args.path)
+    seconds = time.perf_counter() - started
+    print(json.dumps({**header, "load_ms": round(seconds * 1000, 4), "bytes": os.path.getsize(args.path)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Tartalom-címzett cache az adathalmazokhoz és a train/test felosztásokhoz.
+
+A kulcs a forrásadat hash-éből és a felosztás paramétereiből képzett hash, így ugyanaz a
+forrás ugyanazzal a felosztással minden jobban ugyanazt a bejegyzést találja, a forrás
+bármilyen változása pedig új kulcsot ad. A bejegyzés egy könyvtár (`<kulcs>/`) a tömbökkel
+`.npy` fájlokként és egy `meta.json`-nal; a tömbök `np.load(..., mmap_mode="r")`-rel,
+másolás nélkül nyílnak meg. A betöltő (load) csak cache-hiba esetén fut.
+
+Elavult bejegyzések:
+- hiányzó vagy eltérő méretű fájlok, régi formátum-verzió: olvasáskor törlődnek
+- ugyanazon név (pl. "iris") más forrás-hash-sel: új bejegyzés írásakor törlődnek
+- a méretkorlát (DATASET_CACHE_MAX_BYTES) felett a legrégebben használtak törlődnek; a
+  korlátnál nagyobb felosztás nem kerül a cache-be (a memóriában lévő tömbök mennek tovább)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import namedtuple
+
+import numpy as np
+
+DATASET_CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", "dataset_cache")
+DATASET_CACHE_MAX_BYTES = int(os.environ.get("DATASET_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+# A bejegyzések szerkezetének verziója; változáskor a régi bejegyzések elavultak
+CACHE_FORMAT_VERSION = 1
+
+SPLIT_ARRAYS = ("X_train", "X_test", "y_train", "y_test")
+
+Split = namedtuple("Split", ["X_train", "X_test", "y_train", "y_test", "feature_names", "key", "hit"])
+
+
+def file_fingerprint(path, chunk_bytes=1 << 20):
+    """A fájl tartalmának hash-e (darabonként olvasva, a fájl nem kerül egészben memóriába)."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def array_fingerprint(*arrays):
+    """Tömbök hash-e (dtype, alak és tartalom)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """Könyvtár alapú cache; több folyamat is használhatja, az írás atomi átnevezéssel történik."""
+
+    def __init__(self, directory=DATASET_CACHE_DIR, max_bytes=DATASET_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(source_fingerprint, params):
+        payload = json.dumps({"source": source_fingerprint, "params": params, "format": CACHE_FORMAT_VERSION},
+                             sort_keys=True)
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_meta(self, key):
+        try:
+            with open(os.path.join(self._path(key), "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _valid(self, key, meta):
+        if meta is None or meta.get("format") != CACHE_FORMAT_VERSION:
+            return False
+        for name, size in meta["files"].items():
+            path = os.path.join(self._path(key), name)
+            if not os.path.exists(path) or os.path.getsize(path) != size:
+                return False
+        return True
+
+    def get(self, key):
+        """Memória-leképezett tömbök és a meta, vagy None (hiány, illetve törölt elavult bejegyzés)."""
+        if not os.path.isdir(self._path(key)):
+            return None
+        meta = self._read_meta(key)
+        if not self._valid(key, meta):
+            self.remove(key)
+            return None
+        # A meta módosítási ideje a legutóbbi használat (LRU kilakoltatáshoz)
+        os.utime(os.path.join(self._path(key), "meta.json"))
+        arrays = {name: np.load(os.path.join(self._path(key), f"{name}.npy"), mmap_mode="r")
+                  for name in meta["arrays"]}
+        return arrays, meta
+
+    def put(self, key, arrays, meta):
+        """A tömbök kiírása; ha közben egy másik folyamat megírta ugyanezt a kulcsot, azé marad."""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = os.path.join(self.directory, f".{key}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        files = {}
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+            files[f"{name}.npy"] = os.path.getsize(os.path.join(tmp, f"{name}.npy"))
+        meta = {**meta, "key": key, "format": CACHE_FORMAT_VERSION, "arrays": list(arrays), "files": files,
+                "bytes": sum(files.values()), "created": time.time()}
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp, self._path(key))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return meta
+
+    def remove(self, key):
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+    def entries(self):
+        """(kulcs, meta, utolsó használat) hármasok; a félbemaradt írásokat kihagyja."""
+        if not os.path.isdir(self.directory):
+            return []
+        result = []
+        for key in os.listdir(self.directory):
+            if key.startswith("."):
+                continue
+            meta_path = os.path.join(self._path(key), "meta.json")
+            meta = self._read_meta(key)
+            last_used = os.path.getmtime(meta_path) if meta is not None else 0.0
+            result.append((key, meta, last_used))
+        return result
+
+    def evict(self, keep=()):
+        """
+        Elavult bejegyzések törlése, majd a legrégebben használtaké a méretkorlátig.
+        Visszatér: a törölt kulcsok.
+        """
+        removed = []
+        live = []
+        for key, meta, last_used in self.entries():
+            if key not in keep and not self._valid(key, meta):
+                self.remove(key)
+                removed.append(key)
+            elif meta is not None:
+                live.append((last_used, key, meta["bytes"]))
+        total = sum(size for _, _, size in live)
+        for _, key, size in sorted(live):
+            if total <= self.max_bytes:
+                break
+            if key in keep:
+                continue
+            self.remove(key)
+            removed.append(key)
+            total -= size
+        return removed
+
+    def split(self, name, source_fingerprint, load, test_size=0.2, random_state=42, stratify=False):
+        """
+        Train/test felosztás a cache-ből. `load()` -> (X, y, feature_names) csak cache-hiba esetén fut.
+        A visszaadott tömbök csak olvasható memória-leképezések.
+        """
+        params = {"name": name, "test_size": test_size, "random_state": random_state, "stratify": stratify}
+        key = self.key(source_fingerprint, params)
+        cached = self.get(key)
+        if cached is not None:
+            arrays, meta = cached
+            return Split(*(arrays[part] for part in SPLIT_ARRAYS), meta["feature_names"], key, True)
+
+        from sklearn.model_selection import train_test_split
+
+        X, y, feature_names = load()
+        X, y = np.asarray(X), np.asarray(y)
+        parts = train_test_split(X, y, test_size=test_size, random_state=random_state,
+                                 stratify=y if stratify else None)
+        if sum(part.nbytes for part in parts) > self.max_bytes:
+            # A korlátnál nagyobb bejegyzést meg sem írjuk; a memóriában lévő felosztás megy tovább
+            return Split(*parts, list(feature_names), key, False)
+        meta = self.put(key, dict(zip(SPLIT_ARRAYS, parts)),
+                        {"name": name, "source": source_fingerprint, "params": params,
+                         "feature_names": list(feature_names)})
+        if meta["bytes"] > self.max_bytes:
+            # A fájlfejlécekkel együtt lépte túl a korlátot; az evict nem törölné (keep), ezért itt törlődik
+            self.remove(key)
+            return Split(*parts, list(feature_names), key, False)
+        # Ugyanannak a névnek a más forrásból készült bejegyzései elavultak
+        for other, meta, _ in self.entries():
+            if other != key and meta and meta.get("name") == name and meta.get("source") != source_fingerprint:
+                self.remove(other)
+        self.evict(keep=(key,))
+        cached = self.get(key)
+        if cached is None:
+            # Nem írható cache: a memóriában lévő felosztás megy tovább
+            return Split(*parts, list(feature_names), key, False)
+        arrays, meta = cached
+        return Split(*(arrays[part] for part in SPLIT_ARRAYS), meta["feature_names"], key, False)
+
+    def stats(self):
+        entries = [meta for _, meta, _ in self.entries() if meta is not None]
+        return {"directory": self.directory, "entries": len(entries), "bytes": sum(m["bytes"] for m in entries),
+                "max_bytes": self.max_bytes}
+
+
+def iris_source_path():
+    """A scikit-learn csomagban lévő iris.csv (ebből olvas a load_iris); a sklearn importja nélkül."""
+    from importlib.util import find_spec
+    return os.path.join(os.path.dirname(find_spec("sklearn").origin), "datasets", "data", "iris.csv")
+
+
+def iris_split(test_size=0.2, random_state=42, cache=None):
+    """Az Iris train/test felosztása a cache-en át; a kulcs az iris.csv tartalmának hash-e."""
+    def load():
+        from sklearn.datasets import load_iris
+        iris = load_iris()
+        return iris.data, iris.target, iris.feature_names
+
+    cache = cache or DatasetCache()
+    return cache.split("iris", file_fingerprint(iris_source_path()), load, test_size, random_state)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clean the dataset/split cache")
+    parser.add_argument("--directory", default=DATASET_CACHE_DIR)
+    parser.add_argument("--max-bytes", type=int, default=DATASET_CACHE_MAX_BYTES)
+    parser.add_argument("--evict", action="store_true", help="Remove stale entries and enforce the size cap")
+    parser.add_argument("--clear", action="store_true", help="Remove every entry")
+    args = parser.parse_args(argv)
+
+    cache = DatasetCache(args.directory, args.max_bytes)
+    if args.clear:
+        for key, _, _ in cache.entries():
+            cache.remove(key)
+    elif args.evict:
+        print(json.dumps({"removed": cache.evict()}))
+    print(json.dumps(cache.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Inkrementális, ablakos drift-számítás a naplózott predikciós bemenetekre.
+
+- DriftReference: a tanító adatokból egyszer előállított referencia (fix bin-határok,
+  bin-valószínűségek, átlag, szórás jellemzőnként), JSON-ba menthető.
+- WindowStats: egy időszelet konstans méretű összesítője: Welford momentumok (count,
+  mean, M2) és fix bin-es hisztogram, minden jellemzőre egyszerre, numpy-val.
+  Két összesítő összevonható (Chan-féle párhuzamos Welford), így az ablak a szeletek összege.
+- DriftEngine: időszeletekre (bucket_seconds) bontott csúszó ablak (window_buckets szelet);
+  csak az új rekordokat kapja meg, a régi szeleteket eldobja, a memória konstans.
+  A PSI, KL és (binelt) KS pontszámokat minden jellemzőre egyszerre, vektorizáltan számolja.
+"""
+
+import json
+
+import numpy as np
+
+from model_loading import FEATURE_NAMES
+
+# Üres binek simítása, hogy a log-arányok végesek maradjanak
+EPSILON = 1e-6
+
+# Szokásos PSI küszöb: 0.1 alatt stabil, 0.1-0.2 enyhe, 0.2 felett jelentős eltolódás
+PSI_DRIFT_THRESHOLD = 0.2
+
+
+class DriftReference:
+    """
+    Tanító referencia. A belső bin-határok a tanító tartományt osztják `bins` egyenlő részre;
+    a két szélső (nyitott) bin fogja a tartományon kívüli értékeket, így B = bins + 2.
+    """
+
+    def __init__(self, feature_names, edges, probabilities, mean, std, count):
+        self.feature_names = list(feature_names)
+        self.edges = np.asarray(edges, dtype=np.float64)  # F x (bins + 1)
+        self.probabilities = np.asarray(probabilities, dtype=np.float64)  # F x B
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.count = int(count)
+
+    @property
+    def num_bins(self):
+        return self.edges.shape[1] + 1
+
+    @classmethod
+    def from_data(cls, X, feature_names=FEATURE_NAMES, bins=10):
+        X = np.asarray(X, dtype=np.float64)
+        low, high = X.min(axis=0), X.max(axis=0)
+        edges = np.linspace(low, high, bins + 1, axis=1)
+        reference = cls(feature_names, edges, np.zeros((X.shape[1], bins + 2)), X.mean(axis=0), X.std(axis=0),
+                        len(X))
+        counts = reference.histogram(X)
+        reference.probabilities = counts / counts.sum(axis=1, keepdims=True)
+        return reference
+
+    def histogram(self, X):
+        """N x F minta -> F x B bin-számlálók (minden jellemzőre egyszerre)."""
+        X = np.asarray(X, dtype=np.float64)
+        num_features, num_bins = self.edges.shape[0], self.num_bins
+        # A bin indexe = hány belső határ <= érték (0: a tartomány alatt, B-1: felette)
+        index = (X[:, :, None] >= self.edges[None, :, :]).sum(axis=2)
+        flat = (index + np.arange(num_features) * num_bins).ravel()
+        return np.bincount(flat, minlength=num_features * num_bins).reshape(num_features, num_bins)
+
+    def to_dict(self):
+        return {"feature_names": self.feature_names, "edges": self.edges.tolist(),
+                "probabilities": self.probabilities.tolist(), "mean": self.mean.tolist(),
+                "std": self.std.tolist(), "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["feature_names"], data["edges"], data["probabilities"], data["mean"], data["std"],
+                   data["count"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class WindowStats:
+    """Egy időszelet (vagy ablak) összesítője; mérete csak a jellemzők és binek számától függ."""
+
+    def __init__(self, num_features, num_bins):
+        self.count = 0
+        self.mean = np.zeros(num_features)
+        self.m2 = np.zeros(num_features)
+        self.histogram = np.zeros((num_features, num_bins), dtype=np.int64)
+
+    def update(self, X, histogram):
+        """Egy N x F batch (és előre kiszámolt hisztogramja) hozzáadása."""
+        n = len(X)
+        if n == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        self._merge_moments(n, batch_mean, batch_m2)
+        self.histogram += histogram
+
+    def merge(self, other):
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.histogram += other.histogram
+
+    def _merge_moments(self, n, mean, m2):
+        if n == 0:
+            return
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.count) if self.count else np.full_like(self.mean, np.nan)
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean.tolist(), "m2": self.m2.tolist(),
+                "histogram": self.histogram.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = np.asarray(data["histogram"], dtype=np.int64)
+        stats = cls(*histogram.shape)
+        stats.count = data["count"]
+        stats.mean = np.asarray(data["mean"], dtype=np.float64)
+        stats.m2 = np.asarray(data["m2"], dtype=np.float64)
+        stats.histogram = histogram
+        return stats
+
+
+def drift_scores(reference, window):
+    """
+    PSI, KL(ablak || referencia) és binelt KS jellemzőnként, egyetlen vektorizált lépésben,
+    valamint az átlag eltolódása referencia-szórás egységben.
+    """
+    counts = window.histogram.astype(np.float64)
+    observed = (counts + EPSILON) / (counts.sum(axis=1, keepdims=True) + EPSILON * counts.shape[1])
+    expected = (reference.probabilities + EPSILON) / (1 + EPSILON * counts.shape[1])
+    log_ratio = np.log(observed / expected)
+    psi = ((observed - expected) * log_ratio).sum(axis=1)
+    kl = (observed * log_ratio).sum(axis=1)
+    ks = np.abs(np.cumsum(observed, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_shift = np.where(reference.std > 0, (window.mean - reference.mean) / reference.std, 0.0)
+    return {"psi": psi, "kl": kl, "ks": ks, "mean": window.mean, "std": window.std, "mean_shift": mean_shift}
+
+
+class DriftEngine:
+    """
+    Csúszó ablak `window_buckets` darab `bucket_seconds` hosszú időszeletből. Az ablak vége
+    a legutóbb látott időszelet; az ablakon kívül eső szeletek törlődnek.
+    """
+
+    def __init__(self, reference, bucket_seconds=300, window_buckets=12):
+        self.reference = reference
+        self.bucket_seconds = bucket_seconds
+        self.window_buckets = window_buckets
+        self.buckets = {}  # szelet index -> WindowStats
+        self.latest_bucket = None
+        self.late_records = 0
+
+    def update(self, ts, X):
+        """
+        Új rekordok (ts: N unix idő, X: N x F) hozzáadása. Visszatér: a felvett rekordok száma
+        (az ablakon már kívül eső, késve érkezett rekordokat csak számolja).
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.reference.feature_names))
+        if len(X) == 0:
+            return 0
+        bucket = np.floor(np.asarray(ts, dtype=np.float64) / self.bucket_seconds).astype(np.int64)
+        newest = int(bucket.max())
+        if self.latest_bucket is None or newest > self.latest_bucket:
+            self.latest_bucket = newest
+        oldest = self.latest_bucket - self.window_buckets + 1
+        keep = bucket >= oldest
+        self.late_records += int((~keep).sum())
+        X, bucket = X[keep], bucket[keep]
+
+        if len(X) and bucket.min() == bucket.max():
+            self._bucket(int(bucket[0])).update(X, self.reference.histogram(X))
+        elif len(X):
+            for index in np.unique(bucket):
+                mask = bucket == index
+                self._bucket(int(index)).update(X[mask], self.reference.histogram(X[mask]))
+        for index in [index for index in self.buckets if index < oldest]:
+            del self.buckets[index]
+        return len(X)
+
+    def _bucket(self, index):
+        stats = self.buckets.get(index)
+        if stats is None:
+            stats = self.buckets[index] = WindowStats(len(self.reference.feature_names), self.reference.num_bins)
+        return stats
+
+    def window(self):
+        """Az ablak összesítője (a szeletek összevonása)."""
+        total = WindowStats(len(self.reference.feature_names), self.reference.num_bins)
+        for index in sorted(self.buckets):
+            total.merge(self.buckets[index])
+        return total
+
+    def report(self, psi_threshold=PSI_DRIFT_THRESHOLD):
+        window = self.window()
+        report = {
+            "window_start": (self.latest_bucket - self.window_buckets + 1) * self.bucket_seconds
+            if self.latest_bucket is not None else None,
+            "window_end": (self.latest_bucket + 1) * self.bucket_seconds if self.latest_bucket is not None else None,
+            "records": window.count,
+            "late_records": self.late_records,
+            "features": {},
+            "drifted_features": [],
+        }
+        if window.count == 0:
+            return report
+        scores = drift_scores(self.reference, window)
+        for i, name in enumerate(self.reference.feature_names):
+            report["features"][name] = {key: float(values[i]) for key, values in scores.items()}
+            if scores["psi"][i] > psi_threshold:
+                report["drifted_features"].append(name)
+        return report
+
+    def to_dict(self):
+        return {"bucket_seconds": self.bucket_seconds, "window_buckets": self.window_buckets,
+                "latest_bucket": self.latest_bucket, "late_records": self.late_records,
+                "buckets": {str(index): stats.to_dict() for index, stats in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, reference, data):
+        engine = cls(reference, data["bucket_seconds"], data["window_buckets"])
+        engine.latest_bucket = data["latest_bucket"]
+        engine.late_records = data.get("late_records", 0)
+        engine.buckets = {int(index): WindowStats.from_dict(stats) for index, stats in data["buckets"].items()}
+        return engine
@@ -1,30 +1,36 @@
 #!/bin/bash
 # Health check script for Docker container
-# This script checks if all required services are running
+# Probes all services in parallel, each bounded by HEALTH_CHECK_TIMEOUT seconds,
+# using the cheap health endpoints instead of full pages:
+#   FastAPI   /readyz (model loaded and warmed up)
+#   MLflow    /health
+#   Streamlit /_stcore/health
 
-# Check if FastAPI is running
-if curl --silent --fail http://localhost:8000/docs > /dev/null; then
-    echo "FastAPI is running"
-else
-    echo "FastAPI is not running"
-    exit 1
-fi
+TIMEOUT=${HEALTH_CHECK_TIMEOUT:-3}
 
-# Check if MLflow is running
-if curl --silent --fail http://localhost:5000 > /dev/null; then
-    echo "MLflow is running"
-else
-    echo "MLflow is not running"
-    exit 1
-fi
+declare -A PROBES=(
+    [FastAPI]="http://localhost:8000/readyz"
+    [MLflow]="http://localhost:5000/health"
+    [Streamlit]="http://localhost:8501/_stcore/health"
+)
 
-# Check if Streamlit is running
-if curl --silent --fail http://localhost:8501 > /dev/null; then
-    echo "Streamlit is running"
-else
-    echo "Streamlit is not running"
-    exit 1
-fi
+declare -A PIDS
+for name in "${!PROBES[@]}"; do
+    curl --silent --fail --max-time "$TIMEOUT" --connect-timeout "$TIMEOUT" "${PROBES[$name]}" > /dev/null &
+    PIDS[$name]=$!
+done
 
-echo "All services are running"
-exit 0
+status=0
+for name in "${!PIDS[@]}"; do
+    if wait "${PIDS[$name]}"; then
+        echo "$name is running"
+    else
+        echo "$name is not running"
+        status=1
+    fi
+done
+
+if [ $status -eq 0 ]; then
+    echo "All services are running"
+fi
+exit $status
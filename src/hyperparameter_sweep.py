@@ -0,0 +1,223 @@
+"""
+Párhuzamos hiperparaméter-keresés a DecisionTreeClassifier-hez, MLflow logolással.
+
+- A jelöltek egy rácsból (grid) vagy véletlen mintavétellel (random) jönnek.
+- Minden jelöltet keresztvalidációval értékelünk egy process pool-ban; a tanító adat
+  workerenként egyszer kerül át (initializer), a jelöltek darabokban mennek, hogy a
+  folyamatok közti kommunikáció ne egye meg a nyereséget.
+- A keresésnek fali-idő kerete van: a határidő után a workerek nem kezdenek új jelöltet,
+  a még el nem indult darabok törlődnek, és a győztes a kész jelöltek közül kerül ki.
+- Minden jelölt egy beágyazott (nested) MLflow run, egyetlen log_batch hívással.
+- Csak a győztes kerül a registry-be, pontosan egyszer, és kap Production stage-et.
+"""
+
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+DEFAULT_GRID = {
+    "criterion": ["gini", "entropy"],
+    "max_depth": [None, 2, 3, 4, 5, 6],
+    "min_samples_split": [2, 4, 8],
+    "min_samples_leaf": [1, 2, 4],
+    "ccp_alpha": [0.0, 0.01],
+}
+
+# Az MLflow ezzel a taggel köti a beágyazott run-t a szülőhöz
+MLFLOW_PARENT_RUN_ID_TAG = "mlflow.parentRunId"
+
+# A worker folyamatban egyszer átadott tanító adat és CV beállítás
+_worker_data = None
+
+
+def candidates(search="grid", n_iter=20, grid=DEFAULT_GRID, seed=42):
+    """A kipróbálandó paraméter-kombinációk listája."""
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+    if search == "grid":
+        return list(ParameterGrid(grid))
+    if search == "random":
+        # Véges rácsnál visszatevés nélkül mintavételez, így nincs ismétlődő jelölt
+        return list(ParameterSampler(grid, n_iter=min(n_iter, len(ParameterGrid(grid))), random_state=seed))
+    raise ValueError(f"Unknown search: {search}")
+
+
+def _init_worker(X, y, cv, seed):
+    global _worker_data
+    _worker_data = (X, y, cv, seed)
+
+
+def evaluate(index, params, X, y, cv, seed):
+    """Egy jelölt CV pontossága; a foldok minden jelöltnél azonosak."""
+    from sklearn.model_selection import StratifiedKFold, cross_val_score
+    from sklearn.tree import DecisionTreeClassifier
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+    scores = cross_val_score(DecisionTreeClassifier(random_state=seed, **params), X, y, cv=folds)
+    return {"index": index, "params": params, "cv_mean": float(scores.mean()), "cv_std": float(scores.std()),
+            "seconds": time.perf_counter() - started, "cpu_seconds": time.process_time() - cpu_started}
+
+
+def _evaluate_chunk(chunk, deadline):
+    X, y, cv, seed = _worker_data
+    results = []
+    for index, params in chunk:
+        if time.time() >= deadline:
+            break
+        results.append(evaluate(index, params, X, y, cv, seed))
+    return results
+
+
+def best_result(results):
+    """Legjobb CV átlag; egyenlőségnél a kisebb szórás, majd a korábbi jelölt nyer."""
+    return min(results, key=lambda r: (-r["cv_mean"], r["cv_std"], r["index"]))
+
+
+def run_sweep(X, y, params_list, workers=None, budget_seconds=None, cv=5, seed=42):
+    """
+    A jelöltek párhuzamos kiértékelése. Visszatér: (eredmények, összegzés); az összegzés a
+    fali időt, a jelöltek összesített CPU idejét (a soros futás becslése) és a kettő arányát
+    (speedup) tartalmazza. A CPU idő nem számolja bele, amíg a worker a CPU-ra várt.
+    """
+    workers = workers or os.cpu_count() or 1
+    X, y = np.asarray(X), np.asarray(y)
+    started = time.perf_counter()
+    deadline = time.time() + budget_seconds if budget_seconds else math.inf
+    indexed = list(enumerate(params_list))
+    # Workerenként néhány darab: kiegyensúlyozott terhelés, kevés IPC
+    chunk_size = max(1, math.ceil(len(indexed) / (workers * 4)))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+
+    results, collected = [], set()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y, cv, seed))
+    try:
+        futures = [executor.submit(_evaluate_chunk, chunk, deadline) for chunk in chunks]
+        remaining = None if deadline == math.inf else max(deadline - time.time(), 0)
+        try:
+            for future in as_completed(futures, timeout=remaining):
+                collected.add(future)
+                results.extend(future.result())
+        except TimeoutError:
+            pass
+    finally:
+        # A még el nem indult darabok törlése; a futók a határidő után már nem kezdenek új jelöltet
+        executor.shutdown(wait=True, cancel_futures=True)
+    for future in futures:
+        if future not in collected and not future.cancelled():
+            results.extend(future.result())
+
+    wall_seconds = time.perf_counter() - started
+    serial_seconds = sum(r["cpu_seconds"] for r in results)
+    results.sort(key=lambda r: r["index"])
+    summary = {
+        "candidates": len(params_list),
+        "completed": len(results),
+        "budget_exhausted": len(results) < len(params_list),
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "serial_seconds": round(serial_seconds, 3),
+        "speedup": round(serial_seconds / wall_seconds, 2) if wall_seconds > 0 else None,
+    }
+    return results, summary
+
+
+def run_serial(X, y, params_list, cv=5, seed=42):
+    """Ugyanazok a jelöltek egy folyamatban, a mért speedup alapjaként. Visszatér: a fali idő."""
+    started = time.perf_counter()
+    for index, params in enumerate(params_list):
+        evaluate(index, params, X, y, cv, seed)
+    return time.perf_counter() - started
+
+
+def log_candidates(client, experiment_id, parent_run_id, results):
+    """Jelöltenként egy beágyazott run, a paraméterek és metrikák egyetlen log_batch hívásban."""
+    from mlflow.entities import Metric, Param
+
+    timestamp = int(time.time() * 1000)
+    for result in results:
+        run_id = client.create_run(experiment_id, run_name=f"candidate-{result['index']}",
+                                   tags={MLFLOW_PARENT_RUN_ID_TAG: parent_run_id}).info.run_id
+        client.log_batch(
+            run_id,
+            metrics=[Metric("cv_accuracy_mean", result["cv_mean"], timestamp, 0),
+                     Metric("cv_accuracy_std", result["cv_std"], timestamp, 0),
+                     Metric("cv_seconds", result["seconds"], timestamp, 0)],
+            params=[Param(key, str(value)) for key, value in result["params"].items()])
+        client.set_terminated(run_id)
+
+
+def register_and_promote(model_uri, model_name, stage="Production"):
+    """Egyetlen registry verzió létrehozása és a stage beállítása. Visszatér: a verzió."""
+    import mlflow
+    from mlflow.tracking import MlflowClient
+
+    version = mlflow.register_model(model_uri, model_name).version
+    MlflowClient().transition_model_version_stage(name=model_name, version=version, stage=stage,
+                                                 archive_existing_versions=True)
+    return version
+
+
+def train_and_register(X_train, y_train, X_test, y_test, model_name, stage="Production", local_model_path=None,
+                       search="grid", n_iter=20, workers=None, budget_seconds=None, cv=5, seed=42,
+                       serial_baseline=False, tags=None):
+    """
+    Keresés, a győztes újratanítása a teljes tanító halmazon, logolás egy szülő run alá
+    (a jelöltek beágyazott run-ok, a tags a szülő run-ra kerül), majd a győztes regisztrálása
+    és előléptetése. A modell mellé (és a local_model_path pickle mellé) a kompakt (mmap)
+    artifact is kiíródik (compact_model).
+    Visszatér: az összegzés (győztes paraméterek, pontszámok, időzítések, registry verzió).
+    """
+    import tempfile
+
+    import compact_model
+    import joblib
+    import mlflow
+    import mlflow.sklearn
+    from mlflow.tracking import MlflowClient
+    from sklearn.metrics import accuracy_score
+    from sklearn.tree import DecisionTreeClassifier
+
+    params_list = candidates(search, n_iter, seed=seed)
+    print(f"Hiperparaméter-keresés: {len(params_list)} jelölt ({search}), {cv}-fold CV")
+    results, summary = run_sweep(X_train, y_train, params_list, workers, budget_seconds, cv, seed)
+    if not results:
+        raise RuntimeError(f"No candidate finished within the {budget_seconds}s budget")
+    if serial_baseline:
+        serial_wall = run_serial(np.asarray(X_train), np.asarray(y_train), params_list, cv, seed)
+        summary["serial_wall_seconds"] = round(serial_wall, 3)
+        summary["measured_speedup"] = round(serial_wall / summary["wall_seconds"], 2)
+
+    best = best_result(results)
+    clf = DecisionTreeClassifier(random_state=seed, **best["params"])
+    clf.fit(X_train, y_train)
+    test_accuracy = accuracy_score(y_test, clf.predict(X_test))
+    summary.update({"best_index": best["index"], "best_params": best["params"], "cv_accuracy": best["cv_mean"],
+                    "accuracy": test_accuracy})
+
+    if local_model_path:
+        joblib.dump(clf, local_model_path)
+        print(f"Saving model to local path: {local_model_path}")
+
+    client = MlflowClient()
+    with mlflow.start_run(run_name=f"{search}-sweep") as run:
+        log_candidates(client, run.info.experiment_id, run.info.run_id, results)
+        if tags:
+            mlflow.set_tags(tags)
+        mlflow.log_params({**{f"best_{key}": value for key, value in best["params"].items()},
+                           "model_type": "DecisionTreeClassifier", "search": search, "cv_folds": cv,
+                           "candidates": summary["candidates"], "workers": summary["workers"]})
+        mlflow.log_metrics({key: summary[key] for key in
+                            ("accuracy", "cv_accuracy", "completed", "wall_seconds", "serial_seconds", "speedup")})
+        with tempfile.TemporaryDirectory() as tmp:
+            compact = compact_model.export_sklearn(clf, tmp, local_model_path, model_name=model_name,
+                                                   run_id=run.info.run_id)
+            model_info = mlflow.sklearn.log_model(sk_model=clf, artifact_path="model",
+                                                  serialization_format="cloudpickle", extra_files=[compact])
+        summary["version"] = register_and_promote(model_info.model_uri, model_name, stage)
+        summary["run_id"] = run.info.run_id
+    print(f"Modell verzió {summary['version']} beállítva mint {stage}")
+    return summary
@@ -0,0 +1,92 @@
+"""
+HTTP kliens az Iris REST API-hoz (a Streamlit dashboard használja).
+
+- create_session(): keep-alive kapcsolat-pool; egy session sok kéréshez és szálhoz
+- predict_row(): egy sor a /predict végponton
+- score_frame(): egy teljes DataFrame a /predict/binary végponton, float32 darabokban,
+  több darab párhuzamosan úton; a haladást a darabok befejeződésekor jelzi
+"""
+
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+API_URL = os.environ.get("API_URL", "http://localhost:8000")
+FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+LABELS = ["setosa", "versicolor", "virginica"]
+
+# Soronként egy darabban; az API MAX_BATCH_SIZE értékénél nem lehet nagyobb
+CLIENT_BATCH_ROWS = int(os.environ.get("CLIENT_BATCH_ROWS", "10000"))
+# Egyszerre ennyi darab van úton (a pool ennek kétszerese)
+CLIENT_MAX_IN_FLIGHT = int(os.environ.get("CLIENT_MAX_IN_FLIGHT", "4"))
+CLIENT_TIMEOUT_SECONDS = float(os.environ.get("CLIENT_TIMEOUT_SECONDS", "30"))
+
+
+def create_session(pool_size=2 * CLIENT_MAX_IN_FLIGHT):
+    """requests.Session kapcsolat-pool-lal; a kapcsolatok a kérések között nyitva maradnak."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def predict_row(session, api_url, row):
+    """Egy sor (a FEATURE_NAMES sorrendjében) predikciója; visszatér: az osztály indexe."""
+    response = session.post(f"{api_url}/predict", json=dict(zip(FEATURE_NAMES, row)),
+                            timeout=CLIENT_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.json()["prediction"]
+
+
+def read_upload(name, content):
+    """Feltöltött CSV vagy Parquet fájl DataFrame-ként; a jellemző oszlopoknak meg kell lenniük."""
+    import pandas as pd
+
+    if name.lower().endswith(".parquet"):
+        frame = pd.read_parquet(io.BytesIO(content))
+    else:
+        frame = pd.read_csv(io.BytesIO(content))
+    missing = [column for column in FEATURE_NAMES if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return frame
+
+
+def _score_chunk(session, api_url, chunk):
+    response = session.post(f"{api_url}/predict/binary", data=chunk.tobytes(),
+                            headers={"Content-Type": "application/octet-stream"}, timeout=CLIENT_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    predictions = np.frombuffer(response.content, dtype=np.uint8)
+    if len(predictions) != len(chunk):
+        raise ValueError(f"Expected {len(chunk)} predictions, got {len(predictions)}")
+    return predictions, response.headers.get("X-Model-Version")
+
+
+def score_frame(session, api_url, frame, batch_rows=CLIENT_BATCH_ROWS, max_in_flight=CLIENT_MAX_IN_FLIGHT,
+                on_progress=None):
+    """
+    A DataFrame összes sorának predikciója. on_progress(kész sorok, összes sor) minden darab
+    befejezésekor hívódik. Visszatér: (uint8 predikciók a bemenet sorrendjében, modell verziók halmaza).
+    """
+    data = np.ascontiguousarray(frame[FEATURE_NAMES].to_numpy(dtype="<f4"))
+    predictions = np.empty(len(data), dtype=np.uint8)
+    versions = set()
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {executor.submit(_score_chunk, session, api_url, data[start:start + batch_rows]): start
+                   for start in range(0, len(data), batch_rows)}
+        for future in as_completed(futures):
+            chunk_predictions, version = future.result()
+            start = futures[future]
+            predictions[start:start + len(chunk_predictions)] = chunk_predictions
+            versions.add(version)
+            done += len(chunk_predictions)
+            if on_progress is not None:
+                on_progress(done, len(data))
+    return predictions, versions
@@ -1,45 +1,312 @@
 """
-Airflow DAG az Iris ML pipeline automatizálásához.
-Lépések: modell tanítás, MLflow log, Neptune.ai monitoring.
+Az Iris ML pipeline: modell tanítás és MLflow log, majd Neptune.ai drift monitoring.
+
+A lépések folyamaton belül hívható függvények (nincs új Python folyamat és újabb mlflow
+import lépésenként). Minden lépés ujjlenyomatot számol a bemeneteiből (adat hash, paraméterek,
+kód verzió, a megelőző lépések kimenetei). Ha ez az utolsó sikeres futás óta nem változott, és
+a korábbi kimenetek még megvannak, a lépés kimarad, és az előző kimenetei (MLflow run,
+registry verzió) mennek tovább. Az állapot a PIPELINE_STATE_PATH JSON fájlban van.
+
+Futtatás:
+- Airflow DAG (ha az airflow telepítve van): ugyanezeket a lépéseket hívja
+- helyben, ütemező nélkül: python src/iris_ml_pipeline.py [--force] [--only train_and_log_model]
 """
 
-from airflow import DAG
-from airflow.operators.python import PythonOperator
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
 from datetime import datetime
-import subprocess
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SRC_DIR)
+
+PIPELINE_STATE_PATH = os.environ.get("PIPELINE_STATE_PATH", "pipeline_state.json")
+
+
+def fingerprint(parts):
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+
+def code_version(*filenames):
+    """A lépés forrásfájljainak tartalom-hash-e."""
+    from dataset_cache import file_fingerprint
+    return {name: file_fingerprint(os.path.join(SRC_DIR, name)) for name in filenames}
+
+
+def function_version(filename, name):
+    """Egy modul szintű függvény forrásának hash-e (a fájl többi részének változása nem számít)."""
+    import ast
+
+    with open(os.path.join(SRC_DIR, filename)) as f:
+        source = f.read()
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            segment = ast.get_source_segment(source, node)
+            return hashlib.blake2b(segment.encode(), digest_size=16).hexdigest()
+    raise LookupError(f"{filename} has no function {name}")
+
+
+def directory_listing(path):
+    """Fájlnév -> (méret, mtime) egy könyvtárban (csak stat), a napló-jellegű bemenetekhez."""
+    if not os.path.isdir(path):
+        return {}
+    return {entry.name: (entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(path) if entry.is_file()}
+
+
+class Step:
+    """
+    Egy pipeline lépés. inputs(upstream) -> a bemenetek leírása (ebből lesz az ujjlenyomat);
+    run(upstream, fingerprint) -> kimenetek dict; verify(outputs) -> a korábbi kimenetek még
+    használhatók-e. Az upstream a függő lépések kimenetei lépésnév szerint.
+    """
+
+    def __init__(self, name, run, inputs, depends_on=(), verify=None):
+        self.name = name
+        self.run = run
+        self.inputs = inputs
+        self.depends_on = tuple(depends_on)
+        self.verify = verify
+
+
+class Pipeline:
+    """A lépések sorrendben (a függőségek előbb), Airflow nélkül is futtatható."""
+
+    def __init__(self, steps, state_path=PIPELINE_STATE_PATH):
+        self.steps = {step.name: step for step in steps}
+        self.state_path = state_path
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp, self.state_path)
+
+    def run_step(self, name, force=False):
+        """
+        Egy lépés: kimarad, ha az ujjlenyomat nem változott és a kimenetek megvannak, különben fut.
+        Visszatér: {"step", "status": "ran"|"skipped", "seconds", "fingerprint", "outputs"}.
+        """
+        started = time.perf_counter()
+        step = self.steps[name]
+        state = self.load_state()
+        missing = [dep for dep in step.depends_on if dep not in state]
+        if missing:
+            raise RuntimeError(f"Step {name} needs {', '.join(missing)} to have run first")
+        upstream = {dep: state[dep]["outputs"] for dep in step.depends_on}
+        step_fingerprint = fingerprint({"inputs": step.inputs(upstream), "upstream": upstream})
+
+        previous = state.get(name)
+        if (not force and previous is not None and previous["fingerprint"] == step_fingerprint
+                and (step.verify is None or step.verify(previous["outputs"]))):
+            return {"step": name, "status": "skipped", "seconds": round(time.perf_counter() - started, 3),
+                    "fingerprint": step_fingerprint, "outputs": previous["outputs"]}
+
+        outputs = step.run(upstream, step_fingerprint)
+        state = self.load_state()
+        state[name] = {"fingerprint": step_fingerprint, "outputs": outputs, "finished_at": time.time()}
+        self.save_state(state)
+        return {"step": name, "status": "ran", "seconds": round(time.perf_counter() - started, 3),
+                "fingerprint": step_fingerprint, "outputs": outputs}
+
+    def run(self, force=False, only=None):
+        """Az összes (vagy az `only`) lépés sorrendben; hiba után a többi lépés "blocked"."""
+        reports = []
+        failed = False
+        for name in self.steps:
+            if only and name not in only:
+                continue
+            if failed:
+                reports.append({"step": name, "status": "blocked", "seconds": 0.0})
+                continue
+            started = time.perf_counter()
+            try:
+                reports.append(self.run_step(name, force))
+            except Exception as e:
+                failed = True
+                reports.append({"step": name, "status": "failed", "seconds": round(time.perf_counter() - started, 3),
+                                "error": f"{type(e).__name__}: {e}"})
+        return reports
+
+
+# --- Iris lépések ---
+
+def training_params():
+    """A tanítás eredményét befolyásoló beállítások (a workerek száma nem ilyen)."""
+    return {
+        "sweep": os.environ.get("TRAINING_SWEEP") or None,
+        "n_iter": int(os.environ.get("TRAINING_SWEEP_ITER", "20")),
+        "budget_seconds": float(os.environ.get("TRAINING_SWEEP_BUDGET_SECONDS", "0")) or None,
+        "cv": 5,
+        "test_size": 0.2,
+        "random_state": 42,
+        "tracking_uri": os.environ.get("MLFLOW_TRACKING_URI", "http://localhost:5000"),
+    }
+
+
+def training_inputs(upstream):
+    from importlib.metadata import version
+    from dataset_cache import file_fingerprint, iris_source_path
+
+    # A csomag verziója a metadatából: a sklearn importja lassabb lenne, mint a kimaradó lépés.
+    # Az api.py-ből csak a train_model számít (a kiszolgálás módosítása nem ad új tanítást);
+    # a kompakt artifactot és a betöltést meghatározó modulok egészben.
+    code = code_version("hyperparameter_sweep.py", "dataset_cache.py", "compact_model.py", "tree_engine.py",
+                        "model_loading.py")
+    code["api.py:train_model"] = function_version("api.py", "train_model")
+    return {"data": file_fingerprint(iris_source_path()), "params": training_params(), "code": code,
+            "sklearn": version("scikit-learn")}
+
+
+def run_training(upstream, step_fingerprint):
+    import api
+
+    params = training_params()
+    summary = api.train_model(params["sweep"], params["n_iter"], budget_seconds=params["budget_seconds"],
+                              cv=params["cv"], tags={"pipeline.fingerprint": step_fingerprint}, raise_errors=True)
+    return {"run_id": summary["run_id"], "version": summary["version"], "accuracy": summary.get("accuracy"),
+            "dataset_key": summary["dataset_key"], "local_model_path": api.LOCAL_MODEL_PATH,
+            "local_model_mtime_ns": os.stat(api.LOCAL_MODEL_PATH).st_mtime_ns}
+
+
+def verify_training(outputs):
+    """
+    A korábbi modell fájl még ugyanaz (senki nem írta felül), és a rögzített run és registry
+    verzió még létezik (pl. a registry_index gc nem törölte).
+    """
+    path = outputs.get("local_model_path")
+    if not (path and os.path.exists(path) and os.stat(path).st_mtime_ns == outputs["local_model_mtime_ns"]):
+        return False
+    return registry_entries_exist(outputs.get("run_id"), outputs.get("version"))
+
+
+def registry_entries_exist(run_id, version):
+    """
+    A run (nem törölt) és a regisztrált verzió (ehhez a run-hoz) megvan-e. Helyi mlruns tárnál a
+    registry_index indexéből, egyébként az MLflow kliensen át.
+    """
+    from model_loading import MODEL_NAME, REGISTRY_INDEX_MLRUNS
+
+    if not run_id or version is None:
+        return False
+    if REGISTRY_INDEX_MLRUNS:
+        from registry_index import RegistryIndex
+
+        index = RegistryIndex(REGISTRY_INDEX_MLRUNS)
+        index.refresh()
+        runs = {run["run_id"]: run for run in index.runs()}
+        return (runs.get(run_id, {}).get("lifecycle_stage") == "active"
+                and any(str(row["version"]) == str(version) and row["run_id"] == run_id
+                        for row in index.versions(MODEL_NAME)))
+
+    from mlflow.exceptions import MlflowException
+    from mlflow.tracking import MlflowClient
+
+    client = MlflowClient()
+    try:
+        model_version = client.get_model_version(MODEL_NAME, str(version))
+        return model_version.run_id == run_id and client.get_run(run_id).info.lifecycle_stage == "active"
+    except MlflowException:
+        return False
+
+
+def monitoring_inputs(upstream):
+    import neptuneai_monitoring as monitoring
+
+    return {"prediction_log": directory_listing(monitoring.PREDICTION_LOG_DIR),
+            "params": {"bucket_seconds": monitoring.DRIFT_BUCKET_SECONDS,
+                       "window_buckets": monitoring.DRIFT_WINDOW_BUCKETS, "sinks": monitoring.MONITORING_SINKS},
+            "code": code_version("neptuneai_monitoring.py", "drift.py", "prediction_log.py", "metrics_sink.py")}
+
+
+def run_monitoring(upstream, step_fingerprint):
+    import neptuneai_monitoring as monitoring
+
+    report = monitoring.main([])
+    return {"records": report["records"], "new_records": report["new_records"],
+            "drifted_features": report["drifted_features"]}
+
+
+PIPELINE = Pipeline([
+    Step("train_and_log_model", run_training, training_inputs, verify=verify_training),
+    Step("run_neptune_monitoring", run_monitoring, monitoring_inputs, depends_on=["train_and_log_model"]),
+])
+
 
 def train_and_log_model():
-    # Jupyter notebook vagy script futtatása a modell tanításához és MLflow logoláshoz
-    subprocess.run(['python', 'api.py'], check=True)
+    # Modell tanítás és MLflow logolás; kimarad, ha sem az adat, sem a paraméterek, sem a kód nem változott
+    return PIPELINE.run_step("train_and_log_model")
+
 
 def run_neptune_monitoring():
-    # Neptune.ai monitoring script futtatása
-    subprocess.run(['python', 'neptuneai_monitoring.py'], check=True)
-
-default_args = {
-    'owner': 'airflow',
-    'start_date': datetime(2024, 1, 1),
-    'retries': 1
-}
-
-dag = DAG(
-    'iris_ml_pipeline',
-    default_args=default_args,
-    description='Iris ML pipeline: train, log, monitor',
-    schedule_interval=None,
-    catchup=False
-)
-
-train_log_task = PythonOperator(
-    task_id='train_and_log_model',
-    python_callable=train_and_log_model,
-    dag=dag
-)
-
-monitoring_task = PythonOperator(
-    task_id='run_neptune_monitoring',
-    python_callable=run_neptune_monitoring,
-    dag=dag
-)
-
-train_log_task >> monitoring_task
+    # Drift monitoring az új predikciós rekordokon
+    return PIPELINE.run_step("run_neptune_monitoring")
+
+
+try:
+    from airflow import DAG
+    from airflow.operators.python import PythonOperator
+except ImportError:
+    DAG = None
+
+if DAG is not None:
+    default_args = {
+        'owner': 'airflow',
+        'start_date': datetime(2024, 1, 1),
+        'retries': 1
+    }
+
+    dag = DAG(
+        'iris_ml_pipeline',
+        default_args=default_args,
+        description='Iris ML pipeline: train, log, monitor',
+        schedule_interval=None,
+        catchup=False
+    )
+
+    train_log_task = PythonOperator(
+        task_id='train_and_log_model',
+        python_callable=train_and_log_model,
+        dag=dag
+    )
+
+    monitoring_task = PythonOperator(
+        task_id='run_neptune_monitoring',
+        python_callable=run_neptune_monitoring,
+        dag=dag
+    )
+
+    train_log_task >> monitoring_task
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Iris ML pipeline locally, without an Airflow scheduler")
+    parser.add_argument("--force", action="store_true", help="Run every step even if its inputs did not change")
+    parser.add_argument("--only", action="append", choices=list(PIPELINE.steps), help="Run only this step")
+    parser.add_argument("--state", default=PIPELINE_STATE_PATH)
+    args = parser.parse_args(argv)
+
+    PIPELINE.state_path = args.state
+    started = time.perf_counter()
+    reports = PIPELINE.run(args.force, args.only)
+    total = time.perf_counter() - started
+    print()
+    for report in reports:
+        print(f"{report['step']:<28} {report['status']:<8} {report['seconds']:>8.3f} s"
+              + (f"  {report['error']}" if "error" in report else ""))
+    print(f"{'total':<28} {'':<8} {total:>8.3f} s")
+    print(json.dumps({"steps": reports, "seconds": round(total, 3)}, default=str))
+    return 1 if any(report["status"] == "failed" for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+Cserélhető, batch-elő metrika-kimenet a monitoring jobokhoz.
+
+A `log()` / `log_many()` csak egy korlátos bufferbe tesz; egy háttérszál batch-enként írja
+ki a backendbe, hiba esetén exponenciális backoff-fal újrapróbálja. A számítás így sosem vár
+a hálózatra, és a futásidő nem nő a metrika-kulcsok számával. Ha a buffer tele van, vagy az
+újrapróbálkozások elfogynak, a rekordok eldobódnak (számolva: `dropped`, `failed`).
+
+Backendek:
+- FileSink: NDJSON fájl, hálózat nélkül (offline futtatáshoz és ellenőrzéshez)
+- MlflowSink: MlflowClient.log_batch, legfeljebb 1000 metrika hívásonként
+- NeptuneSink: szám értékek sorozatként (`extend`, lépéssel és időbélyeggel), a többi `run.assign()`-nal
+
+create_sink("file:drift_metrics.ndjson,mlflow,neptune") több backendet is összefog.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+# Az MLflow log_batch hívásonként legfeljebb ennyi metrikát fogad el
+MLFLOW_MAX_METRICS_PER_BATCH = 1000
+
+
+class MetricsSink:
+    """Bufferelt, háttérben író alaposztály; a backendek a `_write(records)`-ot valósítják meg."""
+
+    def __init__(self, batch_size=1000, flush_seconds=1.0, max_buffer=100_000, max_retries=5,
+                 retry_initial_seconds=0.5, retry_max_seconds=30.0):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.retry_initial_seconds = retry_initial_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closing = threading.Event()
+        self._flush_requested = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_error = None
+
+    # --- számítás oldal: sosem blokkol ---
+
+    def log(self, key, value, step=None, timestamp=None):
+        self.log_many({key: value}, step, timestamp)
+
+    def log_many(self, values, step=None, timestamp=None):
+        """Több kulcs egy lépésben; a nem szám értékek (pl. szöveg) is átmennek a backendnek."""
+        timestamp = time.time() if timestamp is None else timestamp
+        records = [(key, value, step, timestamp) for key, value in values.items()]
+        with self._lock:
+            room = self.max_buffer - len(self._buffer)
+            if room < len(records):
+                self.dropped += len(records) - max(room, 0)
+                records = records[:max(room, 0)]
+            self._buffer.extend(records)
+            self.logged += len(records)
+            self._idle.clear()
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+        self._ensure_thread()
+
+    # --- háttér író ---
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{type(self).__name__}-flush", daemon=True)
+            self._thread.start()
+
+    def _take(self):
+        with self._lock:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            return batch
+
+    def _write_with_retries(self, batch):
+        delay = self.retry_initial_seconds
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write(batch)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if attempt == self.max_retries or (self._closing.is_set() and attempt >= 1):
+                    break
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max_seconds)
+        self.failed += len(batch)
+        print(f"[{type(self).__name__}] dropped {len(batch)} metrics: {self.last_error}", file=sys.stderr)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    self._idle.set()
+                    if self._closing.is_set():
+                        return
+                self._wakeup.wait_for(lambda: len(self._buffer) >= self.batch_size or self._flush_requested
+                                      or self._closing.is_set(), self.flush_seconds)
+                self._flush_requested = False
+            batch = self._take()
+            if batch:
+                self._write_with_retries(batch)
+
+    def flush(self, timeout=None):
+        """Megvárja, amíg a buffer kiürül (legfeljebb timeout másodpercig). Visszatér: True, ha kiürült."""
+        with self._lock:
+            self._flush_requested = True
+            self._wakeup.notify()
+        return self._idle.wait(timeout)
+
+    def close(self, timeout=30.0):
+        """
+        A maradék kiírása legfeljebb timeout másodpercig, majd a backend lezárása.
+        Lezárásnál a hibás batch-et legfeljebb egyszer próbálja újra, hogy a job ne akadjon el.
+        """
+        self._closing.set()
+        with self._lock:
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self._close()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+
+    def stats(self):
+        return {"logged": self.logged, "written": self.written, "dropped": self.dropped, "failed": self.failed,
+                "retries": self.retries, "buffered": len(self._buffer), "last_error": self.last_error}
+
+    # --- backend ---
+
+    def _write(self, records):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class FileSink(MetricsSink):
+    """Soronként egy JSON: {"key", "value", "step", "timestamp"}; hozzáfűz a fájlhoz."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._file = None
+
+    def _write(self, records):
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write("".join(
+            json.dumps({"key": key, "value": value, "step": step, "timestamp": timestamp}) + "\n"
+            for key, value, step, timestamp in records))
+        self._file.flush()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class MlflowSink(MetricsSink):
+    """
+    MLflow run-ba ír log_batch-csel; a szám értékek metrikák, a többi tag lesz.
+    A run az első íráskor jön létre (a háttérszálon), így az MLflow elérése nem lassítja a számítást.
+    """
+
+    def __init__(self, experiment_name="iris-monitoring", run_name="drift-monitoring", tracking_uri=None, **kwargs):
+        super().__init__(**kwargs)
+        self.experiment_name = experiment_name
+        self.run_name = run_name
+        self.tracking_uri = tracking_uri
+        self._client = None
+        self.run_id = None
+
+    def _start(self):
+        from mlflow.tracking import MlflowClient
+
+        client = MlflowClient(tracking_uri=self.tracking_uri)
+        experiment = client.get_experiment_by_name(self.experiment_name)
+        experiment_id = experiment.experiment_id if experiment else client.create_experiment(self.experiment_name)
+        self.run_id = client.create_run(experiment_id, run_name=self.run_name).info.run_id
+        self._client = client
+
+    def _write(self, records):
+        from mlflow.entities import Metric, RunTag
+
+        if self._client is None:
+            self._start()
+        metrics, tags = [], []
+        for key, value, step, timestamp in records:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metrics.append(Metric(key, float(value), int(timestamp * 1000), int(step or 0)))
+            else:
+                tags.append(RunTag(key, str(value)))
+        for start in range(0, max(len(metrics), 1), MLFLOW_MAX_METRICS_PER_BATCH):
+            chunk = metrics[start:start + MLFLOW_MAX_METRICS_PER_BATCH]
+            self._client.log_batch(self.run_id, metrics=chunk, tags=tags if start == 0 else [])
+
+    def _close(self):
+        if self._client is not None:
+            self._client.set_terminated(self.run_id)
+
+
+class NeptuneSink(MetricsSink):
+    """
+    Neptune.ai run. A szám értékek kulcsonként sorozatba kerülnek (batch-enként egy
+    `run[kulcs].extend()` a lépésekkel és időbélyegekkel), így a korábbi értékek megmaradnak;
+    a többi érték (pl. szöveg) egyetlen `run.assign()` hívással, a "/"-lel tagolt kulcsokból épített
+    beágyazott dict-tel. Hitelesítés: a `credentials` modul, vagy a NEPTUNE_PROJECT /
+    NEPTUNE_API_TOKEN környezeti változók.
+    """
+
+    def __init__(self, project=None, api_token=None, tags=("monitoring", "drift", "iris-dataset"), **kwargs):
+        super().__init__(**kwargs)
+        self.project = project
+        self.api_token = api_token
+        self.tags = list(tags)
+        # Nem `_run`: az az alaposztály háttérszálának a metódusa
+        self._neptune_run = None
+
+    def _start(self):
+        import neptune
+
+        project, api_token = self.project, self.api_token
+        if project is None:
+            try:
+                import credentials
+                project, api_token = credentials.neptune_ai.project, credentials.neptune_ai.api_token
+            except ImportError:
+                pass
+        self._neptune_run = neptune.init_run(project=project, api_token=api_token, tags=self.tags)
+
+    def _write(self, records):
+        if self._neptune_run is None:
+            self._start()
+        series, nested = {}, {}
+        for key, value, step, timestamp in records:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values, steps, timestamps = series.setdefault(key, ([], [], []))
+                values.append(float(value))
+                steps.append(step)
+                timestamps.append(timestamp)
+                continue
+            *namespaces, name = key.split("/")
+            node = nested
+            for namespace in namespaces:
+                node = node.setdefault(namespace, {})
+            node[name] = value
+        for key, (values, steps, timestamps) in series.items():
+            # Lépés nélküli rekordoknál a Neptune maga számozza a pontokat
+            self._neptune_run[key].extend(values, steps=None if None in steps else steps, timestamps=timestamps)
+        if nested:
+            self._neptune_run.assign(nested)
+
+    def _close(self):
+        if self._neptune_run is not None:
+            self._neptune_run.stop()
+
+
+class CompositeSink:
+    """Több sink együtt; ugyanazt az interfészt adja, a hibák sinkenként függetlenek."""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def log(self, key, value, step=None, timestamp=None):
+        for sink in self.sinks:
+            sink.log(key, value, step, timestamp)
+
+    def log_many(self, values, step=None, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        for sink in self.sinks:
+            sink.log_many(values, step, timestamp)
+
+    def flush(self, timeout=None):
+        return all([sink.flush(timeout) for sink in self.sinks])
+
+    def close(self, timeout=30.0):
+        # A sinkek párhuzamosan zárnak, így a teljes várakozás legfeljebb ~timeout
+        threads = [threading.Thread(target=sink.close, args=(timeout,)) for sink in self.sinks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stats(self):
+        return {f"{i}:{type(sink).__name__}": sink.stats() for i, sink in enumerate(self.sinks)}
+
+
+def create_sink(spec, **kwargs):
+    """
+    Sink a leírásból: vesszővel elválasztott lista, elemei "file[:útvonal]", "mlflow[:kísérlet]",
+    "neptune[:projekt]". Több elem esetén CompositeSink.
+    """
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, argument = item.partition(":")
+        if kind == "file":
+            sinks.append(FileSink(argument or "monitoring_metrics.ndjson", **kwargs))
+        elif kind == "mlflow":
+            sinks.append(MlflowSink(argument or "iris-monitoring", **kwargs))
+        elif kind == "neptune":
+            sinks.append(NeptuneSink(argument or None, **kwargs))
+        else:
+            raise ValueError(f"Unknown metrics sink: {kind}")
+    if not sinks:
+        raise ValueError("No metrics sink configured")
+    return sinks[0] if len(sinks) == 1 else CompositeSink(sinks)
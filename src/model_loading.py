@@ -0,0 +1,337 @@
+"""
+A kiszolgált modell feloldása és betöltése (ModelHolder), a bemenet ellenőrzése és a közös
+beállítások. Az API és a batch_score.py is ezt használja; a FastAPI alkalmazást nem építi fel.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import compact_model
+from observability import Registry, setup_logging
+from registry_index import RegistryIndex, local_mlruns_dir
+from tree_engine import TreeEngine
+
+logger = setup_logging("iris_api")
+
+# Configure MLflow properly for Docker (a már beállított értékeket nem írjuk felül)
+os.environ.setdefault("MLFLOW_TRACKING_URI", "http://localhost:5000")
+os.environ.setdefault("MLFLOW_ARTIFACT_ROOT", "file:///app/mlruns")
+
+# Modell neve és stage-je
+MODEL_NAME = "IrisDecisionTree"
+MODEL_STAGE = "Production"  # vagy "Staging"
+LOCAL_MODEL_PATH = os.environ.get("LOCAL_MODEL_PATH", "/tmp/iris_model.pkl")
+
+# A modell bemeneti oszlopai, ebben a sorrendben
+FEATURE_NAMES = ["sepal_length", "sepal_width", "petal_length", "petal_width"]
+
+# DecisionTreeClassifier modellnél a natív TreeEngine szolgál ki (pyfunc/sklearn ellenőrzés nélkül);
+# ha a modell mellett van kompakt artifact, a TreeEngine közvetlenül abból nyílik meg (mmap)
+NATIVE_TREE_ENGINE = os.environ.get("NATIVE_TREE_ENGINE", "true").lower() == "true"
+
+# Helyi mlruns tárnál (file store) a verzió feloldása a registry_index SQLite indexén át megy
+REGISTRY_INDEX_MLRUNS = (os.environ.get("REGISTRY_INDEX_MLRUNS")
+                         or local_mlruns_dir(os.environ["MLFLOW_TRACKING_URI"]))
+
+# Milyen gyakran nézzük meg a registry-ben, hogy változott-e a Production verzió (másodperc, 0 = soha)
+MODEL_REFRESH_SECONDS = float(os.environ.get("MODEL_REFRESH_SECONDS", "30"))
+
+# Metrikák (Prometheus szöveges formátum); az API ugyanebbe a registry-be regisztrál
+metrics = Registry()
+model_load_seconds = metrics.histogram("iris_model_load_seconds", "Model load time by source", ["source"])
+errors = metrics.counter("iris_errors_total", "Errors by type", ["type"])
+
+# Egy betöltött modell összes adata; immutable, így a csere egyetlen referencia-értékadás
+LoadedModel = namedtuple("LoadedModel", ["model", "version", "source", "uri", "loaded_at", "load_seconds", "engine",
+                                         "warmup_seconds"])
+
+# Betöltés után ezzel a sorral futtatunk egy predikciót, mielőtt a modell kiszolgálásba kerül
+WARMUP_ROW = np.array([[5.1, 3.5, 1.4, 0.2]])
+
+
+class ModelHolder:
+    """
+    Folyamatonként egyszer betöltött modell, háttérbeli frissítéssel.
+
+    A kérések a `get()`-tel kapott LoadedModel-t használják; új verzió esetén a
+    háttérszál előbb teljesen betölti az új modellt, és csak utána cseréli le a
+    referenciát, így futó kérés sosem lát félig betöltött modellt.
+
+    `version` megadásakor a holder ezt a rögzített verziót tölti be; `fallback_latest=False`
+    esetén stage-beli verzió hiányában nem a legújabb verzióra esik vissza, hanem hibát dob.
+    """
+
+    def __init__(self, name, stage, local_path=LOCAL_MODEL_PATH, refresh_seconds=MODEL_REFRESH_SECONDS,
+                 version=None, fallback_latest=True):
+        self.name = name
+        self.stage = stage
+        self.local_path = local_path
+        self.refresh_seconds = refresh_seconds
+        # True: a betöltést és a frissítést más végzi (pre-fork worker: a master), a start() nem csinál semmit
+        self.managed = False
+        self.pinned_version = str(version) if version is not None else None
+        self.fallback_latest = fallback_latest
+        self._current = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._index = RegistryIndex(REGISTRY_INDEX_MLRUNS) if REGISTRY_INDEX_MLRUNS else None
+
+    def resolve(self):
+        """
+        Megállapítja, melyik modellt kell kiszolgálni: (source, version, uri).
+        Sorrend: lokális pickle, a rögzített verzió, a stage aktuális verziója, végül a legújabb verzió.
+        """
+        if self.local_path and os.path.exists(self.local_path):
+            # Nanoszekundumos mtime és méret: az egy másodpercen belüli csere is új verzió
+            stat = os.stat(self.local_path)
+            return "local", f"mtime-{stat.st_mtime_ns}-size-{stat.st_size}", self.local_path
+        if self.pinned_version is not None:
+            return self._resolve_pinned()
+        if self._index is not None:
+            resolved = self._resolve_indexed()
+            if resolved is not None:
+                return resolved
+
+        # Az mlflow importja lassú, és a lokális modellhez nem kell
+        from mlflow.exceptions import MlflowException
+        from mlflow.tracking import MlflowClient
+
+        client = MlflowClient()
+        versions = client.search_model_versions(f"name='{self.name}'")
+        if not versions:
+            raise MlflowException(f"No versions found for model {self.name}")
+
+        staged = [int(mv.version) for mv in versions if mv.current_stage == self.stage]
+        if staged:
+            version = max(staged)
+            return "stage", str(version), f"models:/{self.name}/{version}"
+        if not self.fallback_latest:
+            raise MlflowException(f"No {self.stage} version found for model {self.name}")
+
+        latest_version = max(int(mv.version) for mv in versions)
+        logger.warning("stage_not_found", extra={"stage": self.stage, "latest_version": latest_version})
+        return "latest", str(latest_version), f"models:/{self.name}/{latest_version}"
+
+    def _resolve_indexed(self):
+        """
+        Feloldás az indexből: inkrementális frissítés (csak stat), majd egy indexelt lekérdezés.
+        Ha a verzió artifactja helyben megvan, azt tölti be, így a registry-t a betöltés sem olvassa.
+        Ha az index üres (pl. a tracking szerver nem ebbe a könyvtárba ír), None: marad az MLflow kliens.
+        """
+        self._index.refresh(runs=False)
+        row = self._index.lookup(self.name, self.stage)
+        source = "stage"
+        if row is None:
+            row = self._index.lookup(self.name)
+            if row is None:
+                return None
+            if not self.fallback_latest:
+                raise LookupError(f"No {self.stage} version found for model {self.name}")
+            source = "latest"
+            logger.warning("stage_not_found", extra={"stage": self.stage, "latest_version": row["version"]})
+        return source, str(row["version"]), row["local_path"] or f"models:/{self.name}/{row['version']}"
+
+    def _resolve_pinned(self):
+        """A rögzített verzió; ha az index ismeri és az artifact helyben van, a helyi útvonal."""
+        if self._index is not None:
+            self._index.refresh(runs=False)
+            for row in self._index.versions(self.name):
+                if str(row["version"]) == self.pinned_version and row["local_path"]:
+                    return "pinned", self.pinned_version, row["local_path"]
+        return "pinned", self.pinned_version, f"models:/{self.name}/{self.pinned_version}"
+
+    def _compact_artifact(self, source, uri, download_dir):
+        """
+        A kompakt artifact útvonala, vagy None: lokális modellnél a betöltendő pickle párja
+        (ugyanaz a név .tree kiterjesztéssel), helyi MLflow modell könyvtárnál az extra_files/model.tree,
+        registry URI-nál (models:/..., pl. távoli tracking szerver) az MLflow artifact API-val
+        a download_dir-be letöltött extra_files/model.tree.
+        """
+        if source == "local":
+            path = compact_model.local_path_for(uri)
+            return path if os.path.exists(path) else None
+        if os.path.isdir(uri):
+            return compact_model.artifact_path(uri)
+        if not uri.startswith("models:/"):
+            return None
+
+        import mlflow.artifacts
+        from mlflow.exceptions import MlflowException
+
+        try:
+            return mlflow.artifacts.download_artifacts(
+                artifact_uri=f"{uri}/{compact_model.ARTIFACT_SUBDIR}/{compact_model.ARTIFACT_FILENAME}",
+                dst_path=download_dir)
+        except (MlflowException, OSError) as e:
+            # Kompakt artifact nélkül regisztrált verzió: marad a pyfunc út
+            logger.info("compact_model_unavailable", extra={"uri": uri, "error": str(e)})
+            return None
+
+    def _load_compact(self, source, uri):
+        """
+        A kompakt artifact megnyitása; hiány, hibás fájl, vagy (lokális modellnél) más pickle-ből
+        készült fájl esetén None, és marad a pickle/pyfunc út.
+        """
+        if not NATIVE_TREE_ENGINE:
+            return None
+        download_dir = tempfile.mkdtemp(prefix="iris-compact-") if uri.startswith("models:/") else None
+        try:
+            path = self._compact_artifact(source, uri, download_dir)
+            if path is None:
+                return None
+            try:
+                engine, header = compact_model.load(path)
+            except (OSError, ValueError) as e:
+                errors.inc("compact_model")
+                logger.warning("compact_model_invalid", extra={"path": path, "error": str(e)})
+                return None
+            if source == "local" and not compact_model.matches_source(header, uri):
+                errors.inc("compact_model")
+                logger.warning("compact_model_stale", extra={"path": path, "pickle": uri})
+                return None
+            return engine
+        finally:
+            # A letöltött fájl mmap-je törlés után is érvényes (POSIX); Windows alatt a törlés elmarad
+            if download_dir is not None:
+                shutil.rmtree(download_dir, ignore_errors=True)
+
+    def load(self, source, version, uri):
+        """
+        A megadott modell betöltése és bemelegítése egy predikcióval (csere nélkül);
+        LoadedModel-t ad vissza. Ha van kompakt artifact, abból (mmap), különben joblib/pyfunc.
+        """
+        started = time.perf_counter()
+        model = self._load_compact(source, uri)
+        engine = "compact"
+        if model is None:
+            if source == "local":
+                import joblib
+                model = joblib.load(uri)
+            else:
+                import mlflow.pyfunc
+                model = mlflow.pyfunc.load_model(uri)
+            engine = "default"
+            if NATIVE_TREE_ENGINE:
+                tree_engine = TreeEngine.from_model(model)
+                if tree_engine is not None:
+                    model, engine = tree_engine, "native"
+        load_seconds = time.perf_counter() - started
+        model_load_seconds.observe(load_seconds, source)
+        started = time.perf_counter()
+        model.predict(WARMUP_ROW)
+        warmup_seconds = time.perf_counter() - started
+        logger.info("model_loaded", extra={"uri": uri, "version": version, "engine": engine,
+                                           "load_seconds": round(load_seconds, 6),
+                                           "warmup_seconds": round(warmup_seconds, 6)})
+        return LoadedModel(model, version, source, uri, time.time(), load_seconds, engine, warmup_seconds)
+
+    def refresh(self):
+        """
+        Újratölti a modellt, ha a feloldott verzió eltér a betöltöttől.
+        Visszatér: True, ha csere történt.
+        """
+        with self._load_lock:
+            source, version, uri = self.resolve()
+            current = self._current
+            if current is not None and (current.source, current.version) == (source, version):
+                return False
+            self._current = self.load(source, version, uri)
+            return True
+
+    def get(self):
+        """
+        Az aktuális modell; ha még nincs betöltve, szinkron betölti. `managed` holder nem tölt be
+        magától: modell nélkül LookupError (pre-fork worker, amíg a master nem tudta betölteni).
+        """
+        current = self._current
+        if current is None:
+            if self.managed:
+                raise LookupError(f"Model {self.name} is not loaded yet")
+            self.refresh()
+            current = self._current
+        return current
+
+    @property
+    def current(self):
+        """A kiszolgálásban lévő (bemelegített) LoadedModel betöltés nélkül, vagy None."""
+        return self._current
+
+    @property
+    def version(self):
+        """A betöltött modell verziója, vagy None."""
+        current = self._current
+        return current.version if current is not None else None
+
+    def info(self):
+        current = self._current
+        if current is None:
+            return {"loaded": False, "name": self.name, "stage": self.stage}
+        return {
+            "loaded": True,
+            "name": self.name,
+            "stage": self.stage,
+            "version": current.version,
+            "source": current.source,
+            "uri": current.uri,
+            "loaded_at": current.loaded_at,
+            "load_seconds": current.load_seconds,
+            "warmup_seconds": current.warmup_seconds,
+            "engine": current.engine,
+            **({"pinned_version": self.pinned_version} if self.pinned_version is not None else {}),
+        }
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # Ha már van modell, az marad kiszolgálásban
+                errors.inc("model_refresh")
+                logger.error("model_refresh_failed", extra={"kept_version": self.version, "error": str(e)})
+            if self.refresh_seconds <= 0 or self._stop.wait(self.refresh_seconds):
+                return
+
+    def start(self):
+        """
+        Háttérszál indítása: azonnal betölti a modellt, majd időközönként frissít.
+        Nem blokkolja az API indulását, ha az MLflow szerver még nem érhető el.
+        Ha a modell már be van töltve (pl. pre-fork master-ből örökölve) és
+        refresh_seconds <= 0, vagy a holder `managed`, nincs teendő.
+        """
+        if self.managed or (self.refresh_seconds <= 0 and self._current is not None):
+            return
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, name="model-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# A modell float32-ként hasonlít: a NaN, a végtelen és a float32-ben nem ábrázolható érték nem fogadható el
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+
+
+def check_finite(data, first_row=0):
+    """
+    Vektorizált ellenőrzés: minden érték véges és float32-ben ábrázolható szám (a NaN-t a
+    natív motor és az sklearn is elfogadná, de a szolgáltatás nem). Egyébként ValueError az
+    első hibás sorral (`first_row`-tól számozva).
+    """
+    finite = np.abs(data) <= FLOAT32_MAX
+    if not finite.all():
+        row = first_row + int(np.flatnonzero(~finite.all(axis=1))[0])
+        raise ValueError(f"Row {row} contains a non-finite value")
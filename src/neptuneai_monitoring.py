@@ -1,73 +1,156 @@
 """
-Neptune.ai monitoring script az Iris modellhez.
-Ez a script model teljesítményt és adatokat vizualizálja és rögzíti a Neptune.ai platformon.
+Drift monitoring az Iris modellhez a naplózott predikciós bemeneteken.
+
+Minden futás csak az előző futás óta a predikció-naplóba (PREDICTION_LOG_DIR) került új
+rekordokat olvassa be (LogCursor), és a drift.DriftEngine csúszó ablakát frissíti
+(Welford momentumok, fix bin-es hisztogramok). A PSI/KL/KS pontszámokat a tanító adatokból
+egyszer előállított referenciához (DRIFT_REFERENCE_PATH) számolja. Az állapot
+(ablak-szeletek és olvasási pozíciók) a DRIFT_STATE_PATH fájlban marad a futások között.
+
+Az eredmény a konzolra (JSON) kerül, a pontszámok pedig egy metrics_sink kimenetre
+(MONITORING_SINKS / --sink): alapból egy helyi NDJSON fájlba, és ha a `credentials` modul
+elérhető, Neptune.ai-ra is. A feltöltés háttérszálon, batch-enként történik.
+
+Használat:
+    python src/neptuneai_monitoring.py                 # egy futás
+    python src/neptuneai_monitoring.py --interval 60   # folyamatosan, percenként
+    python src/neptuneai_monitoring.py --sink file:drift_metrics.ndjson,mlflow
 """
 
-import pandas as pd
-from sklearn.datasets import load_iris
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-import neptune
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
+import json
+import os
+import sys
+import time
+
 import numpy as np
-import credentials
-
-# Adatok betöltése
-iris = load_iris()
-X = pd.DataFrame(iris.data, columns=iris.feature_names)
-y = pd.Series(iris.target, name='target')
-
-# Tanító és teszt adatok
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-train = X_train.copy()
-train['target'] = y_train.values
-test = X_test.copy()
-test['target'] = y_test.values
-
-# Neptune.ai kapcsolat inicializálása
-run = neptune.init_run(
-    project=credentials.neptune_ai.project,
-    api_token=credentials.neptune_ai.api_token,
-    tags=["monitoring", "iris-dataset"]
-)
-
-# Adat tulajdonságok monitorozása
-run["data/train_shape"] = train.shape
-run["data/test_shape"] = test.shape
-
-# Statisztikai adatok rögzítése
-train_stats = train.describe().to_dict()
-test_stats = test.describe().to_dict()
-run["data/train_stats"] = train_stats
-run["data/test_stats"] = test_stats
-
-# Feature eloszlások vizualizálása
-fig, axes = plt.subplots(2, 2, figsize=(15, 10))
-fig.suptitle("Feature Distributions: Train vs Test", fontsize=16)
-axes = axes.flatten()
-
-for i, feature in enumerate(iris.feature_names):
-    sns.histplot(train[feature], kde=True, ax=axes[i], color="blue", label="Train", alpha=0.5)
-    sns.histplot(test[feature], kde=True, ax=axes[i], color="red", label="Test", alpha=0.5)
-    axes[i].set_title(feature)
-    axes[i].legend()
-
-plt.tight_layout()
-run["visualizations/feature_distributions"].upload(fig)
-
-# Adatok közötti különbségek (drift) számítása
-for feature in iris.feature_names:
-    mean_diff = np.mean(test[feature]) - np.mean(train[feature])
-    std_diff = np.std(test[feature]) - np.std(train[feature])
-    run[f"drift/{feature}/mean_difference"] = mean_diff
-    run[f"drift/{feature}/std_difference"] = std_diff
-    
-    # KL divergencia vagy egyéb eltérési metrikák is számolhatók
-
-# Összefoglaló
-run["monitoring/summary"] = "A monitoring folyamat sikeresen befejeződött"
-
-# Neptune.ai kapcsolat lezárása
-run.stop()
-print('Neptune.ai monitoring jelentés elkészült és feltöltve a Neptune platformra')
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dataset_cache import iris_split
+from drift import FEATURE_NAMES, DriftEngine, DriftReference
+from metrics_sink import create_sink
+from prediction_log import LogCursor
+
+PREDICTION_LOG_DIR = os.environ.get("PREDICTION_LOG_DIR", "prediction_logs")
+DRIFT_REFERENCE_PATH = os.environ.get("DRIFT_REFERENCE_PATH", "drift_reference.json")
+DRIFT_STATE_PATH = os.environ.get("DRIFT_STATE_PATH", "drift_state.json")
+DRIFT_BUCKET_SECONDS = float(os.environ.get("DRIFT_BUCKET_SECONDS", "300"))
+DRIFT_WINDOW_BUCKETS = int(os.environ.get("DRIFT_WINDOW_BUCKETS", "12"))
+MONITORING_SINKS = os.environ.get("MONITORING_SINKS")
+MONITORING_SINK_CLOSE_TIMEOUT = float(os.environ.get("MONITORING_SINK_CLOSE_TIMEOUT", "30"))
+
+
+def build_reference(bins=10):
+    """Referencia a tanító halmazból (ugyanaz a cache-elt split, mint az api.py tanításánál)."""
+    return DriftReference.from_data(iris_split().X_train, FEATURE_NAMES, bins)
+
+
+def load_reference(path):
+    if os.path.exists(path):
+        return DriftReference.load(path)
+    reference = build_reference()
+    reference.save(path)
+    print(f"Drift referencia elmentve: {path}")
+    return reference
+
+
+def load_state(path, reference, bucket_seconds, window_buckets):
+    """
+    A mentett ablak és olvasási pozíciók. Ha az állapot más szelet-hosszal vagy szelet-számmal
+    készült, mint a kért, új ablak indul, és a napló a megmaradt fájlokból újraolvasódik.
+    """
+    if not os.path.exists(path):
+        return DriftEngine(reference, bucket_seconds, window_buckets), LogCursor()
+    with open(path) as f:
+        state = json.load(f)
+    engine = DriftEngine.from_dict(reference, state["engine"])
+    if (engine.bucket_seconds, engine.window_buckets) != (bucket_seconds, window_buckets):
+        print(f"A drift állapot (bucket_seconds={engine.bucket_seconds}, window_buckets={engine.window_buckets}) "
+              f"eltér a kérttől (bucket_seconds={bucket_seconds}, window_buckets={window_buckets}): "
+              "új ablak indul, a napló újraolvasásával")
+        return DriftEngine(reference, bucket_seconds, window_buckets), LogCursor()
+    return engine, LogCursor(state["offsets"])
+
+
+def save_state(path, engine, cursor):
+    # Atomi csere, hogy egy megszakított futás ne hagyjon félig írt állapotot
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"engine": engine.to_dict(), "offsets": cursor.offsets}, f)
+    os.replace(tmp, path)
+
+
+def run_once(engine, cursor, log_dir):
+    """Az új rekordok feldolgozása; visszatér a drift jelentéssel."""
+    started = time.perf_counter()
+    window_start = engine.report()["window_start"]
+    records = cursor.read_new(log_dir, min_ts=window_start)
+    if len(records):
+        engine.update(records["ts"].to_numpy(), records[FEATURE_NAMES].to_numpy(dtype=np.float64))
+    report = engine.report()
+    report["new_records"] = len(records)
+    # Nyitott Parquet fájl rekordjai csak a rotáció után kerülnek be (lásd PREDICTION_LOG_ROTATE_SECONDS)
+    report["pending_open_files"] = cursor.pending_open
+    report["seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def default_sink_spec():
+    """Helyi fájl mindig; Neptune.ai csak ha a `credentials` modul elérhető."""
+    try:
+        import credentials  # noqa: F401
+    except ImportError:
+        return "file:drift_metrics.ndjson"
+    return "file:drift_metrics.ndjson,neptune"
+
+
+def report_metrics(report):
+    """A jelentés lapos "drift/<jellemző>/<pontszám>" kulcsokra bontva."""
+    metrics = {
+        "drift/records": report["records"],
+        "drift/new_records": report["new_records"],
+        "drift/late_records": report["late_records"],
+        "drift/pending_open_files": report["pending_open_files"],
+        "drift/drifted_features": ",".join(report["drifted_features"]),
+    }
+    for feature, scores in report["features"].items():
+        for name, value in scores.items():
+            metrics[f"drift/{feature}/{name}"] = value
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental drift monitoring over the prediction log")
+    parser.add_argument("--log-dir", default=PREDICTION_LOG_DIR)
+    parser.add_argument("--reference", default=DRIFT_REFERENCE_PATH)
+    parser.add_argument("--state", default=DRIFT_STATE_PATH)
+    parser.add_argument("--bucket-seconds", type=float, default=DRIFT_BUCKET_SECONDS)
+    parser.add_argument("--window-buckets", type=int, default=DRIFT_WINDOW_BUCKETS)
+    parser.add_argument("--interval", type=float, default=0, help="Repeat every N seconds (0 = run once)")
+    parser.add_argument("--sink", default=MONITORING_SINKS,
+                        help="Metrics sinks, e.g. file:drift_metrics.ndjson,mlflow,neptune (default: file [+ neptune])")
+    parser.add_argument("--no-neptune", action="store_true", help="Do not upload to Neptune.ai (default sink only)")
+    args = parser.parse_args(argv)
+    spec = args.sink or ("file:drift_metrics.ndjson" if args.no_neptune else default_sink_spec())
+
+    reference = load_reference(args.reference)
+    engine, cursor = load_state(args.state, reference, args.bucket_seconds, args.window_buckets)
+    sink = create_sink(spec)
+    try:
+        while True:
+            report = run_once(engine, cursor, args.log_dir)
+            save_state(args.state, engine, cursor)
+            print(json.dumps(report, indent=2))
+            if report["new_records"]:
+                sink.log_many(report_metrics(report), step=engine.latest_bucket)
+            if args.interval <= 0:
+                break
+            time.sleep(args.interval)
+    finally:
+        sink.close(MONITORING_SINK_CLOSE_TIMEOUT)
+        print(f"Metrika kimenet: {json.dumps(sink.stats())}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
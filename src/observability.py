@@ -0,0 +1,300 @@
+"""
+Kis overheadű metrikák (Prometheus szöveges formátum) és strukturált logolás az API-hoz.
+
+Külső függőség nélkül: a hisztogramok fix bucket-ekkel, egy lock alatt frissülnek,
+a /metrics végpont a `registry.render()` kimenetét adja vissza.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Másodpercben; a 4 jellemzős predikció tipikusan 10 us - 10 ms között van
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=(), const=()):
+    pairs = list(const) + list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self, const_labels=()):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                labels = _format_labels(self.labelnames, labelvalues, const=const_labels)
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [bucket számlálók..., +Inf számláló, összeg]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return sum(series[:-1]) if series else 0
+
+    def render(self, const_labels=()):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labelvalues, list(series)) for labelvalues, series in self._series.items())
+        for labelvalues, series in snapshot:
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, [("le", _format_value(upper))], const_labels)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, const=const_labels)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Lekérdezéskor kiszámolt érték(ek): a callback {labelvalues: érték} dict-et ad vissza."""
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def render(self, const_labels=()):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labelvalues, value in sorted(self.callback().items()):
+            if value is not None:
+                labels = _format_labels(self.labelnames, labelvalues, const=const_labels)
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self._register(Gauge(name, documentation, callback, labelnames))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def families(self, const_labels=()):
+        """Metrikánként a sorok listája (HELP, TYPE, minták); a const_labels minden mintára rákerül."""
+        return [metric.render(const_labels) for metric in self.metrics]
+
+    def render(self, const_labels=()):
+        return merge_families([self.families(const_labels)])
+
+
+def merge_families(snapshots):
+    """
+    Több folyamat `Registry.families()` kimenete egyetlen Prometheus szöveggé: metrikánként
+    egyszer a HELP/TYPE fejléc, alatta az összes folyamat mintái (ezeket a const label választja el).
+    """
+    merged = {}
+    for families in snapshots:
+        for lines in families:
+            header, samples = lines[:2], lines[2:]
+            merged.setdefault(lines[0], (header, []))[1].extend(samples)
+    lines = [line for header, samples in merged.values() for line in header + samples]
+    return "\n".join(lines) + "\n"
+
+
+class WorkerMetrics:
+    """
+    Pre-fork workerek közös /metrics nézete. Minden worker `interval_seconds`-onként atomikusan
+    kiírja a saját metrikáit (worker_pid labellel) a `directory/<pid>.json` fájlba; a /metrics-et
+    kiszolgáló worker a sajátját frissen, a többiekét ezekből a fájlokból fésüli össze. A kilépett
+    workerek fájljait a master törli.
+    """
+
+    def __init__(self, registry, directory, interval_seconds=1.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{os.getpid()}.json")
+
+    def families(self):
+        return self.registry.families([("worker_pid", os.getpid())])
+
+    def write(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.families(), f)
+        os.replace(tmp_path, self.path)
+
+    def render(self):
+        snapshots = [self.families()]
+        own = os.path.basename(self.path)
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json") or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Közben kilépett worker
+                continue
+        return merge_families(snapshots)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def start(self):
+        self.write()
+        self._thread = threading.Thread(target=self._loop, name="worker-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: a teljes kérés idejét méri útvonalanként, és a scope state-be
+    teszi a kérés kezdetét ("request_started"). Ha a handler beállítja a
+    "handler_finished" időpontot, a válasz kezdetéig eltelt időt "serialize" szakaszként méri.
+    Opcionális `profiler` (SamplingProfiler): csak ha `armed`, akkor kérdezi meg, profilozza-e a kérést.
+    """
+
+    def __init__(self, app, request_seconds, stage_seconds, responses, profiler=None):
+        self.app = app
+        self.request_seconds = request_seconds
+        self.stage_seconds = stage_seconds
+        self.responses = responses
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        state = scope.setdefault("state", {})
+        state["request_started"] = started
+        status = 500
+        profiled = self.profiler is not None and self.profiler.armed and self.profiler.begin()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                handler_finished = state.get("handler_finished")
+                if handler_finished is not None:
+                    self.stage_seconds.observe(time.perf_counter() - handler_finished, "serialize")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Csak a regisztrált útvonalak, hogy a címkék száma korlátos maradjon
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            self.request_seconds.observe(time.perf_counter() - started, path)
+            self.responses.inc(path, str(status))
+            if profiled:
+                self.profiler.end()
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Egy sor = egy JSON objektum; az `extra` mezők is bekerülnek."""
+
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(name):
+    """
+    Logger a környezeti változók alapján:
+    API_LOG_ENABLED (true/false), API_LOG_LEVEL (pl. INFO, DEBUG), API_LOG_FORMAT (json/text).
+    """
+    logger = logging.getLogger(name)
+    if os.environ.get("API_LOG_ENABLED", "true").lower() != "true":
+        logger.disabled = True
+        return logger
+    logger.setLevel(os.environ.get("API_LOG_LEVEL", "INFO").upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        if os.environ.get("API_LOG_FORMAT", "json").lower() == "json":
+            handler.setFormatter(JsonLogFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,456 @@
+"""
+Nem blokkoló predikció-napló: minden kiszolgált predikció (bemenet, kimenet, modell verzió,
+késleltetés) egy korlátos, oszlopos ring bufferbe kerül, amelyet egy háttérszál
+batch-enként ír rotáló Parquet vagy NDJSON fájlokba.
+
+A kérés útja csak egy numpy szelet-másolást végez egy lock alatt. Ha a buffer tele van,
+a policy dönt: "drop" – a rekordok eldobódnak (számolva), "block" – a hívó legfeljebb
+block_timeout ideig vár helyre (backpressure), utána eldob.
+
+Fájlnevek: predictions-<első ts ms>-<utolsó ts ms>-<pid>.<parquet|ndjson>, így az
+időtartomány-olvasó (read_predictions) a fájlnév alapján kihagyja a nem érintett fájlokat,
+Parquet esetén pedig a sorcsoport-statisztikák alapján szűr. Az írási hiba miatt félbemaradt
+Parquet fájl .failed végződéssel karanténba kerül, ezeket az olvasók kihagyják.
+
+Olvasás parancssorból:
+    python src/prediction_log.py prediction_logs --start 2026-10-18T10:00 --end 2026-10-18T11:00
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from model_loading import FEATURE_NAMES
+
+COLUMNS = ["ts", "endpoint", "model_version"] + FEATURE_NAMES + ["prediction", "latency_ms"]
+FORMATS = {"parquet": ".parquet", "ndjson": ".ndjson"}
+OPEN_SUFFIX = ".inprogress"
+FAILED_SUFFIX = ".failed"
+
+
+class PredictionLogger:
+    def __init__(self, directory, file_format="parquet", capacity=100_000, policy="drop", block_timeout=0.1,
+                 flush_rows=10_000, flush_seconds=1.0, rotate_rows=1_000_000, rotate_seconds=3600.0):
+        if file_format not in FORMATS:
+            raise ValueError(f"Unsupported prediction log format: {file_format}")
+        if policy not in ("drop", "block"):
+            raise ValueError(f"Unsupported buffer-full policy: {policy}")
+        self.directory = directory
+        self.format = file_format
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        # Legkésőbb félig telt buffernél írunk, hogy a kérések ne fussanak bele a tele bufferbe
+        self.flush_rows = min(flush_rows, max(1, capacity // 2))
+        self.flush_seconds = flush_seconds
+        self.rotate_rows = rotate_rows
+        self.rotate_seconds = rotate_seconds
+
+        # Oszlopos ring buffer; head = a legrégebbi rekord, size = bufferelt rekordok
+        self._ts = np.zeros(capacity, dtype=np.float64)
+        self._features = np.zeros((capacity, len(FEATURE_NAMES)), dtype=np.float32)
+        self._prediction = np.zeros(capacity, dtype=np.int16)
+        self._latency_ms = np.zeros(capacity, dtype=np.float32)
+        self._endpoint = np.empty(capacity, dtype=object)
+        self._version = np.empty(capacity, dtype=object)
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._data = threading.Condition(self._lock)
+        self._flush_requested = False
+
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.quarantined = 0
+        self.files = 0
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- kérés oldal ---
+
+    def log(self, features, predictions, version, latency_ms, endpoint):
+        """
+        N rekord felvétele (features: N x 4, predictions: N). Visszatér: True, ha bekerült.
+        "block" policy mellett legfeljebb block_timeout másodpercet vár helyre.
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(-1, len(FEATURE_NAMES))
+        predictions = np.asarray(predictions).reshape(-1)
+        n = len(features)
+        if n == 0:
+            return True
+        with self._lock:
+            if self.capacity - self._size < n:
+                self._flush_requested = True
+                self._data.notify()
+                if self.policy == "block" and n <= self.capacity:
+                    self._space.wait_for(lambda: self.capacity - self._size >= n, self.block_timeout)
+                if self.capacity - self._size < n:
+                    self.dropped += n
+                    return False
+            # A lock alatt, így a buffer sorrendje a ts sorrendje (a fájlnév tartománya a batch min/max-a)
+            now = time.time()
+            start = (self._head + self._size) % self.capacity
+            first = min(n, self.capacity - start)
+            for target, source in ((slice(start, start + first), slice(0, first)),
+                                   (slice(0, n - first), slice(first, n))):
+                if source.stop > source.start:
+                    self._ts[target] = now
+                    self._features[target] = features[source]
+                    self._prediction[target] = predictions[source]
+                    self._latency_ms[target] = latency_ms
+                    self._endpoint[target] = endpoint
+                    self._version[target] = version
+            self._size += n
+            self.logged += n
+            if self._size >= self.flush_rows:
+                self._data.notify()
+        return True
+
+    def would_block(self, n=1):
+        """Igaz, ha n rekord most nem fér be (az async hívók ilyenkor threadpool-ban hívják a log-ot)."""
+        return self.capacity - self._size < n
+
+    # --- háttér író ---
+
+    def _take(self):
+        """A bufferelt rekordok kivétele oszloponként (másolat), a hely felszabadítása."""
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return None
+            indices = (self._head + np.arange(n)) % self.capacity
+            batch = {
+                "ts": self._ts[indices],
+                "endpoint": self._endpoint[indices],
+                "model_version": self._version[indices],
+                "features": self._features[indices],
+                "prediction": self._prediction[indices],
+                "latency_ms": self._latency_ms[indices],
+            }
+            self._endpoint[indices] = None
+            self._version[indices] = None
+            self._head = (self._head + n) % self.capacity
+            self._size = 0
+            self._flush_requested = False
+            self._space.notify_all()
+        return batch
+
+    def _open(self, first_ts):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"predictions-{int(first_ts * 1000):013d}-{os.getpid()}{FORMATS[self.format]}{OPEN_SUFFIX}"
+        # rows/bytes/first_ts/last_ts: csak a sikeresen kiírt batch-ek
+        self._file = {"path": os.path.join(self.directory, name), "first_ts": first_ts, "last_ts": first_ts,
+                      "rows": 0, "bytes": 0, "opened": time.monotonic(), "writer": None}
+
+    def _rotate(self, failed=False):
+        """
+        Az aktuális fájl lezárása és átnevezése a végleges, időtartományt tartalmazó névre.
+        Írási hiba után (failed) az NDJSON a félig kiírt sor előtt levágódik, és a korábban sikeresen
+        kiírt rekordokkal lezárul. A Parquet writer állapota hiba után nem megbízható, ezért a fájl
+        nem véglegesül: .failed végződéssel karanténba kerül (rekordjai a quarantined számlálóban).
+        Üres vagy érvénytelen fájlnál a részleges .inprogress fájl törlődik. Nem dob kivételt.
+        """
+        current, self._file = self._file, None
+        if current is None:
+            return
+        path = current["path"]
+        closed = True
+        if current["writer"] is not None:
+            try:
+                current["writer"].close()
+            except Exception:
+                self.write_errors += 1
+                closed = False
+        try:
+            if failed and self.format == "parquet" and current["rows"] > 0:
+                os.replace(path, path[:-len(OPEN_SUFFIX)] + FAILED_SUFFIX)
+                self.quarantined += current["rows"]
+                return
+            valid = current["rows"] > 0 and (closed or self.format == "ndjson")
+            if valid and self.format == "ndjson" and os.path.getsize(path) != current["bytes"]:
+                os.truncate(path, current["bytes"])
+            if valid:
+                final = os.path.join(self.directory, "predictions-{:013d}-{:013d}-{}{}".format(
+                    int(current["first_ts"] * 1000), int(current["last_ts"] * 1000), os.getpid(),
+                    FORMATS[self.format]))
+                os.replace(path, final)
+                self.files += 1
+                return
+        except OSError:
+            self.write_errors += 1
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            self.write_errors += 1
+
+    def _write(self, batch):
+        first_ts, last_ts = float(batch["ts"].min()), float(batch["ts"].max())
+        if self._file is None:
+            self._open(first_ts)
+        current = self._file
+        columns = {
+            "ts": batch["ts"],
+            "endpoint": batch["endpoint"],
+            "model_version": batch["model_version"],
+            **{name: batch["features"][:, i] for i, name in enumerate(FEATURE_NAMES)},
+            "prediction": batch["prediction"],
+            "latency_ms": batch["latency_ms"],
+        }
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.table({name: pa.array(values, type=pa.string()) if name in ("endpoint", "model_version")
+                              else pa.array(values) for name, values in columns.items()})
+            if current["writer"] is None:
+                current["writer"] = pq.ParquetWriter(current["path"], table.schema)
+            current["writer"].write_table(table)
+        else:
+            if current["writer"] is None:
+                current["writer"] = open(current["path"], "ab")
+            lists = {name: values.tolist() for name, values in columns.items()}
+            current["writer"].write("".join(
+                json.dumps(dict(zip(COLUMNS, row))) + "\n"
+                for row in zip(*(lists[name] for name in COLUMNS))).encode())
+            current["writer"].flush()
+            current["bytes"] = current["writer"].tell()
+        current["rows"] += len(batch["ts"])
+        current["first_ts"] = min(current["first_ts"], first_ts)
+        current["last_ts"] = max(current["last_ts"], last_ts)
+        self.written += len(batch["ts"])
+        if current["rows"] >= self.rotate_rows or time.monotonic() - current["opened"] >= self.rotate_seconds:
+            self._rotate()
+
+    def _flush(self):
+        batch = self._take()
+        if batch is None:
+            return
+        try:
+            self._write(batch)
+        except Exception:
+            # Az írási hiba nem állíthatja meg a kiszolgálást; a batch rekordjai elvesznek, a fájl
+            # lezárul, karanténba kerül vagy törlődik (_rotate), a következő batch újat nyit
+            self.write_errors += 1
+            self.dropped += len(batch["ts"])
+            self._rotate(failed=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                self._data.wait_for(lambda: self._size >= self.flush_rows or self._flush_requested
+                                    or self._stop.is_set(), self.flush_seconds)
+            self._flush()
+            if self._file is not None and time.monotonic() - self._file["opened"] >= self.rotate_seconds:
+                self._rotate()
+        self._flush()
+        self._rotate()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """A maradék rekordok kiírása és az aktuális fájl lezárása."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        with self._lock:
+            self._data.notify()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def stats(self):
+        return {
+            "enabled": True,
+            "directory": self.directory,
+            "format": self.format,
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "buffered": self._size,
+            "logged": self.logged,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "quarantined": self.quarantined,
+            "files": self.files,
+        }
+
+
+def _log_files(directory):
+    """A napló fájljai név szerint rendezve, a karanténba került (.failed) fájlok nélkül."""
+    return [path for path in sorted(glob.glob(os.path.join(directory, "predictions-*")))
+            if not path.endswith(FAILED_SUFFIX)]
+
+
+def _file_range(path):
+    """Lezárt fájl -> (első ts, utolsó ts) másodpercben, a fájlnévből; nyitott fájlnál (kezdet, None)."""
+    parts = os.path.basename(path).split(".")[0].split("-")
+    if path.endswith(OPEN_SUFFIX):
+        return int(parts[1]) / 1000, None
+    return int(parts[1]) / 1000, int(parts[2]) / 1000
+
+
+def read_predictions(directory, start=None, end=None, columns=None, include_open=True):
+    """
+    A [start, end) időtartomány rekordjai DataFrame-ként (ts szerint rendezve).
+    start/end: unix másodperc vagy datetime. A tartományon kívüli fájlokat meg sem nyitja;
+    a Parquet fájlokból a ts szűrés a sorcsoport-statisztikák alapján történik.
+    A nyitott NDJSON fájlt is olvassa (include_open), a nyitott Parquet-et nem (nincs még lábléce).
+    """
+    import pandas as pd
+
+    start = start.timestamp() if isinstance(start, datetime) else start
+    end = end.timestamp() if isinstance(end, datetime) else end
+    frames = []
+    for path in _log_files(directory):
+        is_open = path.endswith(OPEN_SUFFIX)
+        file_format = "parquet" if ".parquet" in path else "ndjson"
+        if is_open and (not include_open or file_format == "parquet"):
+            continue
+        first_ts, last_ts = _file_range(path)
+        if end is not None and first_ts >= end:
+            continue
+        if start is not None and last_ts is not None and last_ts < start:
+            continue
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            filters = [("ts", ">=", start)] if start is not None else []
+            filters += [("ts", "<", end)] if end is not None else []
+            frames.append(pq.read_table(path, columns=columns and list(dict.fromkeys(["ts"] + columns)),
+                                        filters=filters or None).to_pandas())
+        else:
+            frame = pd.read_json(path, lines=True, dtype={"model_version": str, "endpoint": str})
+            if len(frame):
+                mask = np.ones(len(frame), dtype=bool)
+                if start is not None:
+                    mask &= frame["ts"].to_numpy() >= start
+                if end is not None:
+                    mask &= frame["ts"].to_numpy() < end
+                frame = frame[mask]
+                frames.append(frame[list(dict.fromkeys(["ts"] + columns))] if columns else frame)
+    if not frames:
+        return pd.DataFrame(columns=columns or COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values("ts", kind="stable").reset_index(drop=True)
+
+
+class LogCursor:
+    """
+    Inkrementális olvasó: fájlonként (kezdő ts, pid) megjegyzi, meddig dolgozta fel
+    (NDJSON: bájt offset, a nyitott fájlban is; Parquet: csak lezárt fájl, egyszer egészben).
+    A read_new() így csak az új rekordokat adja, a korábbiakat nem olvassa újra.
+    Az állapot (offsets) JSON-ba menthető; a min_ts előtt véget ért fájlok kikerülnek belőle.
+    """
+
+    def __init__(self, offsets=None):
+        self.offsets = dict(offsets or {})
+        # Az utolsó read_new() által kihagyott, még nyitott (lábléc nélküli) Parquet fájlok száma
+        self.pending_open = 0
+
+    @staticmethod
+    def _key(path):
+        parts = os.path.basename(path).split(".")[0].split("-")
+        return f"{parts[1]}-{parts[-1]}"
+
+    def read_new(self, directory, min_ts=None):
+        """Az eddig nem látott rekordok DataFrame-ként; min_ts előtt véget ért fájlokat kihagy."""
+        import pandas as pd
+
+        frames = []
+        seen = set()
+        self.pending_open = 0
+        for path in _log_files(directory):
+            key = self._key(path)
+            seen.add(key)
+            first_ts, last_ts = _file_range(path)
+            if min_ts is not None and last_ts is not None and last_ts < min_ts:
+                self.offsets.pop(key, None)
+                continue
+            offset = self.offsets.get(key, 0)
+            if ".parquet" in path:
+                if path.endswith(OPEN_SUFFIX):
+                    self.pending_open += 1
+                    continue
+                if offset:
+                    continue
+                import pyarrow.parquet as pq
+
+                frame = pq.read_table(path).to_pandas()
+                self.offsets[key] = len(frame)
+            else:
+                try:
+                    with open(path, "rb") as f:
+                        f.seek(offset)
+                        data = f.read()
+                except FileNotFoundError:
+                    # Közben rotálódott; a lezárt nevén (azonos kulccsal) a következő futás olvassa
+                    continue
+                # Csak a teljes sorokat dolgozzuk fel; a félig kiírt sor a következő futásra marad
+                data = data[:data.rfind(b"\n") + 1]
+                if not data:
+                    continue
+                frame = pd.read_json(io.BytesIO(data), lines=True, dtype={"model_version": str, "endpoint": str})
+                self.offsets[key] = offset + len(data)
+            if len(frame):
+                frames.append(frame)
+        # A már nem létező fájlok (pl. törölt régi naplók) kikerülnek az állapotból
+        for key in set(self.offsets) - seen:
+            del self.offsets[key]
+        if not frames:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read logged predictions for a time range")
+    parser.add_argument("directory", help="Prediction log directory (PREDICTION_LOG_DIR)")
+    parser.add_argument("--start", help="Inclusive start, unix seconds or ISO time")
+    parser.add_argument("--end", help="Exclusive end, unix seconds or ISO time")
+    parser.add_argument("--output", help="Write the records to this CSV or Parquet file instead of a summary")
+    args = parser.parse_args(argv)
+
+    frame = read_predictions(args.directory, _parse_time(args.start), _parse_time(args.end))
+    if args.output:
+        if args.output.endswith(".parquet"):
+            frame.to_parquet(args.output, index=False)
+        else:
+            frame.to_csv(args.output, index=False)
+    summary = {"rows": len(frame)}
+    if len(frame):
+        summary.update(first=datetime.fromtimestamp(frame["ts"].iloc[0]).isoformat(),
+                       last=datetime.fromtimestamp(frame["ts"].iloc[-1]).isoformat(),
+                       by_version=frame["model_version"].value_counts().to_dict(),
+                       by_prediction={str(k): v for k, v in frame["prediction"].value_counts().to_dict().items()})
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
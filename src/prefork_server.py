@@ -0,0 +1,341 @@
+"""
+Pre-fork, több workeres kiszolgálás közös, csak olvasott modellel (csak POSIX).
+
+A master folyamat egyszer tölti be és melegíti be a modellt, majd N uvicorn workert
+forkol, amelyek copy-on-write módon osztoznak a modell memórialapjain, és ugyanazon a
+listening socketen fogadják a kéréseket. A workerek nem frissítenek maguktól: a master
+figyeli a registry-t, új verziónál betölti azt, elindít egy új worker generációt, és
+csak azután állítja le a régit, így minden worker együtt vált verziót. SHADOW_ENABLED mellett
+a challenger modellt is a master tölti be és figyeli; új challenger verzió szintén új generációt indít.
+Ha induláskor a modell nem tölthető be, a master ennek ellenére elindítja a workereket (a predikció
+500, a /readyz 503), PREFORK_LOAD_RETRY_SECONDS-onként újrapróbálja, és sikerkor új generációt indít.
+
+A régi generáció előbb SIGUSR1-et kap: DRAIN_SECONDS ideig még kiszolgál, de minden
+válaszra "Connection: close"-t tesz, hogy a keep-alive kliensek átkerüljenek az új
+workerekre; csak ezután kap SIGTERM-et.
+
+Használat:
+    python src/prefork_server.py --host 0.0.0.0 --port 8000 --workers 2
+SIGHUP: azonnali újratöltés (új generáció), SIGTERM/SIGINT: leállítás.
+
+A /metrics bármelyik workerre esik, minden worker mintáit visszaadja worker_pid labellel: a
+workerek PREFORK_METRICS_SECONDS-onként egy közös ideiglenes mappába írják a metrikáikat
+(observability.WorkerMetrics). A JSON stats végpontok és az /admin/profile workerenkéntiek,
+a válaszukban a worker_pid jelzi, melyik worker adta.
+"""
+
+import argparse
+import gc
+import os
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import api
+import model_loading
+from observability import WorkerMetrics
+
+# Ennyi ideig kap "Connection: close" válaszokat a régi generáció a SIGTERM előtt
+# (nagyobb, mint az uvicorn alapértelmezett 5 s-os keep-alive timeoutja)
+DRAIN_SECONDS = float(os.environ.get("PREFORK_DRAIN_SECONDS", "6"))
+# Ha induláskor a modell nem tölthető be (pl. sikertelen tanítás, még nem elérhető MLflow), a master
+# ilyen időközönként próbálja újra; addig a workerek 500-at adnak a predikciókra, a /readyz 503
+LOAD_RETRY_SECONDS = float(os.environ.get("PREFORK_LOAD_RETRY_SECONDS", "5"))
+# A workerek ilyen gyakran írják ki a metrikáikat a többi worker /metrics válaszához
+METRICS_SECONDS = float(os.environ.get("PREFORK_METRICS_SECONDS", "1"))
+
+
+def warm_up(holder):
+    """Betölti a modellt (ha kell); a ModelHolder.load betöltéskor egy predikcióval be is melegíti."""
+    return holder.get()
+
+
+class DrainingApp:
+    """ASGI wrapper: draining állapotban minden válaszhoz "Connection: close" fejlécet ad."""
+
+    def __init__(self, app):
+        self.app = app
+        self.draining = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.draining:
+            return await self.app(scope, receive, send)
+
+        async def send_with_close(message):
+            if message["type"] == "http.response.start":
+                headers = [(name, value) for name, value in message.get("headers", []) if name.lower() != b"connection"]
+                message = dict(message, headers=headers + [(b"connection", b"close")])
+            await send(message)
+
+        await self.app(scope, receive, send_with_close)
+
+
+class Worker:
+    def __init__(self, pid, ready_fd, generation):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.generation = generation
+        self.ready = False
+        self.stop_at = None
+
+
+class PreforkServer:
+    def __init__(self, host, port, workers, refresh_seconds, log_level="info"):
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.refresh_seconds = refresh_seconds
+        self.log_level = log_level
+        self.workers = {}
+        self.generation = 0
+        self._stopping = False
+        self._reload_requested = False
+        self.metrics_dir = None
+
+    def log(self, event, **fields):
+        api.logger.info(event, extra=dict(fields, role="prefork-master"))
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.socket = sock
+
+    def spawn_worker(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                self._run_worker(write_fd)
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        self.workers[pid] = Worker(pid, read_fd, self.generation)
+        return pid
+
+    def _run_worker(self, ready_fd):
+        import uvicorn
+
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, signal.SIG_DFL)
+        # A modell és a challenger a masterből öröklött; a worker egyiket sem tölti be vagy frissíti magától
+        # (ha a masterben nincs challenger, a workerben sincs, a sorok "unavailable"-ként számolódnak)
+        api.model_holder.managed = True
+        api.shadow_holder.managed = True
+        api.worker_metrics = WorkerMetrics(api.metrics, self.metrics_dir, METRICS_SECONDS)
+        app = DrainingApp(api.app)
+        signal.signal(signal.SIGUSR1, lambda signum, frame: setattr(app, "draining", True))
+        config = uvicorn.Config(app, log_level=self.log_level, lifespan="on")
+        server = uvicorn.Server(config)
+
+        def notify_ready():
+            while not server.started and not server.should_exit:
+                time.sleep(0.01)
+            os.write(ready_fd, b"1")
+            os.close(ready_fd)
+
+        threading.Thread(target=notify_ready, daemon=True).start()
+        server.run(sockets=[self.socket])
+
+    def wait_ready(self, pids, timeout=60):
+        """Megvárja, amíg a megadott workerek elindulnak. Visszatér: True, ha mind kész."""
+        deadline = time.monotonic() + timeout
+        pending = {self.workers[pid].ready_fd: self.workers[pid] for pid in pids if pid in self.workers}
+        while pending and time.monotonic() < deadline:
+            readable, _, _ = select.select(list(pending), [], [], max(0.0, deadline - time.monotonic()))
+            for fd in readable:
+                worker = pending.pop(fd)
+                worker.ready = bool(os.read(fd, 1))
+        return not pending and all(self.workers[pid].ready for pid in pids if pid in self.workers)
+
+    def start_generation(self):
+        """Új worker generáció a master aktuális modelljével; a régi generáció leállítása."""
+        old = [pid for pid, worker in self.workers.items() if worker.generation == self.generation]
+        self.generation += 1
+        # A fork előtti objektumokat a gc ne járja be, így nem másolódnak a lapok
+        gc.collect()
+        gc.freeze()
+        new = [self.spawn_worker() for _ in range(self.num_workers)]
+        ready = self.wait_ready(new)
+        self.log("generation_started", generation=self.generation, workers=new, ready=ready,
+                 model_version=api.model_holder.version)
+        for pid in old:
+            self.drain_worker(pid)
+
+    def drain_worker(self, pid):
+        """Connection: close a kliensek felé, majd DRAIN_SECONDS múlva SIGTERM (a fő ciklusból)."""
+        self.stop_worker(pid, signal.SIGUSR1)
+        self.workers[pid].stop_at = time.monotonic() + DRAIN_SECONDS
+
+    def stop_drained_workers(self):
+        now = time.monotonic()
+        for pid, worker in list(self.workers.items()):
+            if worker.stop_at is not None and worker.stop_at <= now:
+                worker.stop_at = None
+                self.stop_worker(pid)
+
+    def stop_worker(self, pid, signum=signal.SIGTERM):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """Kilépett workerek begyűjtése; az aktuális generáció kiesett workereit pótolja."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            os.close(worker.ready_fd)
+            # Kilépett worker metrikái ne kerüljenek többé a /metrics-be
+            try:
+                os.remove(os.path.join(self.metrics_dir, f"{pid}.json"))
+            except FileNotFoundError:
+                pass
+            if worker.generation == self.generation and not self._stopping:
+                self.log("worker_died", pid=pid, status=status)
+                self.spawn_worker()
+
+    def check_for_new_version(self):
+        try:
+            source, version, uri = api.model_holder.resolve()
+        except Exception as e:
+            self.log("resolve_failed", error=str(e))
+            return False
+        current = api.model_holder.get()
+        return (source, version) != (current.source, current.version)
+
+    def check_for_new_challenger(self):
+        """Van-e a betöltöttől eltérő challenger; feloldási hibánál (pl. nincs ilyen stage) marad a régi."""
+        if not api.SHADOW_ENABLED:
+            return False
+        try:
+            source, version, uri = api.shadow_holder.resolve()
+        except Exception:
+            return False
+        current = api.shadow_holder.current
+        return current is None or (source, version) != (current.source, current.version)
+
+    def load_challenger(self):
+        """
+        A challenger betöltése a masterben, a workerek ezt öröklik; hiba esetén a régi marad (vagy nincs).
+        Visszatér: True, ha a challenger verziója megváltozott.
+        """
+        if not api.SHADOW_ENABLED:
+            return False
+        previous = api.shadow_holder.version
+        try:
+            api.shadow_holder.refresh()
+        except Exception as e:
+            self.log("shadow_load_failed", error=str(e), kept_version=previous)
+            return False
+        if api.shadow_holder.version == previous:
+            return False
+        self.log("shadow_loaded", previous_version=previous, version=api.shadow_holder.version)
+        return True
+
+    def load_initial_model(self):
+        """Az első betöltés; hiba esetén a master modell nélkül indul, és később újrapróbálja."""
+        try:
+            loaded = warm_up(api.model_holder)
+        except Exception as e:
+            api.errors.inc("model_load")
+            self.log("model_load_failed", error=str(e), retry_seconds=LOAD_RETRY_SECONDS)
+            return False
+        self.log("model_warmed_up", version=loaded.version, load_seconds=loaded.load_seconds)
+        return True
+
+    def reload(self):
+        previous = api.model_holder.version
+        try:
+            api.model_holder.refresh()
+            warm_up(api.model_holder)
+        except Exception as e:
+            self.log("reload_failed", error=str(e), kept_version=previous)
+            return
+        self.log("model_reloaded", previous_version=previous, version=api.model_holder.version)
+        self.load_challenger()
+        self.start_generation()
+
+    def serve(self):
+        self.load_initial_model()
+        self.load_challenger()
+        self.bind()
+        self.metrics_dir = tempfile.mkdtemp(prefix="iris-prefork-metrics-")
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        self.start_generation()
+        next_check = time.monotonic() + self.refresh_seconds
+        next_retry = time.monotonic() + LOAD_RETRY_SECONDS
+        while not self._stopping:
+            time.sleep(0.2)
+            self.reap()
+            self.stop_drained_workers()
+            if self._reload_requested:
+                self._reload_requested = False
+                self.reload()
+            elif api.model_holder.current is None:
+                # Még nincs modell: a workerek modell nélkül futnak, sikeres betöltéskor új generáció indul
+                if time.monotonic() >= next_retry:
+                    next_retry = time.monotonic() + LOAD_RETRY_SECONDS
+                    self.reload()
+            elif self.refresh_seconds > 0 and time.monotonic() >= next_check:
+                next_check = time.monotonic() + self.refresh_seconds
+                if self.check_for_new_version():
+                    self.reload()
+                elif self.check_for_new_challenger() and self.load_challenger():
+                    self.start_generation()
+
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        deadline = time.monotonic() + 30
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self.stop_worker(pid, signal.SIGKILL)
+        self.socket.close()
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self._reload_requested = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker server with a shared read-only model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--refresh-seconds", type=float, default=model_loading.MODEL_REFRESH_SECONDS,
+                        help="Registry polling interval in the master (0 = never)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("prefork_server.py requires os.fork(); use 'uvicorn src.api:app' on this platform")
+    PreforkServer(args.host, args.port, args.workers, args.refresh_seconds, args.log_level).serve()
+
+
+if __name__ == "__main__":
+    main()
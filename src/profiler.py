@@ -0,0 +1,233 @@
+"""
+Bekapcsolható mintavételező profiler a kérés-úthoz (flamegraph-kompatibilis kimenettel).
+
+Kikapcsolva a kérésenkénti költség egyetlen attribútum-ellenőrzés (`armed`), háttérszál nem fut.
+Két mód:
+- 1/N kérés (sample_every=N): minden N-edik kérés alatt mintavételez
+- időablak (`start_window(seconds)`, pl. admin végpontról): az ablak végéig minden kérést
+
+Amíg egy kiválasztott kérés fut (vagy az ablak nyitva van), egy háttérszál `interval`
+másodpercenként lekéri a kéréseket kiszolgáló szálak stackjét (`sys._current_frames`): az
+event loop szálát (ahol a middleware, a routing és a pydantic validáció fut) és a threadpool
+workereit. A tétlen minták (lock/Condition várakozás, select, queue.get) kimaradnak; az
+egyidejű, nem kiválasztott kérések mintái is bekerülnek.
+A stackek "collapsed" formában gyűlnek (`szál;keret;...;levél darabszám` soronként), ezt a
+flamegraph.pl, a speedscope és az inferno közvetlenül olvassa. Kiírás: az ablak végén, 1/N
+módban `dump_seconds`-onként; opcionálisan MLflow artifactként is.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# (fájlnév, függvény) levél-keretek, amelyekben a szál tétlenül vár
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+# A threadpool (run_in_threadpool, sync végpontok) szálainak neve
+REQUEST_THREAD_PREFIXES = ("AnyIO worker thread",)
+
+TRUNCATED_STACK = "[truncated]"
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir="profiles", interval=0.005, sample_every=0, max_window_seconds=300.0,
+                 dump_seconds=60.0, max_stacks=10000, max_depth=128, mlflow_experiment=None):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.sample_every = sample_every
+        self.max_window_seconds = max_window_seconds
+        self.dump_seconds = dump_seconds
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.mlflow_experiment = mlflow_experiment or None
+        # A kérés-út csak ezt olvassa; igaz, ha 1/N mód van, vagy nyitott ablak
+        self.armed = sample_every > 0
+        self._seen = 0
+        self._active = 0
+        # Az event loop szál(ak), amelyen kiválasztott kérés indult
+        self._loop_threads = set()
+        self._window_until = 0.0
+        self._window_mlflow = False
+        self._window_open = False
+        self._stacks = Counter()
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+        self.profiled_requests = 0
+        self.dumps = []
+
+    # --- kérés oldal ---
+
+    def begin(self):
+        """Kérés kezdete (csak ha `armed`). Visszatér: True, ha ezt a kérést profilozzuk (ekkor `end()` kell)."""
+        if self._window_until > time.monotonic():
+            selected = True
+        else:
+            self._seen += 1
+            selected = self.sample_every > 0 and self._seen % self.sample_every == 0
+        if selected:
+            with self._lock:
+                self._active += 1
+                self.profiled_requests += 1
+                self._loop_threads.add(threading.get_ident())
+            self._wake.set()
+        return selected
+
+    def end(self):
+        with self._lock:
+            self._active -= 1
+
+    # --- vezérlés ---
+
+    def start_window(self, seconds, log_mlflow=False):
+        """Minden kérés profilozása `seconds` ideig (legfeljebb max_window_seconds). Visszatér: az ablak hossza."""
+        seconds = min(max(float(seconds), 0.0), self.max_window_seconds)
+        with self._lock:
+            self._window_until = time.monotonic() + seconds
+            self._window_mlflow = log_mlflow
+            self._window_open = True
+            self.armed = True
+        self.start()
+        self._wake.set()
+        return seconds
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """A háttérszál leállítása; a még ki nem írt minták kiíródnak."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.dump()
+
+    # --- mintavétel ---
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def sample(self):
+        """Egy minta a kéréseket kiszolgáló, éppen nem tétlen szálakról."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        collected = []
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, "thread")
+            if ident not in self._loop_threads and not name.startswith(REQUEST_THREAD_PREFIXES):
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(name)
+            collected.append(";".join(reversed(stack)))
+        with self._lock:
+            for stack in collected:
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    stack = TRUNCATED_STACK
+                self._stacks[stack] += 1
+            self.samples += len(collected)
+
+    def _sampling(self):
+        return not self._stop.is_set() and (self._active > 0 or self._window_until > time.monotonic())
+
+    def _run(self):
+        last_dump = time.monotonic()
+        while not self._stop.is_set():
+            self._wake.wait(self.dump_seconds if self.sample_every > 0 else None)
+            self._wake.clear()
+            while self._sampling():
+                self.sample()
+                time.sleep(self.interval)
+            if self._window_open and self._window_until <= time.monotonic():
+                # Vége az ablaknak: kiírás, és 1/N mód nélkül a kérés-út újra kikapcsolt
+                with self._lock:
+                    self._window_open = False
+                    self.armed = self.sample_every > 0
+                self.dump(self._window_mlflow)
+                last_dump = time.monotonic()
+            elif time.monotonic() - last_dump >= self.dump_seconds:
+                self.dump()
+                last_dump = time.monotonic()
+
+    # --- kimenet ---
+
+    def collapsed(self):
+        """Az eddigi minták collapsed-stack szövegként (kiürítés nélkül)."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items()))
+
+    def dump(self, log_mlflow=False):
+        """
+        Az eddigi minták kiírása egy .collapsed fájlba és a számlálók nullázása.
+        Visszatér: a fájl útvonala, vagy None, ha nem volt minta.
+        """
+        with self._lock:
+            stacks, self._stacks = self._stacks, Counter()
+        if not stacks:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{int(time.time() * 1000):013d}-{os.getpid()}.collapsed")
+        with open(path, "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        dump = {"path": path, "samples": sum(stacks.values()), "stacks": len(stacks), "time": time.time()}
+        if log_mlflow or self.mlflow_experiment:
+            dump["mlflow_run_id"] = self._log_mlflow(path, dump["samples"])
+        self.dumps = (self.dumps + [dump])[-20:]
+        return path
+
+    def _log_mlflow(self, path, samples):
+        """A profil MLflow artifactként, egy saját run-ban; hiba esetén None (a fájl megmarad)."""
+        try:
+            from mlflow.entities import Param
+            from mlflow.tracking import MlflowClient
+
+            client = MlflowClient()
+            name = self.mlflow_experiment or "iris-api-profiles"
+            experiment = client.get_experiment_by_name(name)
+            experiment_id = experiment.experiment_id if experiment else client.create_experiment(name)
+            run_id = client.create_run(experiment_id, run_name=os.path.basename(path)).info.run_id
+            client.log_batch(run_id, params=[Param("samples", str(samples)), Param("interval", str(self.interval)),
+                                             Param("sample_every", str(self.sample_every))])
+            client.log_artifact(run_id, path, "profiles")
+            client.set_terminated(run_id)
+            return run_id
+        except Exception as e:
+            print(f"Profile MLflow logging failed: {e}", file=sys.stderr)
+            return None
+
+    def stats(self):
+        with self._lock:
+            window_left = max(self._window_until - time.monotonic(), 0.0)
+            return {
+                "armed": self.armed,
+                "sample_every": self.sample_every,
+                "window_seconds_left": round(window_left, 3),
+                "interval_ms": self.interval * 1000,
+                "active_requests": self._active,
+                "profiled_requests": self.profiled_requests,
+                "samples": self.samples,
+                "pending_stacks": len(self._stacks),
+                "dumps": list(self.dumps),
+            }
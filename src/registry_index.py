@@ -0,0 +1,420 @@
+"""
+SQLite index a helyi mlruns tárhoz (file store): run-ok, modell verziók, stage-ek és
+artifact helyek.
+
+A feloldás (`models:/<név>/<stage>` vagy a legújabb verzió) egyetlen indexelt lekérdezés, nem
+kell minden `version-N/meta.yaml`-t és run könyvtárat végigolvasni. A frissítés inkrementális:
+a meta.yaml fájloknak csak a módosítási idejét nézi, és csak a megváltozottakat olvassa újra.
+A feloldás előtti frissítés (runs=False) még ennél is olcsóbb: ha a regisztrált modellek
+"generációja" (lásd `_version_generation`) nem változott, a verziókat meg sem nézi.
+
+A `gc` parancs a megőrzési szabályt alkalmazza (alapból csak jelentést ad, `--apply` kell
+a végrehajtáshoz):
+- ugyanazon stage-ben a legújabbnál régebbi Production/Staging verziók Archived-ba kerülnek
+- a legújabb `--keep-versions` verziónál régebbi, stage nélküli/archivált verziók törlődnek
+- a megtartott verziók által nem hivatkozott, `--keep-days`-nél régebbi run artifactok
+  (és MLflow 3 logged model könyvtárak) tar.gz-be archiválódnak (`--archive-dir`) vagy törlődnek
+
+Használat:
+    python src/registry_index.py --mlruns mlruns refresh
+    python src/registry_index.py --mlruns mlruns resolve IrisDecisionTree --stage Production
+    python src/registry_index.py --mlruns mlruns gc --keep-versions 3
+    python src/registry_index.py --mlruns mlruns gc --keep-versions 3 --apply --archive-dir mlruns_archive
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import time
+from contextlib import contextmanager
+from urllib.parse import unquote, urlparse
+
+REGISTRY_INDEX_FILENAME = ".registry_index.sqlite"
+
+# A file store a törölt verziót nem törli, csak ezzel a stage-dzsel jelöli
+DELETED_STAGE = "Deleted_Internal"
+
+# Az MLflow RunStatus értékei közül ezek a még futó run-ok, ezekhez nem nyúlunk
+RUNNING_STATUSES = (1, 2)
+
+ACTIVE_STAGES = ("Production", "Staging")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, kind TEXT NOT NULL, mtime_ns INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY, experiment_id TEXT, run_name TEXT, status INTEGER, lifecycle_stage TEXT,
+    start_time INTEGER, end_time INTEGER, artifact_uri TEXT, run_dir TEXT NOT NULL, meta_path TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS model_versions (
+    name TEXT NOT NULL, version INTEGER NOT NULL, stage TEXT, run_id TEXT, source TEXT, local_path TEXT,
+    status TEXT, creation_timestamp INTEGER, last_updated_timestamp INTEGER, meta_path TEXT NOT NULL,
+    PRIMARY KEY (name, version));
+CREATE INDEX IF NOT EXISTS model_versions_by_stage ON model_versions (name, stage, version);
+"""
+
+
+def local_mlruns_dir(tracking_uri):
+    """A tracking URI-hoz tartozó helyi mlruns könyvtár, vagy None (pl. HTTP szerver, SQL backend)."""
+    if not tracking_uri:
+        return None
+    parsed = urlparse(tracking_uri)
+    if parsed.scheme == "file":
+        return unquote(parsed.path)
+    if parsed.scheme == "" or (len(parsed.scheme) == 1 and os.name == "nt"):
+        return tracking_uri
+    return None
+
+
+def _read_yaml(path):
+    import yaml
+
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def _subdirs(path):
+    try:
+        return [entry for entry in os.scandir(path) if entry.is_dir()]
+    except FileNotFoundError:
+        return []
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class RegistryIndex:
+    """Egy mlruns könyvtár indexe; az index fájl alapból az mlruns könyvtárban van."""
+
+    def __init__(self, mlruns_dir, index_path=None):
+        self.mlruns_dir = os.path.abspath(mlruns_dir)
+        self.index_path = index_path or os.path.join(self.mlruns_dir, REGISTRY_INDEX_FILENAME)
+        self._schema_ready = False
+        # A legutóbbi teljes (hibátlan) verzió-beolvasás előtti generáció
+        self._generation = None
+
+    @contextmanager
+    def _connect(self):
+        """Egy tranzakció (siker esetén commit), utána a kapcsolat bezárul."""
+        db = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            db.row_factory = sqlite3.Row
+            if not self._schema_ready:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(SCHEMA)
+                self._schema_ready = True
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def local_path(self, uri):
+        """
+        Artifact URI -> létező helyi útvonal, vagy None. Más gépen (pl. Windows alatt) rögzített
+        abszolút útvonalaknál az "mlruns/" utáni részt ehhez az mlruns könyvtárhoz illeszti.
+        """
+        if not uri:
+            return None
+        parsed = urlparse(uri)
+        if parsed.scheme not in ("file", ""):
+            return None
+        path = unquote(parsed.path)
+        if os.path.exists(path):
+            return path
+        marker = "/mlruns/"
+        if marker in path:
+            relocated = os.path.join(self.mlruns_dir, path.split(marker, 1)[1])
+            if os.path.exists(relocated):
+                return relocated
+        return None
+
+    # --- inkrementális frissítés ---
+
+    def _scan(self, runs=True):
+        """{meta.yaml útvonal: (fajta, mtime_ns)}; csak stat, olvasás nélkül."""
+        found = {}
+
+        def add(path, kind):
+            try:
+                found[path] = (kind, os.stat(path).st_mtime_ns)
+            except FileNotFoundError:
+                pass
+
+        for model in _subdirs(os.path.join(self.mlruns_dir, "models")):
+            for version in _subdirs(model.path):
+                if version.name.startswith("version-"):
+                    add(os.path.join(version.path, "meta.yaml"), "version")
+        if runs:
+            for experiment in _subdirs(self.mlruns_dir):
+                if experiment.name == "models" or experiment.name.startswith("."):
+                    continue
+                for run in _subdirs(experiment.path):
+                    # MLflow 3: az <experiment>/models/ a logged modelleké, nem run
+                    if run.name != "models":
+                        add(os.path.join(run.path, "meta.yaml"), "run")
+        return found
+
+    def _version_generation(self):
+        """
+        A modell verziók változásjelzője, modellenként egy-egy stat (nem verziónként): a models/
+        és a models/<név>/ könyvtár (új vagy törölt modell/verzió), valamint a models/<név>/meta.yaml.
+        Ez utóbbit az MLflow file store minden verzió-létrehozáskor, stage váltáskor és törléskor
+        újraírja (a verzió meta.yaml-ja ideiglenes fájlon át, a könyvtár mtime-ja így nem megbízható).
+        """
+        def stat(path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return None
+            return st.st_mtime_ns, st.st_size, st.st_ino
+
+        models_dir = os.path.join(self.mlruns_dir, "models")
+        return (stat(models_dir), tuple(sorted(
+            (model.name, stat(model.path), stat(os.path.join(model.path, "meta.yaml")))
+            for model in _subdirs(models_dir))))
+
+    def refresh(self, runs=True):
+        """
+        Az index frissítése; csak az új/módosult meta.yaml fájlokat olvassa be.
+        runs=False esetén csak a modell verziókat nézi (a feloldáshoz ennyi elég), és ha a
+        `_version_generation` a legutóbbi frissítés óta nem változott, azokat sem.
+        Visszatér: {"changed", "removed", "seconds"} (kihagyásnál "skipped": True is).
+        """
+        started = time.perf_counter()
+        # A beolvasás előtt, így a közben történt változást a következő frissítés észreveszi
+        generation = self._version_generation()
+        if not runs and generation == self._generation:
+            return {"changed": 0, "removed": 0, "skipped": True, "seconds": round(time.perf_counter() - started, 6)}
+        kinds = ("version", "run") if runs else ("version",)
+        found = self._scan(runs)
+        changed = removed = failed = 0
+        with self._connect() as db:
+            known = {row["path"]: row["mtime_ns"] for row in db.execute(
+                f"SELECT path, mtime_ns FROM files WHERE kind IN ({','.join('?' * len(kinds))})", kinds)}
+            for path, (kind, mtime_ns) in found.items():
+                if known.get(path) == mtime_ns:
+                    continue
+                try:
+                    meta = _read_yaml(path)
+                except Exception:
+                    failed += 1
+                    continue  # éppen íródó vagy hibás fájl: a következő frissítés beolvassa
+                if kind == "version":
+                    self._upsert_version(db, path, meta)
+                else:
+                    self._upsert_run(db, path, meta)
+                db.execute("INSERT OR REPLACE INTO files (path, kind, mtime_ns) VALUES (?, ?, ?)",
+                           (path, kind, mtime_ns))
+                changed += 1
+            for path in set(known) - set(found):
+                db.execute("DELETE FROM model_versions WHERE meta_path = ?", (path,))
+                db.execute("DELETE FROM runs WHERE meta_path = ?", (path,))
+                db.execute("DELETE FROM files WHERE path = ?", (path,))
+                removed += 1
+        # Hibás fájl esetén a következő frissítés nem hagyhatja ki a beolvasást
+        self._generation = generation if not failed else None
+        return {"changed": changed, "removed": removed, "seconds": round(time.perf_counter() - started, 6)}
+
+    def _upsert_version(self, db, path, meta):
+        # MLflow 3 a logged model helyét a storage_location-ben adja meg, a source ott models:/m-... URI
+        location = meta.get("storage_location") or meta.get("source")
+        db.execute(
+            "INSERT OR REPLACE INTO model_versions (name, version, stage, run_id, source, local_path, status, "
+            "creation_timestamp, last_updated_timestamp, meta_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (meta.get("name"), int(meta.get("version")), meta.get("current_stage"), meta.get("run_id"),
+             meta.get("source"), self.local_path(location) or self.local_path(meta.get("source")),
+             meta.get("status"), meta.get("creation_timestamp"), meta.get("last_updated_timestamp"), path))
+
+    def _upsert_run(self, db, path, meta):
+        db.execute(
+            "INSERT OR REPLACE INTO runs (run_id, experiment_id, run_name, status, lifecycle_stage, start_time, "
+            "end_time, artifact_uri, run_dir, meta_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (meta.get("run_id") or os.path.basename(os.path.dirname(path)), str(meta.get("experiment_id")),
+             meta.get("run_name"), meta.get("status"), meta.get("lifecycle_stage"), meta.get("start_time"),
+             meta.get("end_time"), meta.get("artifact_uri"), os.path.dirname(path), path))
+
+    # --- feloldás ---
+
+    def lookup(self, name, stage=None):
+        """A stage legújabb verziója (stage=None: a legújabb verzió) dict-ként, vagy None."""
+        with self._connect() as db:
+            if stage is None:
+                row = db.execute("SELECT * FROM model_versions WHERE name = ? AND stage IS NOT ? "
+                                 "ORDER BY version DESC LIMIT 1", (name, DELETED_STAGE)).fetchone()
+            else:
+                row = db.execute("SELECT * FROM model_versions WHERE name = ? AND stage = ? "
+                                 "ORDER BY version DESC LIMIT 1", (name, stage)).fetchone()
+        return dict(row) if row is not None else None
+
+    def versions(self, name=None):
+        """A (nem törölt) modell verziók."""
+        with self._connect() as db:
+            if name is None:
+                rows = db.execute("SELECT * FROM model_versions WHERE stage IS NOT ? ORDER BY name, version",
+                                  (DELETED_STAGE,)).fetchall()
+            else:
+                rows = db.execute("SELECT * FROM model_versions WHERE name = ? AND stage IS NOT ? ORDER BY version",
+                                  (name, DELETED_STAGE)).fetchall()
+        return [dict(row) for row in rows]
+
+    def runs(self):
+        with self._connect() as db:
+            return [dict(row) for row in db.execute("SELECT * FROM runs ORDER BY start_time").fetchall()]
+
+    # --- megőrzés / tömörítés ---
+
+    def plan_gc(self, keep_versions=5, keep_days=7, now=None):
+        """Mit archiválna/törölne a megőrzési szabály; a fájlrendszerhez nem nyúl."""
+        self.refresh()
+        now = time.time() if now is None else now
+        cutoff_ms = (now - keep_days * 86400) * 1000
+        archive_versions, delete_versions, kept = [], [], []
+        by_name = {}
+        for version in self.versions():
+            by_name.setdefault(version["name"], []).append(version)
+        for name, versions in by_name.items():
+            versions.sort(key=lambda v: v["version"], reverse=True)
+            newest_in_stage = {}
+            for version in versions:
+                if version["stage"] in ACTIVE_STAGES and version["stage"] not in newest_in_stage:
+                    newest_in_stage[version["stage"]] = version["version"]
+            for rank, version in enumerate(versions):
+                active = newest_in_stage.get(version["stage"]) == version["version"]
+                if version["stage"] in ACTIVE_STAGES and not active:
+                    archive_versions.append(version)
+                if active or rank < keep_versions:
+                    kept.append(version)
+                else:
+                    delete_versions.append(version)
+
+        referenced_runs = {version["run_id"] for version in kept}
+        referenced_paths = {os.path.realpath(version["local_path"]) for version in kept if version["local_path"]}
+
+        def referenced(path):
+            path = os.path.realpath(path)
+            return any(ref == path or ref.startswith(path + os.sep) or path.startswith(ref + os.sep)
+                       for ref in referenced_paths)
+
+        orphaned = []
+        for run in self.runs():
+            artifacts = os.path.join(run["run_dir"], "artifacts")
+            if (run["run_id"] in referenced_runs or run["status"] in RUNNING_STATUSES
+                    or (run["end_time"] or run["start_time"] or 0) > cutoff_ms
+                    or not os.path.isdir(artifacts) or not os.listdir(artifacts) or referenced(artifacts)):
+                continue
+            orphaned.append({"kind": "run_artifacts", "id": run["run_id"], "path": artifacts,
+                             "bytes": directory_bytes(artifacts)})
+        for experiment in _subdirs(self.mlruns_dir):
+            if experiment.name == "models" or experiment.name.startswith("."):
+                continue
+            for logged_model in _subdirs(os.path.join(experiment.path, "models")):
+                if referenced(logged_model.path) or os.path.getmtime(logged_model.path) * 1000 > cutoff_ms:
+                    continue
+                try:
+                    source_run = _read_yaml(os.path.join(logged_model.path, "meta.yaml")).get("source_run_id")
+                except Exception:
+                    source_run = None
+                if source_run in referenced_runs:
+                    continue
+                orphaned.append({"kind": "logged_model", "id": logged_model.name, "path": logged_model.path,
+                                 "bytes": directory_bytes(logged_model.path)})
+
+        def brief(version):
+            return {"name": version["name"], "version": version["version"], "stage": version["stage"]}
+
+        return {
+            "archive_versions": [brief(v) for v in archive_versions],
+            "delete_versions": [brief(v) for v in delete_versions],
+            "kept_versions": [brief(v) for v in kept],
+            "orphaned_artifacts": orphaned,
+            "reclaimable_bytes": sum(item["bytes"] for item in orphaned),
+        }
+
+    def apply_gc(self, plan, archive_dir=None):
+        """
+        A terv végrehajtása: stage váltás és verzió törlés az MLflow registry file store-ján át,
+        az árva artifactok archiválása (archive_dir) vagy törlése. Visszatér: a felszabadított bájtok.
+        """
+        # Az MLflow 3 csak kifejezett engedéllyel nyitja meg a file store-t; ez az eszköz épp arra való
+        os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+        from mlflow.store.model_registry.file_store import FileStore
+
+        store = FileStore(self.mlruns_dir)
+        for version in plan["archive_versions"]:
+            if version not in plan["delete_versions"]:
+                store.transition_model_version_stage(version["name"], str(version["version"]), "Archived", False)
+        for version in plan["delete_versions"]:
+            store.delete_model_version(version["name"], str(version["version"]))
+
+        reclaimed = 0
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+        for item in plan["orphaned_artifacts"]:
+            if not os.path.isdir(item["path"]):
+                continue
+            if archive_dir:
+                archive = os.path.join(archive_dir, f"{item['kind']}-{item['id']}.tar.gz")
+                with tarfile.open(f"{archive}.tmp", "w:gz") as tar:
+                    tar.add(item["path"], arcname=os.path.relpath(item["path"], self.mlruns_dir))
+                os.replace(f"{archive}.tmp", archive)
+                reclaimed -= os.path.getsize(archive)
+            shutil.rmtree(item["path"])
+            reclaimed += item["bytes"]
+            if item["kind"] == "run_artifacts":
+                os.makedirs(item["path"])  # az MLflow üres artifacts könyvtárat vár
+        self.refresh()
+        return reclaimed
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SQLite index and retention for a local mlruns store")
+    parser.add_argument("--mlruns", default=os.environ.get("REGISTRY_INDEX_MLRUNS") or "mlruns")
+    parser.add_argument("--index", help="Index file (default: <mlruns>/.registry_index.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("refresh", help="Update the index incrementally")
+    resolve = commands.add_parser("resolve", help="Resolve a model version with one indexed query")
+    resolve.add_argument("name")
+    resolve.add_argument("--stage", help="Stage (default: latest version)")
+    gc = commands.add_parser("gc", help="Archive superseded versions and orphaned artifacts (dry run by default)")
+    gc.add_argument("--keep-versions", type=int, default=5, help="Newest versions to keep per model")
+    gc.add_argument("--keep-days", type=float, default=7, help="Never touch artifacts of runs newer than this")
+    gc.add_argument("--archive-dir", help="Move orphaned artifacts into tar.gz files here instead of deleting")
+    gc.add_argument("--apply", action="store_true", help="Execute the plan (default: report only)")
+    args = parser.parse_args(argv)
+
+    index = RegistryIndex(args.mlruns, args.index)
+    if args.command == "refresh":
+        print(json.dumps(index.refresh()))
+    elif args.command == "resolve":
+        started = time.perf_counter()
+        index.refresh(runs=False)
+        row = index.lookup(args.name, args.stage)
+        print(json.dumps({"version": row, "seconds": round(time.perf_counter() - started, 6)}, indent=2))
+    else:
+        plan = index.plan_gc(args.keep_versions, args.keep_days)
+        report = {
+            "dry_run": not args.apply,
+            "archive_versions": len(plan["archive_versions"]),
+            "delete_versions": len(plan["delete_versions"]),
+            "kept_versions": [v["version"] for v in plan["kept_versions"]],
+            "orphaned_artifacts": len(plan["orphaned_artifacts"]),
+            "reclaimable_bytes": plan["reclaimable_bytes"],
+        }
+        if args.apply:
+            report["reclaimed_bytes"] = index.apply_gc(plan, args.archive_dir)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,153 +1,71 @@
 """
-Ez a script folyamatosan elindítja a szükséges lépéseket:
-- Modell tanítás és regisztráció (api.py)
+Ez a script elindítja a szükséges lépéseket:
 - MLflow UI indítása
-- REST API indítása
+- Modell tanítás és regisztráció (api.py), amint az MLflow UI válaszol
+- REST API indítása a tanítás végeztével
 - neptuneai monitoring futtatása
 - Streamlit dashboard indítása
 
-A REST API, MLflow UI és Streamlit külön folyamatban futnak, így a script minden szükséges komponenst elindít.
+A komponenseket a supervisor.py felügyeli: a független részek párhuzamosan indulnak,
+a függők valódi készenléti próbára várnak fix várakozás helyett, a kimenetek a logs/
+mappába kerülnek (rotálva), a leállt szolgáltatások exponenciális backoff-fal indulnak újra.
+Az indítástól a teljes készenlétig eltelt idő a logs/startup_report.json fájlba kerül.
 """
 
-import subprocess
-import time
-import webbrowser
+import argparse
+import asyncio
 import os
 import sys
-import signal
+import webbrowser
 
-def run_process(command, name):
-    print(f"Indítás: {name}...")
-    try:
-        # Redirecting stderr to stdout to capture all output
-        proc = subprocess.Popen(
-            command, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
-        )
-        return proc
-    except Exception as e:
-        print(f"Hiba a(z) {name} indítása során: {e}")
-        return None
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from supervisor import Service, Supervisor
 
-# MLflow UI indítása háttérben
-mlflow_proc = run_process(["mlflow", "ui"], "MLflow UI")
-time.sleep(3)  # Várunk, hogy elinduljon
-if mlflow_proc:
-    webbrowser.open("http://localhost:5000")
-    print("MLflow UI elérhetősége: http://localhost:5000")
-else:
-    print("Hiba: MLflow UI nem indult el")
 
-# Modell tanítás és regisztráció
-print("Modell tanítása és regisztrálása...")
-try:
-    subprocess.run(["python", "src/api.py"], check=True)
-    print("Modell tanítása és regisztrálása sikeres")
-except subprocess.CalledProcessError as e:
-    print(f"Hiba a modell tanítása során: {e}")
+def open_browser(url, label):
+    def callback():
+        print(f"{label} elérhetősége: {url}")
+        webbrowser.open(url)
+    return callback
 
-# REST API indítása háttérben
-restapi_proc = run_process(["uvicorn", "src.api:app", "--host", "127.0.0.1", "--port", "8000"], "REST API")
-time.sleep(2)
-if restapi_proc:
-    webbrowser.open("http://localhost:8000/docs")
-    print("REST API elérhetősége: http://localhost:8000/docs")
-else:
-    print("Hiba: REST API nem indult el")
 
-# Neptun AI monitoring futtatása
-try:
-    subprocess.run(["python", "src/neptuneai_monitoring.py"], check=True)
-    print("Neptune AI monitoring futtatása sikeres")
-except subprocess.CalledProcessError as e:
-    print(f"Hiba a Neptune AI monitoring futtatása során: {e}")
+def build_services(open_browsers=True):
+    python = sys.executable
 
-streamlit_proc = run_process(["streamlit", "run", "src/streamlit_app.py", "--server.headless=true", "--server.port=8501"], "Streamlit Dashboard")
-time.sleep(7)  # Több időt adunk a Streamlit indulásához
-if streamlit_proc:
-    webbrowser.open("http://localhost:8501")
-    print("Streamlit Dashboard elérhetősége: http://localhost:8501")
-else:
-    print("Hiba: Streamlit Dashboard nem indult el")
+    def on_ready(url, label):
+        return open_browser(url, label) if open_browsers else None
 
-# Folyamatok tárolása a megfelelő leállításhoz
-processes = {
-    "MLflow UI": mlflow_proc,
-    "REST API": restapi_proc,
-    "Streamlit Dashboard": streamlit_proc
-}
+    return [
+        Service("mlflow-ui", ["mlflow", "ui"], ready_url="http://localhost:5000",
+                on_ready=on_ready("http://localhost:5000", "MLflow UI")),
+        Service("training", [python, "src/api.py"], depends_on={"mlflow-ui": "ready"}, oneshot=True),
+        # A tanítás sikerétől függetlenül indul (a korábbi viselkedés szerint)
+        Service("rest-api", [python, "-m", "uvicorn", "src.api:app", "--host", "127.0.0.1", "--port", "8000"],
+                depends_on={"training": "finished"}, ready_url="http://localhost:8000/readyz",
+                on_ready=on_ready("http://localhost:8000/docs", "REST API")),
+        Service("neptune-monitoring", [python, "src/neptuneai_monitoring.py"], oneshot=True),
+        Service("streamlit", ["streamlit", "run", "src/streamlit_app.py", "--server.headless=true",
+                              "--server.port=8501"],
+                ready_url="http://localhost:8501/_stcore/health",
+                on_ready=on_ready("http://localhost:8501", "Streamlit Dashboard")),
+    ]
 
-print("\nMinden komponens elindítva. Leállításhoz zárd be ezt a scriptet vagy nyomj Ctrl+C.")
 
-# Megfelelő leállítás biztosítása
-def shutdown_gracefully(sig, frame):
-    print("\nLeállítás...")
-    for name, proc in processes.items():
-        if proc:
-            try:
-                print(f"{name} leállítása...")
-                if sys.platform == "win32":
-                    # Windows-specifikus leállítás
-                    proc.terminate()
-                else:
-                    # Unix-specifikus leállítás
-                    proc.send_signal(signal.SIGTERM)
-                proc.wait(timeout=5)
-            except Exception as e:
-                print(f"Hiba a(z) {name} leállítása során: {e}")
-                try:
-                    proc.kill()
-                except:
-                    pass
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start MLflow UI, training, REST API, monitoring and Streamlit")
+    parser.add_argument("--log-dir", default="logs", help="Directory for the rotating service logs")
+    parser.add_argument("--no-browser", action="store_true", help="Do not open the UIs in a browser")
+    args = parser.parse_args(argv)
+
+    supervisor = Supervisor(build_services(not args.no_browser), log_dir=args.log_dir)
+    print("Komponensek indítása... Leállításhoz nyomj Ctrl+C-t.")
+    try:
+        asyncio.run(supervisor.run())
+    except KeyboardInterrupt:
+        # Windows: nincs add_signal_handler, a Ctrl+C itt érkezik
+        pass
     print("Minden folyamat leállítva.")
-    sys.exit(0)
 
-signal.signal(signal.SIGINT, shutdown_gracefully)
-signal.signal(signal.SIGTERM, shutdown_gracefully)
 
-try:
-    # Nyomon követjük, hogy streamlit-et már megnyitottuk-e
-    streamlit_opened = False
-    if streamlit_proc:
-        streamlit_opened = True
-    
-    # A főfolyamat folyamatosan fut
-    while True:
-        time.sleep(1)
-        # Ellenőrizzük, hogy a folyamatok még mindig futnak-e
-        for name, proc in list(processes.items()):
-            if proc and proc.poll() is not None:
-                print(f"Figyelmeztetés: {name} leállt.")
-                
-                # Attempt to read any output from the failed process
-                if proc.stdout:
-                    output = proc.stdout.read()
-                    if output:
-                        print(f"{name} kimenet: {output}")
-                
-                # Restart the process if it's one that should keep running
-                if name == "REST API":
-                    print(f"Újraindítás: {name}...")
-                    new_proc = run_process(["uvicorn", "src.api:app", "--host", "127.0.0.1", "--port", "8000"], "REST API")
-                    if new_proc:
-                        processes[name] = new_proc
-                        print(f"{name} újraindítva")
-                
-                if name == "Streamlit Dashboard":
-                    print(f"Újraindítás: {name}...")
-                    new_proc = run_process(["streamlit", "run", "src/streamlit_app.py", "--server.headless=true", "--server.port=8501"], "Streamlit Dashboard")
-                    if new_proc:
-                        processes[name] = new_proc
-                        print(f"{name} újraindítva")
-                        # Csak akkor nyitjuk meg a böngészőt újra, ha ez az első indítás
-                        if not streamlit_opened:
-                            time.sleep(5)  # Várunk, hogy a Streamlit elinduljon
-                            webbrowser.open("http://localhost:8501")
-                            print("Streamlit Dashboard elérhetősége: http://localhost:8501")
-                            streamlit_opened = True
-except KeyboardInterrupt:
-    shutdown_gracefully(None, None)
+if __name__ == "__main__":
+    main()
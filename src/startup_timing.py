@@ -0,0 +1,131 @@
+"""
+Az API hidegindításának mérése, időkerettel (regressziós ellenőrzés).
+
+Friss Python folyamatban (`python -X importtime`) importálja az api modult, betölti a
+modellt és lefuttat egy predikciót. Kiírja a szakaszok idejét és a legdrágább importokat,
+és nem nulla kóddal lép ki, ha
+- az `import api` mediánja túllépi a --budget-ms keretet, vagy
+- import közben betöltődik egy tiltott modul (alapból: mlflow), amely csak a
+  registry-s kódutakon kellhet.
+
+Használat:
+    python src/startup_timing.py --budget-ms 800 --repeat 3
+    python src/startup_timing.py --skip-model --output startup_timing.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A gyermek folyamatban futó mérés; a JSON eredmény az utolsó stdout sor
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+forbidden = sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[2].split(",")))
+result = {"import_seconds": imported - started, "forbidden_modules": forbidden}
+if sys.argv[1] == "model":
+    import numpy as np
+    loaded = api.model_holder.get()
+    model_loaded = time.perf_counter()
+    loaded.model.predict(np.array([[5.1, 3.5, 1.4, 0.2]]))
+    predicted = time.perf_counter()
+    result.update(model_source=loaded.source, model_seconds=model_loaded - imported,
+                  first_prediction_seconds=predicted - model_loaded, total_seconds=predicted - started)
+print(json.dumps(result))
+"""
+
+
+def parse_importtime(stderr):
+    """`-X importtime` kimenet -> [(modul, saját us, kumulatív us)]."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            modules.append((name, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def measure_once(load_model=True, forbidden=("mlflow",), env=None):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, "model" if load_model else "import", ",".join(forbidden)],
+        cwd=SRC_DIR, env=dict(os.environ, **(env or {})), capture_output=True, text=True, check=False)
+    if completed.returncode != 0:
+        tail = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")][-20:]
+        raise RuntimeError("Startup probe failed:\n" + "\n".join(tail))
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(completed.stderr)
+    return result
+
+
+def measure(repeat=3, load_model=True, forbidden=("mlflow",), top=15, env=None):
+    """Több friss folyamat mérése; a szakaszokból mediánt, az importokból az utolsó futást adja."""
+    runs = [measure_once(load_model, forbidden, env) for _ in range(repeat)]
+    stages = [key for key in ("import_seconds", "model_seconds", "first_prediction_seconds", "total_seconds")
+              if key in runs[0]]
+    imports = sorted(runs[-1]["imports"], key=lambda module: module[2], reverse=True)
+    return {
+        "repeat": repeat,
+        "median": {key: statistics.median(run[key] for run in runs) for key in stages},
+        "runs": [{key: run[key] for key in stages} for run in runs],
+        "model_source": runs[-1].get("model_source"),
+        "forbidden_modules": sorted({name for run in runs for name in run["forbidden_modules"]}),
+        "top_imports": [{"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+                        for name, self_us, cumulative_us in imports[:top]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure API cold start and enforce an import time budget")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "800")),
+                        help="Maximum median 'import api' time (default: $STARTUP_IMPORT_BUDGET_MS or 800)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--forbid", default="mlflow",
+                        help="Comma separated top-level modules that must not be imported by 'import api'")
+    parser.add_argument("--skip-model", action="store_true", help="Only measure the import, not model load")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to report")
+    parser.add_argument("--output", help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    forbidden = tuple(name for name in args.forbid.split(",") if name)
+    report = measure(args.repeat, not args.skip_model, forbidden, args.top)
+    median = report["median"]
+
+    print(f"Startup timing (median of {report['repeat']} fresh processes):")
+    for key, seconds in median.items():
+        print(f"  {key:<26} {seconds * 1000:9.1f} ms")
+    if report["model_source"]:
+        print(f"  model source: {report['model_source']}")
+    print("Slowest imports (cumulative):")
+    for entry in report["top_imports"]:
+        print(f"  {entry['cumulative_ms']:9.1f} ms  {entry['module']}")
+
+    failures = []
+    import_ms = median["import_seconds"] * 1000
+    if import_ms > args.budget_ms:
+        failures.append(f"'import api' took {import_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    if report["forbidden_modules"]:
+        failures.append("'import api' imported " + ", ".join(report["forbidden_modules"]))
+    report["budget_ms"] = args.budget_ms
+    report["failures"] = failures
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
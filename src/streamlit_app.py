@@ -1,48 +1,98 @@
 ﻿"""
 Streamlit dashboard az Iris modellhez.
-Lehetővé teszi predikciók készítését és az EvidentlyAI drift report megjelenítését.
+Lehetővé teszi predikciók készítését egyenként, vagy CSV/Parquet fájlból tömegesen.
+
+A HTTP session (keep-alive kapcsolat-pool) cache_resource-ként egyszer jön létre, és minden
+újrafuttatás és felhasználó ugyanazt használja; az ismételt egysoros predikciók memoizálva
+vannak. A fájlok a /predict/binary végponton, darabokban, párhuzamosan értékelődnek ki.
 """
 
-import streamlit as st
-import requests
-import pandas as pd
 import os
+import sys
+import time
+
+import numpy as np
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from iris_client import API_URL, FEATURE_NAMES, LABELS, create_session, predict_row, read_upload, score_frame
+
+# Az egysoros predikciók memoizálásának ideje; modellfrissítés után legfeljebb ennyi ideig lehet régi
+PREDICTION_MEMO_TTL_SECONDS = float(os.environ.get("PREDICTION_MEMO_TTL_SECONDS", "300"))
+
+
+@st.cache_resource
+def get_session():
+    """A folyamat közös HTTP session-je; nem nyit új kapcsolatot minden predikcióhoz."""
+    return create_session()
+
+
+@st.cache_data(ttl=PREDICTION_MEMO_TTL_SECONDS, max_entries=10000, show_spinner=False)
+def cached_prediction(api_url, row):
+    return predict_row(get_session(), api_url, row)
+
+
+def show_http_error(e):
+    response = getattr(e, "response", None)
+    if response is not None:
+        st.error(f'Hiba a predikció során! Status code: {response.status_code}')
+        st.error(f'Response: {response.text}')
+    else:
+        st.error(f'Hiba: {e}')
+
 
 st.title('Iris ML Model Streamlit Dashboard')
-st.write('Adja meg a virág jellemzőit, és a modell megmondja a fajt!')
-
-# Bemeneti mezők
-sepal_length = st.number_input('Sepal length (cm)', min_value=0.0, max_value=10.0, value=5.1)
-sepal_width = st.number_input('Sepal width (cm)', min_value=0.0, max_value=10.0, value=3.5)
-petal_length = st.number_input('Petal length (cm)', min_value=0.0, max_value=10.0, value=1.4)
-petal_width = st.number_input('Petal width (cm)', min_value=0.0, max_value=10.0, value=0.2)
-
-if st.button('Predikció'):
-    # REST API hívás
-    data = {
-        'sepal_length': sepal_length,
-        'sepal_width': sepal_width,
-        'petal_length': petal_length,
-        'petal_width': petal_width
-    }
-    try:
-        # Use environment-aware API URL (works both in Docker and locally)
-        api_host = "localhost"  # Default for local development
-        
-        # For Docker container-to-container communication
-        if os.environ.get("DOCKER_MODE", "false").lower() == "true":
-            api_host = "localhost"  # Use localhost since we're in the same container
-            
-        api_url = f"http://{api_host}:8000/predict"
-        st.info(f"Connecting to API at: {api_url}")
-        
-        response = requests.post(api_url, json=data)
-        if response.status_code == 200:
-            pred = response.json()['prediction']
-            label = ['setosa', 'versicolor', 'virginica'][pred]
-            st.success(f'A predikált faj: {label}')
+single_tab, upload_tab = st.tabs(['Egy virág', 'Fájl feltöltés'])
+
+with single_tab:
+    st.write('Adja meg a virág jellemzőit, és a modell megmondja a fajt!')
+
+    # Bemeneti mezők
+    sepal_length = st.number_input('Sepal length (cm)', min_value=0.0, max_value=10.0, value=5.1)
+    sepal_width = st.number_input('Sepal width (cm)', min_value=0.0, max_value=10.0, value=3.5)
+    petal_length = st.number_input('Petal length (cm)', min_value=0.0, max_value=10.0, value=1.4)
+    petal_width = st.number_input('Petal width (cm)', min_value=0.0, max_value=10.0, value=0.2)
+
+    if st.button('Predikció'):
+        st.info(f"Connecting to API at: {API_URL}/predict")
+        try:
+            pred = cached_prediction(API_URL, (sepal_length, sepal_width, petal_length, petal_width))
+            st.success(f'A predikált faj: {LABELS[pred]}')
+        except Exception as e:
+            show_http_error(e)
+
+with upload_tab:
+    st.write(f"CSV vagy Parquet fájl a következő oszlopokkal: {', '.join(FEATURE_NAMES)}.")
+    uploaded = st.file_uploader('Fájl', type=['csv', 'parquet'])
+    if uploaded is not None and st.button('Fájl kiértékelése'):
+        try:
+            frame = read_upload(uploaded.name, uploaded.getvalue())
+        except Exception as e:
+            st.error(f'A fájl nem olvasható: {e}')
         else:
-            st.error(f'Hiba a predikció során! Status code: {response.status_code}')
-            st.error(f'Response: {response.text}')
-    except Exception as e:
-        st.error(f'Hiba: {e}')
+            progress = st.progress(0.0, text=f'0 / {len(frame)} sor')
+            started = time.perf_counter()
+            try:
+                predictions, versions = score_frame(
+                    get_session(), API_URL, frame,
+                    on_progress=lambda done, total: progress.progress(done / total, text=f'{done} / {total} sor'))
+            except Exception as e:
+                show_http_error(e)
+            else:
+                result = frame.assign(prediction=predictions, species=np.asarray(LABELS)[predictions])
+                # Az eredmény a session-ben marad, így a következő újrafuttatás nem értékel újra
+                st.session_state['scored'] = {
+                    'name': uploaded.name, 'result': result, 'seconds': time.perf_counter() - started,
+                    'versions': sorted(str(version) for version in versions),
+                    'csv': result.to_csv(index=False).encode(),
+                }
+
+    scored = st.session_state.get('scored')
+    if scored is not None:
+        st.success(f"{scored['name']}: {len(scored['result'])} sor kiértékelve {scored['seconds']:.2f} s alatt "
+                   f"(modell verzió: {', '.join(scored['versions'])})")
+        if len(scored['versions']) > 1:
+            st.warning('A kiértékelés közben a modell verziója megváltozott.')
+        st.dataframe(scored['result'].head(1000))
+        st.download_button('Eredmény letöltése (CSV)', scored['csv'],
+                           file_name=f"{os.path.splitext(scored['name'])[0]}_predictions.csv", mime='text/csv')
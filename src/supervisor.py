@@ -0,0 +1,328 @@
+"""
+Asyncio alapú folyamat-felügyelő a szolgáltatások indításához (run_all.py használja).
+
+- A független szolgáltatások párhuzamosan indulnak; a függők valódi készenléti
+  próbára (HTTP) vagy egy egyszeri lépés sikeres lefutására várnak, nem fix sleep-re.
+- A gyermekfolyamatok kimenetét folyamatosan olvassa, és szolgáltatásonként rotáló
+  logfájlba írja, így egy beszédes folyamat sem akad el a tele pipe-on.
+- Összeomlás után exponenciális backoff-fal indít újra; ha egy szolgáltatás rövid
+  időn belül túl sokszor omlik össze (crash loop), feladja.
+- Méri és kiírja, mennyi idő telt el az indítástól, amíg minden szolgáltatás kész lett.
+  A ready_timeout alatt kész nem lett szolgáltatás "not-ready" állapottal kerül a
+  jelentésbe (a próba a háttérben folytatódik), így a jelentés akkor is elkészül.
+"""
+
+import asyncio
+import json
+import logging
+import logging.handlers
+import os
+import signal
+import sys
+import time
+import urllib.request
+from collections import deque
+
+
+class Service:
+    """
+    Egy felügyelt folyamat leírása.
+
+    depends_on: {szolgáltatás neve: feltétel}; "ready" – a függőség készenlétére vár
+                (egyszeri lépésnél: sikeresen lefutott), "finished" – megvárja, amíg
+                a függőség véget ér, az eredményétől függetlenül.
+    ready_url:  HTTP végpont, amelynek 2xx/3xx válasza jelenti a készenlétet.
+    ready_timeout: ennyi másodperc után a szolgáltatás "not-ready"-ként kerül az indítási
+                jelentésbe; a próba ezután is fut, és a későbbi készenlétet még rögzíti.
+    oneshot:    egyszer lefutó lépés (pl. tanítás); nem indul újra.
+    """
+
+    def __init__(self, name, command, depends_on=None, ready_url=None, oneshot=False, restart=True,
+                 env=None, on_ready=None, ready_timeout=120.0):
+        self.name = name
+        self.command = command
+        self.depends_on = dict(depends_on or {})
+        self.ready_url = ready_url
+        self.oneshot = oneshot
+        self.restart = restart and not oneshot
+        self.env = env
+        self.on_ready = on_ready
+        self.ready_timeout = ready_timeout
+
+
+class ServiceState:
+    def __init__(self, service):
+        self.service = service
+        self.ready = asyncio.Event()
+        self.finished = asyncio.Event()
+        # Az indítási jelentés szempontjából eldőlt: kész, véglegesen leállt vagy lejárt a ready_timeout
+        self.settled = asyncio.Event()
+        self.status = "pending"
+        self.process = None
+        self.started_at = None
+        self.ready_at = None
+        self.restarts = 0
+        self.crashes = deque()
+        self.last_lines = deque(maxlen=20)
+
+
+def http_ready(url, timeout=1.0):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status < 400
+    except Exception:
+        return False
+
+
+class Supervisor:
+    def __init__(self, services, log_dir="logs", backoff_initial=1.0, backoff_max=60.0, stable_seconds=30.0,
+                 crash_loop_count=5, crash_loop_window=60.0, log_max_bytes=10 * 1024 * 1024, log_backups=3,
+                 log_max_line_bytes=1024 * 1024):
+        self.states = {service.name: ServiceState(service) for service in services}
+        self.log_dir = log_dir
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.stable_seconds = stable_seconds
+        self.crash_loop_count = crash_loop_count
+        self.crash_loop_window = crash_loop_window
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self.log_max_line_bytes = log_max_line_bytes
+        self.started_at = None
+        self.all_ready_at = None
+        self._stopping = asyncio.Event()
+
+    def log(self, message):
+        print(f"[supervisor] {message}", flush=True)
+
+    def _service_logger(self, name):
+        logger = logging.getLogger(f"supervisor.{name}")
+        if not logger.handlers:
+            os.makedirs(self.log_dir, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(self.log_dir, f"{name}.log"), maxBytes=self.log_max_bytes,
+                backupCount=self.log_backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+        return logger
+
+    async def _drain(self, state, logger):
+        """
+        A gyermek kimenetének folyamatos olvasása a logba. Darabokban olvas (nem readline-nal),
+        így a readline korlátjánál hosszabb sorok sem állítják meg az ürítést.
+        """
+        buffer = b""
+        while True:
+            chunk = await state.process.stdout.read(65536)
+            if not chunk:
+                break
+            *lines, buffer = (buffer + chunk).split(b"\n")
+            if len(buffer) > self.log_max_line_bytes:
+                lines.append(buffer)
+                buffer = b""
+            for raw in lines:
+                self._log_line(state, logger, raw)
+        if buffer:
+            self._log_line(state, logger, buffer)
+
+    def _log_line(self, state, logger, raw):
+        line = raw.decode("utf-8", errors="replace").rstrip()
+        state.last_lines.append(line[:500])
+        logger.info(line)
+
+    async def _probe(self, state):
+        """
+        Addig próbálja a ready_url-t, amíg sikeres nem lesz vagy a folyamat ki nem lép.
+        A ready_timeout lejártakor a szolgáltatás "not-ready" lesz, a próba ritkábban folytatódik.
+        """
+        service = state.service
+        deadline = time.monotonic() + service.ready_timeout
+        interval = 0.2
+        while state.process.returncode is None:
+            if await asyncio.to_thread(http_ready, service.ready_url):
+                self._mark_ready(state)
+                return
+            if interval < 1.0 and time.monotonic() >= deadline:
+                self.log(f"{service.name}: not ready after {service.ready_timeout:.0f}s")
+                state.status = "not-ready"
+                state.settled.set()
+                interval = 1.0
+            await asyncio.sleep(interval)
+
+    def _mark_ready(self, state):
+        if state.ready.is_set():
+            return
+        state.ready_at = time.monotonic()
+        state.status = "ready"
+        state.ready.set()
+        state.settled.set()
+        self.log(f"{state.service.name}: ready after {state.ready_at - self.started_at:.2f}s")
+        if state.service.on_ready is not None:
+            try:
+                state.service.on_ready()
+            except Exception as e:
+                self.log(f"{state.service.name}: on_ready hook failed: {e}")
+
+    async def _wait_dependencies(self, state):
+        for name, condition in state.service.depends_on.items():
+            dependency = self.states[name]
+            ready = asyncio.create_task(dependency.ready.wait())
+            finished = asyncio.create_task(dependency.finished.wait())
+            stopping = asyncio.create_task(self._stopping.wait())
+            await asyncio.wait({ready, finished, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            for task in (ready, finished, stopping):
+                task.cancel()
+            if self._stopping.is_set():
+                return False
+            if condition == "finished":
+                await dependency.finished.wait()
+            elif not dependency.ready.is_set():
+                return False
+        return True
+
+    def _backoff(self, consecutive_failures):
+        return min(self.backoff_max, self.backoff_initial * 2 ** (consecutive_failures - 1))
+
+    def _crash_loop(self, state):
+        now = time.monotonic()
+        state.crashes.append(now)
+        while state.crashes and now - state.crashes[0] > self.crash_loop_window:
+            state.crashes.popleft()
+        return len(state.crashes) >= self.crash_loop_count
+
+    async def _run_service(self, state):
+        service = state.service
+        if not await self._wait_dependencies(state):
+            state.status = "skipped"
+            self.log(f"{service.name}: skipped, dependency not ready")
+            state.finished.set()
+            state.settled.set()
+            return
+
+        logger = self._service_logger(service.name)
+        consecutive_failures = 0
+        while not self._stopping.is_set():
+            env = dict(os.environ, **(service.env or {}))
+            env.setdefault("PYTHONUNBUFFERED", "1")
+            try:
+                state.process = await asyncio.create_subprocess_exec(
+                    *service.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, env=env)
+            except OSError as e:
+                self.log(f"{service.name}: failed to start: {e}")
+                state.status = "failed"
+                break
+            state.started_at = time.monotonic()
+            if state.status not in ("ready", "not-ready"):
+                state.status = "starting"
+            self.log(f"{service.name}: started (pid {state.process.pid})")
+
+            drain = asyncio.create_task(self._drain(state, logger))
+            probe = asyncio.create_task(self._probe(state)) if service.ready_url else None
+            if not service.ready_url and not service.oneshot:
+                self._mark_ready(state)
+            returncode = await state.process.wait()
+            await drain
+            if probe is not None:
+                probe.cancel()
+
+            if self._stopping.is_set():
+                break
+            if service.oneshot:
+                if returncode == 0:
+                    self._mark_ready(state)
+                    state.status = "completed"
+                else:
+                    state.status = "failed"
+                    self.log(f"{service.name}: exited with {returncode}; last output:\n  "
+                             + "\n  ".join(state.last_lines))
+                break
+
+            self.log(f"{service.name}: exited with {returncode}; last output:\n  " + "\n  ".join(state.last_lines))
+            if not service.restart:
+                state.status = "exited"
+                break
+            if time.monotonic() - state.started_at >= self.stable_seconds:
+                consecutive_failures = 0
+            consecutive_failures += 1
+            if self._crash_loop(state):
+                state.status = "crash-loop"
+                self.log(f"{service.name}: {len(state.crashes)} crashes within {self.crash_loop_window:.0f}s, giving up")
+                break
+            delay = self._backoff(consecutive_failures)
+            self.log(f"{service.name}: restarting in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+            state.restarts += 1
+        state.finished.set()
+        state.settled.set()
+
+    async def _report_when_ready(self):
+        """
+        Megvárja, amíg minden szolgáltatás kész, véglegesen leállt vagy túllépte a ready_timeout-ot,
+        és kiírja az időket.
+        """
+        for state in self.states.values():
+            await state.settled.wait()
+        self.all_ready_at = time.monotonic()
+        report = self.report()
+        self.log(f"startup finished in {report['seconds_to_all_ready']:.2f}s")
+        for name, entry in report["services"].items():
+            ready = f"{entry['seconds_to_ready']:.2f}s" if entry["seconds_to_ready"] is not None else "-"
+            self.log(f"  {name:<20} {entry['status']:<10} ready: {ready}")
+        os.makedirs(self.log_dir, exist_ok=True)
+        with open(os.path.join(self.log_dir, "startup_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+
+    def report(self):
+        return {
+            "seconds_to_all_ready": (self.all_ready_at - self.started_at) if self.all_ready_at else None,
+            "services": {
+                name: {
+                    "status": state.status,
+                    "seconds_to_ready": (state.ready_at - self.started_at) if state.ready_at else None,
+                    "restarts": state.restarts,
+                }
+                for name, state in self.states.items()
+            },
+        }
+
+    async def _terminate(self, state, timeout=5.0):
+        process = state.process
+        if process is None or process.returncode is not None:
+            return
+        self.log(f"{state.service.name}: stopping")
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        except ProcessLookupError:
+            pass
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        """Minden szolgáltatás indítása; leállításig (stop(), SIGINT/SIGTERM) fut."""
+        self.started_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        if sys.platform != "win32":
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(signum, self.stop)
+
+        tasks = [asyncio.create_task(self._run_service(state)) for state in self.states.values()]
+        reporter = asyncio.create_task(self._report_when_ready())
+        try:
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            reporter.cancel()
+            await asyncio.gather(*(self._terminate(state) for state in self.states.values()))
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.log("all services stopped")
@@ -0,0 +1,127 @@
+"""
+Natív, tömb alapú döntési fa kiértékelő a DecisionTreeClassifier modellhez.
+
+A betanított fa tömbjeit (children_left/right, feature, threshold, value) lapos
+NumPy tömbökbe másolja, és a fát szintenként járja be a batch összes sorára
+egyszerre. Nincs pyfunc/pandas csomagolás és sklearn bemenet-ellenőrzés, az
+eredmény viszont bitre megegyezik az sklearn predict/predict_proba kimenetével:
+a NaN értékek a node `missing_go_to_left` iránya szerint haladnak, a végtelen (vagy
+float32-ben nem ábrázolható) értékeket pedig az sklearn-hez hasonlóan ValueError-ral utasítja el.
+"""
+
+import numpy as np
+
+# sklearn.tree._tree.TREE_LEAF
+TREE_LEAF = -1
+
+
+class TreeEngine:
+    def __init__(self, children_left, children_right, feature, threshold, leaf_proba, classes, max_depth, n_features,
+                 missing_left=None):
+        children_left = np.asarray(children_left, dtype=np.intp)
+        children_right = np.asarray(children_right, dtype=np.intp)
+        is_leaf = children_left == TREE_LEAF
+        nodes = np.arange(len(children_left), dtype=np.intp)
+        # A levelek önmagukra mutatnak, így a bejárás fix max_depth lépés, levél-ellenőrzés nélkül.
+        # children[2 * node + go_left]: egyetlen gather a jobb/bal gyerek kiválasztásához.
+        self.children = np.ascontiguousarray(np.column_stack([
+            np.where(is_leaf, nodes, children_right),
+            np.where(is_leaf, nodes, children_left),
+        ]).ravel())
+        # A leveleknél a feature -2; 0-ra cseréljük, hogy az indexelés mindig érvényes legyen
+        self.feature = np.ascontiguousarray(np.where(is_leaf, 0, feature), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        # NaN esetén a bal gyerek felé megy-e (sklearn missing_go_to_left); régi sklearn-nél jobbra
+        if missing_left is None:
+            missing_left = np.zeros(len(children_left), dtype=bool)
+        self.missing_left = np.ascontiguousarray(missing_left, dtype=bool)
+        self.leaf_proba = np.ascontiguousarray(leaf_proba, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.leaf_class = self.classes.take(np.argmax(self.leaf_proba, axis=1))
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+    @classmethod
+    def from_sklearn(cls, clf):
+        """TreeEngine egy betanított DecisionTreeClassifier-ből."""
+        tree = clf.tree_
+        # sklearn.tree.DecisionTreeClassifier.predict_proba normalizálása
+        proba = np.array(tree.value[:, 0, :clf.n_classes_], dtype=np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        proba /= normalizer
+        nodes = tree.__getstate__()["nodes"]
+        missing_left = nodes["missing_go_to_left"] if "missing_go_to_left" in nodes.dtype.names else None
+        return cls(tree.children_left, tree.children_right, tree.feature, tree.threshold,
+                   proba, clf.classes_, tree.max_depth, clf.n_features_in_, missing_left)
+
+    @classmethod
+    def from_arrays(cls, children, feature, threshold, missing_left, leaf_proba, classes, leaf_class, max_depth,
+                    n_features):
+        """
+        TreeEngine a már előkészített tömbökből (lásd `arrays()`), másolás nélkül; a tömbök
+        lehetnek csak olvasható, memória-leképezett nézetek is.
+        """
+        engine = cls.__new__(cls)
+        engine.children = children
+        engine.feature = feature
+        engine.threshold = threshold
+        engine.missing_left = missing_left
+        engine.leaf_proba = leaf_proba
+        engine.classes = classes
+        engine.leaf_class = leaf_class
+        engine.max_depth = int(max_depth)
+        engine.n_features = int(n_features)
+        return engine
+
+    def arrays(self):
+        """Az előkészített tömbök név szerint (a `from_arrays` bemenete, a max_depth/n_features nélkül)."""
+        return {"children": self.children, "feature": self.feature, "threshold": self.threshold,
+                "missing_left": self.missing_left, "leaf_proba": self.leaf_proba, "classes": self.classes,
+                "leaf_class": self.leaf_class}
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        TreeEngine sklearn vagy MLflow pyfunc modellből.
+        None, ha a modell nem egyetlen kimenetű DecisionTreeClassifier.
+        """
+        from sklearn.tree import DecisionTreeClassifier
+
+        if not isinstance(model, DecisionTreeClassifier) and hasattr(model, "get_raw_model"):
+            try:
+                model = model.get_raw_model()
+            except Exception:
+                return None
+        if not isinstance(model, DecisionTreeClassifier) or model.n_outputs_ != 1:
+            return None
+        return cls.from_sklearn(model)
+
+    def apply(self, X):
+        """A levél node indexe minden sorra (mint DecisionTreeClassifier.apply)."""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected a 2D array with {self.n_features} columns, got shape {X.shape}")
+        # Az sklearn float32-ként hasonlít a (float64) küszöbhöz
+        with np.errstate(over="ignore"):
+            flat = np.ascontiguousarray(X, dtype=np.float32).ravel()
+        missing = None
+        if not np.isfinite(flat).all():
+            if np.isinf(flat).any():
+                raise ValueError("Input contains infinity or a value too large for float32")
+            missing = np.isnan(flat)
+        row_offsets = np.arange(0, flat.size, self.n_features, dtype=np.intp)
+        node = np.zeros(len(X), dtype=np.intp)
+        for _ in range(self.max_depth):
+            index = row_offsets + self.feature.take(node)
+            go_left = flat.take(index) <= self.threshold.take(node)
+            if missing is not None:
+                go_left = np.where(missing.take(index), self.missing_left.take(node), go_left)
+            node = self.children.take(2 * node + go_left)
+        return node
+
+    def predict(self, X):
+        return self.leaf_class.take(self.apply(X))
+
+    def predict_proba(self, X):
+        return self.leaf_proba.take(self.apply(X), axis=0)
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+# Az api modul import közben olvassa a környezetet: a tesztek ne érjék el a /tmp/iris_model.pkl-t és a szervert
+_TMP = tempfile.mkdtemp(prefix="iris-tests-")
+os.environ.setdefault("LOCAL_MODEL_PATH", os.path.join(_TMP, "iris_model.pkl"))
+os.environ.setdefault("MLFLOW_TRACKING_URI", f"sqlite:///{os.path.join(_TMP, 'mlflow.db')}")
+os.environ.setdefault("MLFLOW_DISABLE_AGENT_HINT", "1")
+os.environ.setdefault("API_LOG_ENABLED", "false")
+os.environ.pop("ADMIN_TOKEN", None)
+os.environ.setdefault("PROFILER_OUTPUT_DIR", os.path.join(_TMP, "profiles"))
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+import joblib
+import pytest
+from sklearn.datasets import load_iris
+from sklearn.tree import DecisionTreeClassifier
+
+
+@pytest.fixture(scope="session")
+def served_model():
+    """A kiszolgált modell: az Iris fa a LOCAL_MODEL_PATH-on, a kompakt párjával együtt."""
+    import compact_model
+
+    X, y = load_iris(return_X_y=True)
+    clf = DecisionTreeClassifier(random_state=42).fit(X, y)
+    joblib.dump(clf, os.environ["LOCAL_MODEL_PATH"])
+    compact_model.export_sklearn(clf, _TMP, os.environ["LOCAL_MODEL_PATH"])
+    return clf
@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def client():
+    # Életciklus nélkül: a profiler háttérszála a teszt végén leáll
+    yield TestClient(api.app)
+    api.profiler.stop()
+
+
+def test_admin_disabled_by_default(client):
+    assert api.ADMIN_TOKEN is None
+    assert client.post("/admin/profile?seconds=1").status_code == 404
+    assert client.get("/admin/profile", headers={"X-Admin-Token": ""}).status_code == 404
+    assert not api.profiler.armed
+
+
+def test_admin_requires_token(client, monkeypatch):
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    assert client.post("/admin/profile?seconds=1").status_code == 403
+    assert client.get("/admin/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert not api.profiler.armed
+
+    response = client.post("/admin/profile?seconds=100000", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["window_seconds"] == api.PROFILER_MAX_WINDOW_SECONDS
+    assert client.get("/admin/profile", headers={"X-Admin-Token": "secret"}).json()["armed"]
+    api.profiler.start_window(0)
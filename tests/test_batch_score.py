@@ -0,0 +1,81 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.datasets import load_iris
+from sklearn.tree import DecisionTreeClassifier
+
+import api
+import batch_score
+
+ROWS = np.random.default_rng(0).uniform([4, 2, 1, 0.1], [8, 4.5, 7, 2.5], size=(2000, 4))
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+def write_model(path, labels=None, max_depth=None):
+    X, y = load_iris(return_X_y=True)
+    clf = DecisionTreeClassifier(max_depth=max_depth, random_state=0).fit(X, y if labels is None else labels[y])
+    joblib.dump(clf, str(path))
+    return clf
+
+
+def write_input(path, rows=ROWS, **extra_columns):
+    frame = pd.DataFrame(rows, columns=api.FEATURE_NAMES)
+    for name, values in extra_columns.items():
+        frame[name] = values
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def read_output(path):
+    return pd.read_csv(path) if str(path).endswith(".csv") else pd.read_parquet(path)
+
+
+def test_model_uri_uses_that_pickle(served_model, tmp_path):
+    # A LOCAL_MODEL_PATH-on lévő modell helyett a --model-uri pickle-t kell használni
+    clf = write_model(tmp_path / "other.pkl", max_depth=1)
+    assert not np.array_equal(clf.predict(ROWS), served_model.predict(ROWS))
+    input_path, output_path = write_input(tmp_path / "in.csv"), tmp_path / "out.csv"
+    batch_score.score_file(input_path, str(output_path), workers=1, model_uri=str(tmp_path / "other.pkl"))
+    assert np.array_equal(read_output(output_path)["prediction"].to_numpy(), clf.predict(ROWS))
+
+
+@pytest.mark.parametrize("labels", [np.array([0, 200, 300]), np.array(["setosa", "versicolor", "virginica"])])
+def test_keeps_model_label_dtype(tmp_path, labels):
+    clf = write_model(tmp_path / "labels.pkl", labels=labels)
+    input_path = write_input(tmp_path / "in.csv")
+    for output_path in (tmp_path / "out.csv", tmp_path / "out.parquet"):
+        batch_score.score_file(input_path, str(output_path), workers=1, model_uri=str(tmp_path / "labels.pkl"))
+        assert np.array_equal(read_output(output_path)["prediction"].to_numpy(), clf.predict(ROWS))
+
+
+def test_chunks_from_several_workers_are_written_in_input_order(tmp_path):
+    clf = write_model(tmp_path / "model.pkl")
+    input_path, output_path = write_input(tmp_path / "in.csv"), tmp_path / "out.csv"
+    rows, _ = batch_score.score_file(input_path, str(output_path), workers=3, chunk_rows=97,
+                                     model_uri=str(tmp_path / "model.pkl"))
+    assert rows == len(ROWS)
+    assert np.array_equal(read_output(output_path)["prediction"].to_numpy(), clf.predict(ROWS))
+
+
+@pytest.mark.parametrize("output_name", ["out.csv", "out.parquet"])
+def test_id_column_is_copied_unchanged(tmp_path, output_name):
+    clf = write_model(tmp_path / "model.pkl")
+    ids = [f"row-{i:05d}" for i in range(len(ROWS))][::-1]
+    input_path, output_path = write_input(tmp_path / "in.csv", row_id=ids), tmp_path / output_name
+    batch_score.score_file(input_path, str(output_path), id_column="row_id", workers=2, chunk_rows=500,
+                           model_uri=str(tmp_path / "model.pkl"))
+    frame = read_output(output_path)
+    assert list(frame.columns) == ["row_id", "prediction"]
+    assert frame["row_id"].tolist() == ids
+    assert np.array_equal(frame["prediction"].to_numpy(), clf.predict(ROWS))
+
+
+def test_rejects_missing_values(served_model, tmp_path):
+    input_path = tmp_path / "in.csv"
+    frame = pd.DataFrame([list(ROW.values())] * 3, columns=api.FEATURE_NAMES)
+    frame.loc[2, "petal_length"] = np.nan
+    frame.to_csv(input_path, index=False)
+    with pytest.raises(ValueError, match="Row 2"):
+        batch_score.score_file(str(input_path), str(tmp_path / "out.csv"), workers=1, chunk_rows=2,
+                               model_uri=api.LOCAL_MODEL_PATH)
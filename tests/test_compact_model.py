@@ -0,0 +1,128 @@
+import json
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.datasets import load_iris
+from sklearn.tree import DecisionTreeClassifier
+
+import api
+import compact_model
+
+ROWS = np.random.default_rng(0).uniform([4, 2, 1, 0.1], [8, 4.5, 7, 2.5], size=(2000, 4))
+
+
+@pytest.fixture
+def two_models(tmp_path):
+    """Két különböző modell, mindkettő pickle + saját kompakt pár a tanítás útján kiírva."""
+    X, y = load_iris(return_X_y=True)
+    models = {}
+    for name, depth in (("prod", None), ("other", 1)):
+        clf = DecisionTreeClassifier(max_depth=depth, random_state=0).fit(X, y)
+        pickle_path = str(tmp_path / f"{name}.pkl")
+        joblib.dump(clf, pickle_path)
+        compact_model.export_sklearn(clf, str(tmp_path), pickle_path)
+        models[name] = (clf, pickle_path)
+    assert not np.array_equal(models["prod"][0].predict(ROWS), models["other"][0].predict(ROWS))
+    return models
+
+
+def load_local(pickle_path):
+    return api.ModelHolder(api.MODEL_NAME, api.MODEL_STAGE, local_path=pickle_path).load("local", "test", pickle_path)
+
+
+def test_each_pickle_uses_its_own_compact_model(two_models):
+    for clf, pickle_path in two_models.values():
+        loaded = load_local(pickle_path)
+        assert loaded.engine == "compact"
+        assert np.array_equal(loaded.model.predict(ROWS), clf.predict(ROWS))
+
+
+def test_replaced_pickle_does_not_use_stale_compact_model(two_models):
+    prod_clf, prod_path = two_models["prod"]
+    other_clf, other_path = two_models["other"]
+    # Az "other" pickle helyére a prod modell kerül; az other.tree így már egy másik modellé
+    shutil.copy(prod_path, other_path)
+    loaded = load_local(other_path)
+    assert loaded.engine == "native"
+    assert np.array_equal(loaded.model.predict(ROWS), prod_clf.predict(ROWS))
+
+
+def test_pickle_replaced_within_the_same_second_is_a_new_version(two_models, tmp_path):
+    prod_clf, prod_path = two_models["prod"]
+    other_clf, other_path = two_models["other"]
+    served = str(tmp_path / "served.pkl")
+    shutil.copy(prod_path, served)
+    holder = api.ModelHolder(api.MODEL_NAME, api.MODEL_STAGE, local_path=served, refresh_seconds=0)
+    assert np.array_equal(holder.get().model.predict(ROWS), prod_clf.predict(ROWS))
+    mtime_ns = os.stat(served).st_mtime_ns
+    shutil.copy(other_path, served)
+    # Ugyanabban a másodpercben: a régi, egész másodperces verzió nem változott volna
+    os.utime(served, ns=(mtime_ns, mtime_ns + 1))
+    assert holder.refresh()
+    assert np.array_equal(holder.get().model.predict(ROWS), other_clf.predict(ROWS))
+
+
+def test_registry_version_loads_downloaded_compact_artifact(tmp_path):
+    import mlflow
+    import mlflow.sklearn
+
+    X, y = load_iris(return_X_y=True)
+    clf = DecisionTreeClassifier(max_depth=3, random_state=0).fit(X, y)
+    artifact = compact_model.export_sklearn(clf, str(tmp_path))
+    experiment_id = mlflow.create_experiment("compact-download", artifact_location=(tmp_path / "artifacts").as_uri())
+    for name, extra_files in (("CompactDownload", [artifact]), ("CompactMissing", None)):
+        with mlflow.start_run(experiment_id=experiment_id):
+            mlflow.sklearn.log_model(clf, name="model", extra_files=extra_files, registered_model_name=name,
+                                     serialization_format="cloudpickle")
+
+    loaded = api.ModelHolder("CompactDownload", api.MODEL_STAGE).load("stage", "1", "models:/CompactDownload/1")
+    assert loaded.engine == "compact"
+    assert np.array_equal(loaded.model.predict(ROWS), clf.predict(ROWS))
+    loaded = api.ModelHolder("CompactMissing", api.MODEL_STAGE).load("stage", "1", "models:/CompactMissing/1")
+    assert loaded.engine == "native"
+
+
+def test_matches_source_hashes_pickle_only_after_change(two_models, monkeypatch):
+    _, pickle_path = two_models["prod"]
+    _, header = compact_model.load(compact_model.local_path_for(pickle_path))
+    hashed = []
+    file_identity = compact_model.file_identity
+    monkeypatch.setattr(compact_model, "file_identity", lambda path: hashed.append(path) or file_identity(path))
+    for _ in range(3):
+        assert compact_model.matches_source(header, pickle_path)
+    assert len(hashed) <= 1
+    stat = os.stat(pickle_path)
+    os.utime(pickle_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    hashed.clear()
+    assert compact_model.matches_source(header, pickle_path)
+    assert hashed == [pickle_path]
+
+
+def malformed_header(header, header_bytes):
+    del header["arrays"]
+    return json.dumps(header).encode()
+
+
+def truncated_header(header, header_bytes):
+    return header_bytes[:len(header_bytes) // 2]
+
+
+@pytest.mark.parametrize("corrupt", [malformed_header, truncated_header])
+def test_malformed_header_raises_value_error_and_falls_back(two_models, corrupt):
+    prod_clf, pickle_path = two_models["prod"]
+    path = compact_model.local_path_for(pickle_path)
+    with open(path, "rb") as f:
+        content = f.read()
+    magic, version, header_size = compact_model.PREFIX.unpack_from(content, 0)
+    header_bytes = content[compact_model.PREFIX.size:compact_model.PREFIX.size + header_size]
+    corrupted = corrupt(json.loads(header_bytes), header_bytes)
+    with open(path, "wb") as f:
+        f.write(compact_model.PREFIX.pack(magic, version, header_size) + corrupted)
+    with pytest.raises(ValueError):
+        compact_model.load(path)
+    loaded = load_local(pickle_path)
+    assert loaded.engine == "native"
+    assert np.array_equal(loaded.model.predict(ROWS), prod_clf.predict(ROWS))
@@ -0,0 +1,104 @@
+import os
+
+import numpy as np
+import pytest
+
+from dataset_cache import SPLIT_ARRAYS, DatasetCache, file_fingerprint
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "data.csv"
+    rows = np.random.default_rng(0).normal(size=(40, 3))
+    np.savetxt(path, np.column_stack([rows, np.arange(40) % 2]), delimiter=",")
+    return path
+
+
+class Loader:
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        data = np.loadtxt(self.path, delimiter=",")
+        return data[:, :3], data[:, 3].astype(int), ["a", "b", "c"]
+
+
+def split(cache, path, load, **kwargs):
+    return cache.split("test", file_fingerprint(str(path)), load, **kwargs)
+
+
+def test_hit_returns_the_same_split_and_key_as_the_miss(tmp_path, source):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    load = Loader(source)
+    miss = split(cache, source, load)
+    hit = split(cache, source, load)
+    assert (miss.hit, hit.hit) == (False, True)
+    assert load.calls == 1
+    assert hit.key == miss.key
+    assert hit.feature_names == miss.feature_names == ["a", "b", "c"]
+    for part in SPLIT_ARRAYS:
+        np.testing.assert_array_equal(getattr(hit, part), getattr(miss, part))
+    assert (len(hit.X_train), len(hit.X_test)) == (32, 8)
+    # Más felosztási paraméter más kulcs
+    assert split(cache, source, load, random_state=0).key != miss.key
+
+
+def test_changed_source_gives_a_new_key(tmp_path, source):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    load = Loader(source)
+    first = split(cache, source, load)
+    with open(source, "a") as f:
+        f.write("0.5,0.5,0.5,1\n")
+    second = split(cache, source, load)
+    assert second.key != first.key
+    assert not second.hit and load.calls == 2
+    assert len(second.X_train) + len(second.X_test) == 41
+    # Ugyanannak a névnek a régi forrásból készült bejegyzése törlődik
+    assert [key for key, _, _ in cache.entries()] == [second.key]
+
+
+def test_cached_arrays_are_read_only_memory_maps(tmp_path, source):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    split(cache, source, Loader(source))
+    cached = split(cache, source, Loader(source))
+    for part in SPLIT_ARRAYS:
+        array = getattr(cached, part)
+        assert isinstance(array, np.memmap)
+        assert not array.flags.writeable
+    with pytest.raises(ValueError):
+        cached.X_train[0, 0] = 1.0
+
+
+def test_truncated_entry_is_rebuilt(tmp_path, source):
+    cache = DatasetCache(str(tmp_path / "cache"))
+    load = Loader(source)
+    first = split(cache, source, load)
+    expected = np.array(first.X_train)
+    path = os.path.join(cache.directory, first.key, "X_train.npy")
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 8)
+    second = split(cache, source, load)
+    assert not second.hit and load.calls == 2
+    np.testing.assert_array_equal(second.X_train, expected)
+
+
+def test_entry_larger_than_the_limit_is_not_kept(tmp_path, source):
+    cache = DatasetCache(str(tmp_path / "cache"), max_bytes=1024)
+    load = Loader(source)
+    small = cache.split("small", "fingerprint", lambda: (np.zeros((4, 1)), np.arange(4) % 2, ["a"]))
+    assert not small.hit and cache.stats()["entries"] == 1
+
+    result = split(cache, source, load)
+    assert not result.hit and not isinstance(result.X_train, np.memmap)
+    assert (len(result.X_train), len(result.X_test)) == (32, 8)
+    # A túl nagy bejegyzés nem kerül a cache-be, és a meglévőt sem szorítja ki
+    assert [key for key, _, _ in cache.entries()] == [small.key]
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    assert not split(cache, source, load).hit and load.calls == 2
+
+    # Ha a tömbök beférnének, de a fájlfejlécekkel már nem, a megírt bejegyzés is törlődik
+    cache.max_bytes = sum(array.nbytes for array in result[:4])
+    assert not split(cache, source, load).hit
+    assert [key for key, _, _ in cache.entries()] == [small.key]
@@ -0,0 +1,115 @@
+import json
+
+import numpy as np
+import pytest
+
+from drift import EPSILON, DriftEngine, DriftReference
+
+RNG = np.random.default_rng(0)
+TRAIN = RNG.normal([5.8, 3.0, 3.8, 1.2], [0.8, 0.4, 1.8, 0.8], size=(500, 4))
+
+
+def direct_scores(train, window, bins=10):
+    """PSI és binelt KS jellemzőnként, ciklusokkal, a motortól függetlenül."""
+    psi, ks = [], []
+    for feature in range(train.shape[1]):
+        inner = np.linspace(train[:, feature].min(), train[:, feature].max(), bins + 1)
+        # Alsó nyitott bin, a belső binek, felső nyitott bin; a határ a felső binbe esik
+        edges = np.concatenate([[-np.inf], inner, [np.inf]])
+
+        def probabilities(values, smooth):
+            counts = np.array([np.sum((values >= low) & (values < high)) for low, high in zip(edges, edges[1:])])
+            return (counts + smooth) / (counts.sum() + smooth * len(counts))
+
+        expected = probabilities(train[:, feature], 0)
+        expected = (expected + EPSILON) / (1 + EPSILON * len(expected))
+        observed = probabilities(window[:, feature], EPSILON)
+        psi.append(sum((o - e) * np.log(o / e) for o, e in zip(observed, expected)))
+        ks.append(max(abs(a - b) for a, b in zip(np.cumsum(observed), np.cumsum(expected))))
+    return np.array(psi), np.array(ks)
+
+
+def engine_for(window, bucket_seconds=60, window_buckets=5):
+    engine = DriftEngine(DriftReference.from_data(TRAIN), bucket_seconds, window_buckets)
+    engine.update(np.full(len(window), 1000.0), window)
+    return engine
+
+
+def scores(report, name):
+    return np.array([report["features"][feature][name] for feature in report["features"]])
+
+
+@pytest.mark.parametrize("shift", [0.0, 0.3, 2.0])
+def test_psi_and_ks_match_direct_computation(shift):
+    window = RNG.normal([5.8, 3.0, 3.8, 1.2], [0.8, 0.4, 1.8, 0.8], size=(300, 4)) + [shift, 0, 0, 0]
+    report = engine_for(window).report()
+    psi, ks = direct_scores(TRAIN, window)
+    np.testing.assert_allclose(scores(report, "psi"), psi, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(scores(report, "ks"), ks, rtol=1e-9, atol=1e-12)
+
+
+def test_training_data_has_no_drift_and_disjoint_data_has_full_ks():
+    # Az EPSILON simítás miatt azonos adatra is ~1e-6 nagyságrendű marad
+    report = engine_for(TRAIN).report()
+    np.testing.assert_allclose(scores(report, "psi"), 0, atol=1e-4)
+    np.testing.assert_allclose(scores(report, "ks"), 0, atol=1e-4)
+    assert report["drifted_features"] == []
+
+    # Lefelé tolva minden érték az alsó nyitott binbe kerül, ahol a tanító adatnak nincs eleme
+    report = engine_for(TRAIN - [100, 0, 0, 0]).report()
+    assert report["features"]["sepal_length"]["ks"] == pytest.approx(1, abs=1e-5)
+    assert report["drifted_features"] == ["sepal_length"]
+
+
+def test_window_moments_match_numpy_across_buckets():
+    engine = DriftEngine(DriftReference.from_data(TRAIN), bucket_seconds=60, window_buckets=5)
+    ts = np.sort(RNG.uniform(0, 290, size=len(TRAIN)))
+    for batch in np.array_split(np.arange(len(TRAIN)), 7):
+        engine.update(ts[batch], TRAIN[batch])
+    window = engine.window()
+    assert len(engine.buckets) == 5
+    assert window.count == len(TRAIN)
+    np.testing.assert_allclose(window.mean, TRAIN.mean(axis=0))
+    np.testing.assert_allclose(window.std, TRAIN.std(axis=0))
+
+
+def test_old_buckets_slide_out_and_late_records_are_counted():
+    engine = DriftEngine(DriftReference.from_data(TRAIN), bucket_seconds=60, window_buckets=2)
+    engine.update([0.0, 10.0], TRAIN[:2])
+    engine.update([60.0], TRAIN[2:3])
+    engine.update([125.0], TRAIN[3:4])
+    assert sorted(engine.buckets) == [1, 2]
+    assert engine.update([5.0], TRAIN[4:5]) == 0
+    report = engine.report()
+    assert (report["records"], report["late_records"]) == (2, 1)
+    assert (report["window_start"], report["window_end"]) == (60, 180)
+
+
+def test_state_round_trip_keeps_report():
+    engine = DriftEngine(DriftReference.from_data(TRAIN), bucket_seconds=60, window_buckets=5)
+    engine.update(RNG.uniform(0, 290, size=len(TRAIN)), TRAIN + [0.5, 0, 0, 0])
+    reference = DriftReference.from_dict(json.loads(json.dumps(engine.reference.to_dict())))
+    restored = DriftEngine.from_dict(reference, json.loads(json.dumps(engine.to_dict())))
+    assert restored.report() == engine.report()
+
+
+def test_changed_window_settings_start_a_fresh_window(tmp_path, capsys):
+    from neptuneai_monitoring import load_state, save_state
+    from prediction_log import LogCursor
+
+    reference = DriftReference.from_data(TRAIN)
+    engine = DriftEngine(reference, bucket_seconds=60, window_buckets=5)
+    engine.update(RNG.uniform(0, 290, size=len(TRAIN)), TRAIN)
+    path = str(tmp_path / "state.json")
+    save_state(path, engine, LogCursor({"1700000000-1": 123}))
+
+    restored, cursor = load_state(path, reference, 60, 5)
+    assert restored.report() == engine.report()
+    assert cursor.offsets == {"1700000000-1": 123}
+    assert capsys.readouterr().out == ""
+
+    for bucket_seconds, window_buckets in ((300, 5), (60, 12)):
+        fresh, cursor = load_state(path, reference, bucket_seconds, window_buckets)
+        assert (fresh.bucket_seconds, fresh.window_buckets) == (bucket_seconds, window_buckets)
+        assert fresh.buckets == {} and cursor.offsets == {}
+        assert "új ablak" in capsys.readouterr().out
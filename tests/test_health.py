@@ -0,0 +1,61 @@
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def client():
+    # Lifespan nélkül: a modellt a teszt tölti be (vagy nem)
+    return TestClient(api.app)
+
+
+def use_holder(monkeypatch, local_path):
+    holder = api.ModelHolder(api.MODEL_NAME, api.MODEL_STAGE, local_path=local_path, refresh_seconds=0)
+    monkeypatch.setattr(api, "model_holder", holder)
+    return holder
+
+
+def test_readyz_is_503_until_warmed_up(served_model, client, monkeypatch, tmp_path):
+    model_path = str(tmp_path / "model.pkl")
+    shutil.copy(api.LOCAL_MODEL_PATH, model_path)
+    holder = use_holder(monkeypatch, model_path)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"ready": False, "model_version": None}
+
+    loaded = holder.get()
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert (body["model_version"], body["model_source"]) == (loaded.version, "local")
+    assert body["warmup_seconds"] == loaded.warmup_seconds >= 0
+
+
+def test_readyz_is_503_when_the_model_fails_to_load(client, monkeypatch, tmp_path):
+    model_path = tmp_path / "broken.pkl"
+    model_path.write_bytes(b"not a pickle")
+    holder = use_holder(monkeypatch, str(model_path))
+    failures = api.errors.value("model_refresh")
+    holder.start()
+    holder._thread.join(timeout=10)
+    assert api.errors.value("model_refresh") == failures + 1
+    assert holder.current is None
+    assert client.get("/readyz").status_code == 503
+
+
+def test_healthz_never_touches_the_model(client, monkeypatch, tmp_path):
+    holder = use_holder(monkeypatch, str(tmp_path / "missing.pkl"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("/healthz must not load or resolve the model")
+
+    for name in ("get", "refresh", "resolve", "load"):
+        monkeypatch.setattr(holder, name, fail)
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+    assert holder.current is None
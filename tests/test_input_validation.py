@@ -0,0 +1,52 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+# A JSON szabvány nem ismeri, de a Python json modul elfogadja ezeket a literálokat
+NON_FINITE = ["NaN", "Infinity", "-Infinity", "1e39"]
+
+
+@pytest.fixture(scope="module")
+def client(served_model):
+    with TestClient(api.app) as client:
+        yield client
+
+
+def raw_row(value):
+    return json.dumps(ROW).replace("1.4", value)
+
+
+@pytest.mark.parametrize("value", NON_FINITE)
+def test_predict_rejects_non_finite(client, value):
+    response = client.post("/predict", content=raw_row(value), headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("value", NON_FINITE)
+def test_predict_batch_rejects_non_finite_rows_and_columns(client, value):
+    rows = f'{{"rows": [{json.dumps(ROW)}, {raw_row(value)}]}}'
+    columns = json.dumps({"columns": {name: [v] for name, v in ROW.items()}}).replace("1.4", value)
+    for body in (rows, columns):
+        response = client.post("/predict/batch", content=body, headers={"Content-Type": "application/json"})
+        assert response.status_code == 422
+
+
+@pytest.mark.parametrize("value", NON_FINITE)
+def test_predict_stream_reports_non_finite_line(client, value):
+    body = f"{json.dumps(ROW)}\n{raw_row(value)}\n".encode()
+    lines = [json.loads(line) for line in client.post("/predict/stream", content=body).text.splitlines()]
+    assert "prediction" in lines[0]
+    assert "finite" in lines[1]["error"]
+
+
+def test_predict_binary_rejects_non_finite(client):
+    data = np.array([[5.1, 3.5, np.nan, 0.2]], dtype="<f4")
+    response = client.post("/predict/binary", content=data.tobytes(),
+                           headers={"Content-Type": api.BINARY_CONTENT_TYPE})
+    assert response.status_code == 400
+
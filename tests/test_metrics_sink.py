@@ -0,0 +1,123 @@
+import json
+
+from metrics_sink import FileSink, MetricsSink, NeptuneSink
+
+
+class FakeSeries:
+    def __init__(self):
+        self.calls = []
+
+    def extend(self, values, steps=None, timestamps=None):
+        self.calls.append((list(values), steps, list(timestamps)))
+
+
+class FakeRun:
+    """A neptune.Run általunk használt része: run[kulcs].extend(), run.assign(), run.stop()."""
+
+    def __init__(self):
+        self.series = {}
+        self.assigned = []
+        self.stopped = False
+
+    def __getitem__(self, key):
+        return self.series.setdefault(key, FakeSeries())
+
+    def assign(self, value):
+        self.assigned.append(value)
+
+    def stop(self):
+        self.stopped = True
+
+
+def neptune_sink(**kwargs):
+    sink = NeptuneSink(project="test/project", **kwargs)
+    sink._neptune_run = FakeRun()
+    return sink
+
+
+def test_neptune_run_does_not_shadow_flush_thread():
+    sink = NeptuneSink(project="test/project")
+    assert sink._neptune_run is None
+    assert callable(sink._run)
+
+
+def test_neptune_keeps_history_across_flushes():
+    sink = neptune_sink()
+    sink.log("drift/psi", 0.1, step=1, timestamp=100.0)
+    assert sink.flush(5)
+    sink.log("drift/psi", 0.3, step=2, timestamp=200.0)
+    sink.close(5)
+    run = sink._neptune_run
+    assert run.series["drift/psi"].calls == [([0.1], [1], [100.0]), ([0.3], [2], [200.0])]
+    assert run.assigned == []
+    assert run.stopped
+    assert sink.stats()["written"] == 2
+
+
+def test_neptune_same_key_in_one_batch_keeps_every_point():
+    sink = neptune_sink(batch_size=100, flush_seconds=60)
+    for step in range(3):
+        sink.log_many({"drift/psi": step / 10, "drift/ks": step}, step=step, timestamp=float(step))
+    sink.close(5)
+    series = sink._neptune_run.series
+    assert series["drift/psi"].calls == [([0.0, 0.1, 0.2], [0, 1, 2], [0.0, 1.0, 2.0])]
+    assert series["drift/ks"].calls == [([0.0, 1.0, 2.0], [0, 1, 2], [0.0, 1.0, 2.0])]
+
+
+def test_neptune_without_step_lets_neptune_number_points():
+    sink = neptune_sink()
+    sink.log("latency/p99", 12, timestamp=1.0)
+    sink.close(5)
+    assert sink._neptune_run.series["latency/p99"].calls == [([12.0], None, [1.0])]
+
+
+def test_neptune_assigns_non_numeric_values():
+    sink = neptune_sink()
+    sink.log_many({"drift/status": "ok", "drift/alert": True, "drift/psi": 0.2}, step=1, timestamp=1.0)
+    sink.close(5)
+    run = sink._neptune_run
+    assert run.assigned == [{"drift": {"status": "ok", "alert": True}}]
+    assert list(run.series) == ["drift/psi"]
+
+
+def test_file_sink_writes_every_record(tmp_path):
+    path = tmp_path / "metrics" / "out.ndjson"
+    sink = FileSink(str(path), batch_size=2)
+    for step in range(5):
+        sink.log("drift/psi", step, step=step, timestamp=10.0 + step)
+    sink.close(5)
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(row["key"], row["value"], row["step"], row["timestamp"]) for row in rows] == \
+        [("drift/psi", step, step, 10.0 + step) for step in range(5)]
+    assert sink.stats()["written"] == 5
+
+
+class FlakySink(MetricsSink):
+    def __init__(self, failures, **kwargs):
+        super().__init__(retry_initial_seconds=0.01, **kwargs)
+        self.failures = failures
+        self.records = []
+
+    def _write(self, records):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("backend down")
+        self.records.extend(records)
+
+
+def test_retries_then_writes():
+    sink = FlakySink(failures=2)
+    sink.log("a", 1.0, step=0, timestamp=0.0)
+    assert sink.flush(5)
+    sink.close(5)
+    assert sink.records == [("a", 1.0, 0, 0.0)]
+    stats = sink.stats()
+    assert (stats["written"], stats["failed"], stats["retries"]) == (1, 0, 2)
+
+
+def test_full_buffer_drops_and_counts():
+    sink = FlakySink(failures=0, max_buffer=3, flush_seconds=60, batch_size=100)
+    sink.log_many({f"k{i}": i for i in range(5)}, step=0, timestamp=0.0)
+    sink.close(5)
+    assert [record[0] for record in sink.records] == ["k0", "k1", "k2"]
+    assert sink.stats()["dropped"] == 2
@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+import api
+from model_loading import LoadedModel
+
+
+class RecordingModel:
+    """A predikció a sepal_length egész része, így minden sor azonosítható; a batch méreteket rögzíti."""
+
+    def __init__(self, error=None):
+        self.batch_sizes = []
+        self.error = error
+
+    def predict(self, data):
+        self.batch_sizes.append(len(data))
+        if self.error is not None:
+            raise self.error
+        return np.asarray(data)[:, 0].astype(int)
+
+
+class StubHolder:
+    def __init__(self, model):
+        self.loaded = LoadedModel(model, "5", "stage", "models:/IrisDecisionTree/5", 0.0, 0.0, "default", 0.0)
+
+    def get(self):
+        return self.loaded
+
+
+def run_concurrently(model, rows, max_batch_size, max_wait_ms=200):
+    async def scenario():
+        batcher = api.MicroBatcher(StubHolder(model), max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(row) for row in rows), return_exceptions=True), batcher
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_rows_are_coalesced_up_to_max_size():
+    model = RecordingModel()
+    rows = [(float(i), 3.0, 1.4, 0.2) for i in range(10)]
+    results, batcher = run_concurrently(model, rows, max_batch_size=4)
+    assert model.batch_sizes == [4, 4, 2]
+    assert batcher.stats()["batch_size_histogram"] == {"2": 1, "4": 2}
+    assert batcher.stats()["requests"] == len(rows)
+    # Minden hívó a saját sorának predikcióját kapja
+    assert results == [(i, "5") for i in range(10)]
+
+
+def test_model_error_reaches_every_waiting_caller():
+    error = RuntimeError("model exploded")
+    model = RecordingModel(error)
+    results, _ = run_concurrently(model, [(float(i), 3.0, 1.4, 0.2) for i in range(6)], max_batch_size=3)
+    assert model.batch_sizes == [3, 3]
+    assert all(result is error for result in results)
+
+
+def test_batcher_keeps_serving_after_a_failed_batch():
+    class FailOnce(RecordingModel):
+        def predict(self, data):
+            if not self.batch_sizes:
+                self.batch_sizes.append(len(data))
+                raise ValueError("first batch fails")
+            return super().predict(data)
+
+    async def scenario():
+        batcher = api.MicroBatcher(StubHolder(FailOnce()), max_batch_size=2, max_wait_ms=50)
+        batcher.start()
+        try:
+            with pytest.raises(ValueError):
+                await batcher.submit((1.0, 3.0, 1.4, 0.2))
+            return await batcher.submit((4.0, 3.0, 1.4, 0.2))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) == (4, "5")
+
+
+def test_stop_fails_queued_and_in_flight_callers():
+    class SlowModel(RecordingModel):
+        def predict(self, data):
+            time.sleep(0.3)
+            return super().predict(data)
+
+    async def scenario():
+        model = SlowModel()
+        batcher = api.MicroBatcher(StubHolder(model), max_batch_size=2, max_wait_ms=10)
+        batcher.start()
+        calls = [asyncio.ensure_future(batcher.submit((float(i), 3.0, 1.4, 0.2))) for i in range(5)]
+        # Az első batch a modellben van, a többi sor a sorban vár
+        while not model.batch_sizes:
+            await asyncio.sleep(0.01)
+        await batcher.stop()
+        results = await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 1)
+        with pytest.raises(RuntimeError):
+            await batcher.submit((1.0, 3.0, 1.4, 0.2))
+        return model, results
+
+    model, results = asyncio.run(scenario())
+    assert model.batch_sizes == [2]
+    # A futó batch hívói a saját predikciójukat vagy leállítási hibát kapnak, a sorban állók hibát;
+    # egyik hívó sem marad válasz nélkül
+    assert all(result == (i, "5") or isinstance(result, RuntimeError) for i, result in enumerate(results[:2]))
+    assert all(isinstance(result, RuntimeError) and "stopped" in str(result) for result in results[2:])
@@ -0,0 +1,139 @@
+import os
+
+import pytest
+
+import iris_ml_pipeline
+from iris_ml_pipeline import Pipeline, Step
+
+
+class StubSteps:
+    """Két lépés ("prepare" -> "report") állítható bemenettel, futásszámlálással és verify-jal."""
+
+    def __init__(self):
+        self.inputs = {"prepare": {"data": "v1"}, "report": {"threshold": 0.2}}
+        self.runs = []
+        self.valid = True
+        self.fail = set()
+
+    def step(self, name, depends_on=()):
+        def run(upstream, step_fingerprint):
+            self.runs.append(name)
+            if name in self.fail:
+                raise RuntimeError(f"{name} failed")
+            return {"value": f"{name}-{len(self.runs)}", "upstream": upstream}
+
+        return Step(name, run, lambda upstream: self.inputs[name], depends_on=depends_on,
+                    verify=lambda outputs: self.valid)
+
+    def pipeline(self, tmp_path):
+        return Pipeline([self.step("prepare"), self.step("report", depends_on=["prepare"])],
+                        state_path=str(tmp_path / "state.json"))
+
+
+@pytest.fixture
+def stubs():
+    return StubSteps()
+
+
+def statuses(reports):
+    return [(report["step"], report["status"]) for report in reports]
+
+
+def test_unchanged_fingerprint_skips(stubs, tmp_path):
+    pipeline = stubs.pipeline(tmp_path)
+    first = pipeline.run()
+    assert statuses(first) == [("prepare", "ran"), ("report", "ran")]
+    second = pipeline.run()
+    assert statuses(second) == [("prepare", "skipped"), ("report", "skipped")]
+    assert stubs.runs == ["prepare", "report"]
+    # A kimaradt lépés az előző kimeneteit adja tovább
+    assert [report["outputs"] for report in second] == [report["outputs"] for report in first]
+
+
+def test_changed_input_reruns_the_step_and_its_dependents(stubs, tmp_path):
+    pipeline = stubs.pipeline(tmp_path)
+    pipeline.run()
+    stubs.inputs["report"] = {"threshold": 0.1}
+    assert statuses(pipeline.run()) == [("prepare", "skipped"), ("report", "ran")]
+    # Az upstream lépés új kimenete a függő lépés ujjlenyomatát is megváltoztatja
+    stubs.inputs["prepare"] = {"data": "v2"}
+    assert statuses(pipeline.run()) == [("prepare", "ran"), ("report", "ran")]
+    assert stubs.runs == ["prepare", "report", "report", "prepare", "report"]
+
+
+def test_failing_verify_reruns(stubs, tmp_path):
+    pipeline = stubs.pipeline(tmp_path)
+    pipeline.run()
+    stubs.valid = False
+    assert statuses(pipeline.run(only=["prepare"])) == [("prepare", "ran")]
+
+
+def test_force_reruns_every_step(stubs, tmp_path, monkeypatch):
+    pipeline = stubs.pipeline(tmp_path)
+    pipeline.run()
+    monkeypatch.setattr(iris_ml_pipeline, "PIPELINE", pipeline)
+    assert iris_ml_pipeline.main(["--state", pipeline.state_path]) == 0
+    assert stubs.runs == ["prepare", "report"]
+    assert iris_ml_pipeline.main(["--force", "--state", pipeline.state_path]) == 0
+    assert stubs.runs == ["prepare", "report"] * 2
+
+
+def test_failure_blocks_downstream_steps(stubs, tmp_path, monkeypatch):
+    pipeline = stubs.pipeline(tmp_path)
+    stubs.fail.add("prepare")
+    reports = pipeline.run()
+    assert statuses(reports) == [("prepare", "failed"), ("report", "blocked")]
+    assert reports[0]["error"] == "RuntimeError: prepare failed"
+    assert stubs.runs == ["prepare"]
+    # A sikertelen lépés nem kerül az állapotba, így a következő futás újra megpróbálja
+    stubs.fail.clear()
+    assert statuses(pipeline.run()) == [("prepare", "ran"), ("report", "ran")]
+
+    # A parancssori futás kilépési kódja hibánál 1
+    stubs.fail.add("report")
+    stubs.inputs["report"] = {"threshold": 0.3}
+    monkeypatch.setattr(iris_ml_pipeline, "PIPELINE", pipeline)
+    assert iris_ml_pipeline.main(["--state", pipeline.state_path]) == 1
+
+
+def test_training_fingerprint_covers_train_model_and_export_modules(tmp_path, monkeypatch):
+    source = open(os.path.join(iris_ml_pipeline.SRC_DIR, "api.py")).read()
+    monkeypatch.setattr(iris_ml_pipeline, "SRC_DIR", str(tmp_path))
+    (tmp_path / "api.py").write_text(source)
+    before = iris_ml_pipeline.function_version("api.py", "train_model")
+    # Kiszolgálási módosítás: a tanítás ujjlenyomata nem változik
+    (tmp_path / "api.py").write_text(source.replace('@app.get("/healthz")', '@app.get("/livez")'))
+    assert iris_ml_pipeline.function_version("api.py", "train_model") == before
+    (tmp_path / "api.py").write_text(source.replace("DecisionTreeClassifier(random_state=42)",
+                                                    "DecisionTreeClassifier(random_state=7)"))
+    assert iris_ml_pipeline.function_version("api.py", "train_model") != before
+
+    monkeypatch.undo()
+    code = iris_ml_pipeline.training_inputs({})["code"]
+    assert {"api.py:train_model", "compact_model.py", "tree_engine.py", "model_loading.py"} <= set(code)
+    assert "api.py" not in code
+
+
+def test_skip_requires_the_recorded_run_and_version(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    from mlflow.store.model_registry.file_store import FileStore as RegistryStore
+    from mlflow.store.tracking.file_store import FileStore as TrackingStore
+    import model_loading
+
+    mlruns = str(tmp_path / "mlruns")
+    tracking = TrackingStore(mlruns)
+    run = tracking.create_run(tracking.create_experiment("pipeline"), "test", 0, [], "train")
+    registry = RegistryStore(mlruns)
+    registry.create_registered_model(model_loading.MODEL_NAME)
+    version = registry.create_model_version(model_loading.MODEL_NAME, f"file://{tmp_path}", run_id=run.info.run_id)
+    monkeypatch.setattr(model_loading, "REGISTRY_INDEX_MLRUNS", mlruns)
+
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(b"model")
+    outputs = {"run_id": run.info.run_id, "version": version.version, "local_model_path": str(model_path),
+               "local_model_mtime_ns": os.stat(model_path).st_mtime_ns}
+    assert iris_ml_pipeline.verify_training(outputs)
+    assert not iris_ml_pipeline.verify_training(dict(outputs, run_id="0" * 32))
+    # A gc által törölt verzió után a tanítás újra fut
+    registry.delete_model_version(model_loading.MODEL_NAME, version.version)
+    assert not iris_ml_pipeline.verify_training(outputs)
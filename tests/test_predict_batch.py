@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+ROWS = np.random.default_rng(1).uniform([4, 2, 1, 0.1], [8, 4.5, 7, 2.5], size=(200, 4))
+
+
+@pytest.fixture(scope="module")
+def client(served_model):
+    with TestClient(api.app) as client:
+        yield client
+
+
+def as_rows(rows):
+    return [dict(zip(api.FEATURE_NAMES, map(float, row))) for row in rows]
+
+
+def test_predictions_keep_input_order_and_size(client, served_model):
+    response = client.post("/predict/batch", json={"rows": as_rows(ROWS)})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["model_version"] == api.model_holder.version
+    assert body["predictions"] == served_model.predict(ROWS).tolist()
+    assert len(set(body["predictions"])) > 1
+
+    # Oszloponként ugyanaz, és minden sor egyenként is ugyanazt adja
+    columns = {name: ROWS[:, i].tolist() for i, name in enumerate(api.FEATURE_NAMES)}
+    assert client.post("/predict/batch", json={"columns": columns}).json()["predictions"] == body["predictions"]
+    single = [client.post("/predict", json=row).json()["prediction"] for row in as_rows(ROWS[:20])]
+    assert single == body["predictions"][:20]
+
+
+def test_probabilities_match_rows(client, served_model):
+    body = client.post("/predict/batch", json={"rows": as_rows(ROWS[:5]), "return_proba": True}).json()
+    assert len(body["probabilities"]) == 5
+    np.testing.assert_allclose(body["probabilities"], served_model.predict_proba(ROWS[:5]))
+
+
+def test_empty_batch_returns_no_predictions(client):
+    body = client.post("/predict/batch", json={"rows": []}).json()
+    assert body["predictions"] == []
+
+
+def test_batch_above_max_size_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_BATCH_SIZE", 10)
+    assert client.post("/predict/batch", json={"rows": as_rows(ROWS[:10])}).status_code == 200
+    response = client.post("/predict/batch", json={"rows": as_rows(ROWS[:11])})
+    assert response.status_code == 413
+    assert "11" in response.json()["error"]
+
+
+@pytest.mark.parametrize("body", [
+    {"rows": [{"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4}]},
+    {"rows": [[5.1, 3.5, 1.4, 0.2]]},
+    {"columns": {"sepal_length": [5.1, 6.0], "sepal_width": [3.5], "petal_length": [1.4], "petal_width": [0.2]}},
+    {"rows": as_rows(ROWS[:1]), "columns": {name: [1.0] for name in api.FEATURE_NAMES}},
+    {},
+])
+def test_malformed_batch_is_rejected(client, body):
+    response = client.post("/predict/batch", json=body)
+    assert 400 <= response.status_code < 500
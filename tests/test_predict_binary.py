@@ -0,0 +1,75 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+ROWS = np.random.default_rng(0).uniform([4, 2, 1, 0.1], [8, 4.5, 7, 2.5], size=(50, 4)).astype("<f4")
+
+
+@pytest.fixture(scope="module")
+def client(served_model):
+    with TestClient(api.app) as client:
+        yield client
+
+
+def arrow_stream(batch):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def post_binary(client, body, content_type=api.BINARY_CONTENT_TYPE):
+    return client.post("/predict/binary", content=body, headers={"Content-Type": content_type})
+
+
+def batch_predictions(client, rows):
+    rows = [dict(zip(api.FEATURE_NAMES, map(float, row))) for row in rows]
+    return client.post("/predict/batch", json={"rows": rows}).json()["predictions"]
+
+
+def test_float32_round_trip_matches_predict_batch(client):
+    response = post_binary(client, ROWS.tobytes())
+    assert response.status_code == 200
+    assert response.headers["content-type"] == api.BINARY_CONTENT_TYPE
+    assert response.headers["x-model-version"] == str(api.model_holder.version)
+    predictions = np.frombuffer(response.content, dtype=np.uint8)
+    assert predictions.tolist() == batch_predictions(client, ROWS)
+
+
+def test_body_length_not_a_multiple_of_a_row_is_rejected(client):
+    response = post_binary(client, ROWS.tobytes()[:-3])
+    assert response.status_code == 400
+    assert "multiple of 16 bytes" in response.json()["error"]
+
+
+def test_wrong_content_type_is_rejected(client):
+    response = post_binary(client, ROWS.tobytes(), content_type="application/json")
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("layout", ["fixed_size_list", "columns"])
+def test_arrow_inputs_match_predict_batch(client, layout):
+    if layout == "fixed_size_list":
+        values = pa.array(ROWS.ravel(), type=pa.float32())
+        batch = pa.record_batch([pa.FixedSizeListArray.from_arrays(values, len(api.FEATURE_NAMES))], names=["x"])
+    else:
+        # Más oszlopsorrend és egy extra oszlop: a nevek számítanak
+        columns = {name: pa.array(ROWS[:, i].astype(np.float64)) for i, name in enumerate(api.FEATURE_NAMES)}
+        columns["request_id"] = pa.array(range(len(ROWS)))
+        batch = pa.record_batch(list(columns.values())[::-1], names=list(columns)[::-1])
+    response = post_binary(client, arrow_stream(batch), api.ARROW_STREAM_CONTENT_TYPE)
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.field("prediction").type == pa.uint8()
+    assert table.column("prediction").to_pylist() == batch_predictions(client, ROWS)
+
+
+def test_more_than_max_batch_size_rows_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_BATCH_SIZE", 10)
+    assert post_binary(client, ROWS[:10].tobytes()).status_code == 200
+    response = post_binary(client, ROWS[:11].tobytes())
+    assert response.status_code == 413
+    assert "11" in response.json()["error"]
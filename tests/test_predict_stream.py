@@ -0,0 +1,104 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+import api
+
+LINE = b'{"sepal_length": 6.3, "sepal_width": 2.9, "petal_length": 5.6, "petal_width": 1.8}\n'
+
+
+@pytest.fixture(scope="module")
+def server(served_model):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield port
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+def test_half_duplex_client_large_upload_buffered(server):
+    # Az http.client félduplex: a teljes törzset elküldi, és csak utána olvas. Ekkora
+    # feltöltésnél a válasz bőven túllépi a socket puffereket; buffered=true-val sem akadhat el.
+    lines = 200_000
+    connection = http.client.HTTPConnection("127.0.0.1", server, timeout=120)
+    connection.request("POST", "/predict/stream?buffered=true", body=LINE * lines,
+                       headers={"Content-Type": "application/x-ndjson"})
+    response = connection.getresponse()
+    assert response.status == 200
+    results = response.read().splitlines()
+    connection.close()
+    assert len(results) == lines
+    assert json.loads(results[-1]) == {"line": lines, "prediction": 2}
+
+
+def test_duplex_stream_answers_before_upload_ends(server):
+    # Chunked feltöltés: az első darab eredményének a feltöltés vége előtt meg kell érkeznie
+    sock = socket.create_connection(("127.0.0.1", server), timeout=30)
+    sock.sendall(b"POST /predict/stream HTTP/1.1\r\nHost: test\r\nTransfer-Encoding: chunked\r\n"
+                 b"Content-Type: application/x-ndjson\r\n\r\n")
+
+    def send_chunk(data):
+        sock.sendall(b"%x\r\n" % len(data) + data + b"\r\n")
+
+    send_chunk(LINE * api.STREAM_CHUNK_ROWS)
+    received = b""
+    while b'"line": 1,' not in received:
+        data = sock.recv(65536)
+        assert data, "connection closed before the first result"
+        received += data
+    assert received.startswith(b"HTTP/1.1 200")
+    send_chunk(LINE)
+    sock.sendall(b"0\r\n\r\n")
+    while not received.endswith(b"0\r\n\r\n"):
+        data = sock.recv(65536)
+        assert data
+        received += data
+    sock.close()
+    assert f'"line": {api.STREAM_CHUNK_ROWS + 1},'.encode() in received
+
+
+def test_buffered_stream_rejects_oversized_upload_early(served_model, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_BUFFERED_MAX_BYTES", 10 * len(LINE))
+    scored = []
+    monkeypatch.setattr(api, "spool_stream_chunk", lambda spool, pending: scored.append(pending))
+    with TestClient(api.app) as client:
+        # Ismert Content-Length: olvasás előtt
+        assert client.post("/predict/stream?buffered=true", content=LINE * 11).status_code == 413
+        # Chunked feltöltés: amint a beolvasott bájtok túllépik a korlátot
+        body = (LINE for _ in range(1000))
+        assert client.post("/predict/stream?buffered=true", content=body).status_code == 413
+        assert client.post("/predict/stream", content=LINE * 11).status_code == 200
+    assert scored == []
+
+
+def test_model_load_failure_mid_stream(served_model, monkeypatch):
+    calls = []
+    loaded = api.model_holder.get()
+
+    def failing_get():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("registry unavailable")
+        return loaded
+
+    monkeypatch.setattr(api.model_holder, "get", failing_get)
+    with TestClient(api.app) as client:
+        response = client.post("/predict/stream", content=LINE * 3 + b"not json\n")
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["line"] for result in results] == [1, 2, 3, 4]
+    assert all("registry unavailable" in result["error"] for result in results[:3])
+    assert "Invalid JSON" in results[3]["error"]
@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+@pytest.fixture
+def cached_client(served_model, monkeypatch):
+    monkeypatch.setattr(api, "PREDICTION_CACHE_ENABLED", True)
+    monkeypatch.setattr(api, "prediction_cache", api.PredictionCache())
+    client = TestClient(api.app)
+    yield client
+    api.profiler.stop()
+
+
+def test_cache_hits_are_counted_as_served(cached_client):
+    api.model_holder.get()
+    before = {source: api.served_by_source.value(source) for source in ("local", "cache")}
+    first = cached_client.post("/predict", json=ROW).json()
+    second = cached_client.post("/predict", json=ROW).json()
+    assert first == second
+    assert api.served_by_source.value("local") - before["local"] == 1
+    assert api.served_by_source.value("cache") - before["cache"] == 1
+    stats = cached_client.get("/predict/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert 'iris_predictions_by_source_total{source="cache"}' in cached_client.get("/metrics").text
+
+
+def test_lru_evicts_least_recently_used():
+    cache = api.PredictionCache(max_entries=2, ttl_seconds=0)
+    cache.put("1", (1.0,), 0)
+    cache.put("1", (2.0,), 1)
+    assert cache.get("1", (1.0,)) == 0
+    cache.put("1", (3.0,), 2)
+    assert cache.get("1", (2.0,)) is None
+    assert (cache.get("1", (1.0,)), cache.get("1", (3.0,))) == (0, 2)
+    assert cache.evictions == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(api.time, "monotonic", lambda: now[0])
+    cache = api.PredictionCache(ttl_seconds=10)
+    cache.put("1", (1.0,), 0)
+    now[0] += 9
+    assert cache.get("1", (1.0,)) == 0
+    now[0] += 2
+    assert cache.get("1", (1.0,)) is None
+    assert cache.expirations == 1
+
+
+def test_new_model_version_invalidates_entries():
+    cache = api.PredictionCache()
+    cache.put("1", (1.0,), 0)
+    assert cache.get("2", (1.0,)) is None
+    assert cache.invalidations == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_rounding_shares_entries_between_close_rows():
+    cache = api.PredictionCache(round_digits=2)
+    cache.put("1", (5.1001, 3.5), 0)
+    assert cache.get("1", (5.0999, 3.5)) == 0
+
+
+def test_byte_budget_caps_entries():
+    cache = api.PredictionCache(max_entries=1000, max_bytes=10 * api.PredictionCache.ENTRY_BYTES)
+    assert cache.max_entries == 10
@@ -0,0 +1,116 @@
+import glob
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from prediction_log import FAILED_SUFFIX, OPEN_SUFFIX, LogCursor, PredictionLogger, read_predictions
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def make_batch(ts):
+    ts = np.asarray(ts, dtype=np.float64)
+    n = len(ts)
+    return {"ts": ts, "endpoint": np.array(["/predict"] * n, dtype=object),
+            "model_version": np.array(["1"] * n, dtype=object),
+            "features": np.ones((n, 4), dtype=np.float32), "prediction": np.zeros(n, dtype=np.int16),
+            "latency_ms": np.ones(n, dtype=np.float32)}
+
+
+class FailingWriter:
+    """A valódi writer, amely a következő írásnál félig ír, majd hibát dob; a lezárást figyeli."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.closed = False
+
+    def write(self, data):
+        self.writer.write(data[:len(data) // 2])
+        self.writer.flush()
+        raise OSError("disk full")
+
+    def write_table(self, table):
+        raise OSError("disk full")
+
+    def close(self):
+        self.closed = True
+        self.writer.close()
+
+
+def test_write_error_closes_and_keeps_written_ndjson_rows(tmp_path):
+    logger = PredictionLogger(str(tmp_path), file_format="ndjson")
+    logger._write(make_batch([10.0, 11.0]))
+    failing = logger._file["writer"] = FailingWriter(logger._file["writer"])
+    logger._take = lambda: make_batch([12.0, 13.0, 14.0])
+    logger._flush()
+
+    assert failing.closed and logger._file is None
+    assert (logger.write_errors, logger.dropped) == (1, 3)
+    assert not glob.glob(os.path.join(str(tmp_path), "*" + OPEN_SUFFIX))
+    [path] = glob.glob(os.path.join(str(tmp_path), "predictions-*"))
+    assert os.path.basename(path).startswith("predictions-0000000010000-0000000011000-")
+    assert read_predictions(str(tmp_path))["ts"].tolist() == [10.0, 11.0]
+
+
+def test_write_error_quarantines_the_parquet_file(tmp_path):
+    logger = PredictionLogger(str(tmp_path), file_format="parquet")
+    logger._write(make_batch([10.0, 11.0]))
+    failing = logger._file["writer"] = FailingWriter(logger._file["writer"])
+    logger._take = lambda: make_batch([12.0, 13.0, 14.0])
+    logger._flush()
+
+    assert failing.closed and logger._file is None
+    assert (logger.write_errors, logger.dropped, logger.quarantined, logger.files) == (1, 3, 2, 0)
+    [path] = glob.glob(os.path.join(str(tmp_path), "predictions-*"))
+    assert path.endswith(".parquet" + FAILED_SUFFIX)
+    # Az olvasók a karanténba került fájlt kihagyják; a következő batch új fájlba kerül
+    assert read_predictions(str(tmp_path)).empty
+    assert LogCursor().read_new(str(tmp_path)).empty
+    logger._write(make_batch([15.0]))
+    logger._rotate()
+    assert read_predictions(str(tmp_path))["ts"].tolist() == [15.0]
+
+
+def test_write_error_on_first_batch_removes_partial_file(tmp_path):
+    logger = PredictionLogger(str(tmp_path), file_format="ndjson")
+    logger._open(10.0)
+    logger._file["writer"] = FailingWriter(open(logger._file["path"], "ab"))
+    logger._take = lambda: make_batch([10.0])
+    logger._flush()
+    assert logger._file is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_file_name_uses_batch_min_max_ts(tmp_path):
+    logger = PredictionLogger(str(tmp_path), file_format="ndjson")
+    logger._write(make_batch([5.0, 3.0, 4.0]))
+    logger._write(make_batch([7.0, 6.0]))
+    logger._rotate()
+    [name] = os.listdir(str(tmp_path))
+    assert name.startswith("predictions-0000000003000-0000000007000-")
+
+
+def test_cursor_counts_open_parquet_until_rotation(tmp_path):
+    logger = PredictionLogger(str(tmp_path), file_format="parquet")
+    logger._write(make_batch([10.0, 11.0]))
+    cursor = LogCursor()
+    assert len(cursor.read_new(str(tmp_path))) == 0
+    assert cursor.pending_open == 1
+    logger._rotate()
+    assert cursor.read_new(str(tmp_path))["ts"].tolist() == [10.0, 11.0]
+    assert cursor.pending_open == 0
+
+
+@pytest.mark.parametrize("env, expected", [({}, 3600.0), ({"DRIFT_MONITORING_ENABLED": "true"}, 300.0),
+                                           ({"DRIFT_MONITORING_ENABLED": "true", "DRIFT_BUCKET_SECONDS": "60"}, 60.0),
+                                           ({"DRIFT_MONITORING_ENABLED": "true",
+                                             "PREDICTION_LOG_ROTATE_SECONDS": "900"}, 900.0)])
+def test_drift_monitoring_lowers_default_rotation(env, expected):
+    base = {key: value for key, value in os.environ.items()
+            if key not in ("DRIFT_MONITORING_ENABLED", "DRIFT_BUCKET_SECONDS", "PREDICTION_LOG_ROTATE_SECONDS")}
+    completed = subprocess.run([sys.executable, "-c", "import api; print(api.PREDICTION_LOG_ROTATE_SECONDS)"],
+                               cwd=SRC_DIR, env={**base, **env}, capture_output=True, text=True, check=True)
+    assert float(completed.stdout.strip().splitlines()[-1]) == expected
@@ -0,0 +1,81 @@
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from observability import Registry, WorkerMetrics, merge_families
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_merge_keeps_one_header_per_metric():
+    snapshots = []
+    for pid in (101, 102):
+        registry = Registry()
+        requests = registry.counter("iris_requests_total", "Requests", ["path"])
+        requests.inc("/predict", amount=pid)
+        registry.histogram("iris_seconds", "Latency", buckets=(1.0,)).observe(0.5)
+        snapshots.append(registry.families([("worker_pid", pid)]))
+    text = merge_families(snapshots)
+    assert text.count("# TYPE iris_requests_total counter") == 1
+    assert text.count("# TYPE iris_seconds histogram") == 1
+    assert 'iris_requests_total{worker_pid="101",path="/predict"} 101' in text
+    assert 'iris_requests_total{worker_pid="102",path="/predict"} 102' in text
+    assert 'iris_seconds_bucket{worker_pid="102",le="+Inf"} 1' in text
+    # A TYPE után a metrika összes mintája következik, más metrika nem ékelődik közé
+    lines = text.splitlines()
+    start = lines.index("# TYPE iris_requests_total counter")
+    assert all(line.startswith("iris_requests_total{") for line in lines[start + 1:start + 3])
+
+
+def test_worker_metrics_reads_other_workers(tmp_path):
+    other = Registry()
+    other.counter("iris_errors_total", "Errors", ["type"]).inc("internal")
+    (tmp_path / "999999.json").write_text(json.dumps(other.families([("worker_pid", 999999)])))
+    (tmp_path / "broken.json").write_text("{")
+    registry = Registry()
+    registry.counter("iris_errors_total", "Errors", ["type"]).inc("validation")
+    worker = WorkerMetrics(registry, str(tmp_path))
+    worker.start()
+    try:
+        text = worker.render()
+        assert os.path.exists(worker.path)
+    finally:
+        worker.stop()
+    assert f'iris_errors_total{{worker_pid="{os.getpid()}",type="validation"}} 1' in text
+    assert 'iris_errors_total{worker_pid="999999",type="internal"} 1' in text
+    assert not os.path.exists(worker.path)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork_server.py requires os.fork()")
+def test_prefork_metrics_cover_every_worker(served_model):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ, PREFORK_METRICS_SECONDS="0.2", MODEL_REFRESH_SECONDS="0")
+    process = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, "prefork_server.py"), "--port", str(port),
+                                "--workers", "2", "--log-level", "warning"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        pids = set()
+        while len(pids) < 2 and time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(base + "/metrics", timeout=5) as response:
+                    pids = set(re.findall(r'worker_pid="(\d+)"', response.read().decode()))
+            except OSError:
+                pass
+            time.sleep(0.2)
+        assert len(pids) == 2
+        with urllib.request.urlopen(base + "/predict/cache/stats", timeout=5) as response:
+            assert str(json.load(response)["worker_pid"]) in pids
+    finally:
+        process.terminate()
+        process.wait(timeout=40)
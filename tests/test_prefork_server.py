@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import api
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+ROW = {"sepal_length": 5.1, "sepal_width": 3.5, "petal_length": 1.4, "petal_width": 0.2}
+
+
+def status(url, body=None):
+    request = urllib.request.Request(url, data=json.dumps(body).encode() if body else None,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def wait_for(predicate, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.2)
+    return False
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork_server.py requires os.fork()")
+def test_serve_survives_an_unresolvable_model(served_model, tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    model_path = str(tmp_path / "iris_model.pkl")
+    # Nincs pickle, és a registry üres: a modell nem oldható fel
+    env = dict(os.environ, LOCAL_MODEL_PATH=model_path, MLFLOW_TRACKING_URI=f"sqlite:///{tmp_path / 'mlflow.db'}",
+               PREFORK_LOAD_RETRY_SECONDS="0.5", MODEL_REFRESH_SECONDS="0")
+    process = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, "prefork_server.py"), "--port", str(port),
+                                "--workers", "2", "--log-level", "warning"], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        assert wait_for(lambda: status(base + "/healthz") == 200)
+        assert status(base + "/readyz") == 503
+        assert status(base + "/predict", ROW) == 500
+        assert process.poll() is None
+
+        # A master újrapróbálja a betöltést, és sikerkor új worker generációt indít
+        shutil.copy(api.LOCAL_MODEL_PATH, model_path)
+        assert wait_for(lambda: status(base + "/readyz") == 200 and status(base + "/predict", ROW) == 200)
+    finally:
+        process.terminate()
+        process.wait(timeout=40)
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from registry_index import RegistryIndex
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")
+    from mlflow.store.model_registry.file_store import FileStore
+
+    store = FileStore(str(tmp_path / "mlruns"))
+    store.create_registered_model("IrisDecisionTree")
+    return store
+
+
+def add_version(store, tmp_path):
+    source = tmp_path / f"model-{len(os.listdir(tmp_path))}"
+    source.mkdir()
+    return store.create_model_version("IrisDecisionTree", f"file://{source}", run_id=None).version
+
+
+def test_resolve_refresh_skips_versions_until_registry_changes(store, tmp_path, monkeypatch):
+    index = RegistryIndex(str(tmp_path / "mlruns"))
+    for _ in range(3):
+        add_version(store, tmp_path)
+    assert index.refresh(runs=False)["changed"] == 3
+
+    scan = index._scan
+    scans = []
+    monkeypatch.setattr(index, "_scan", lambda runs=True: scans.append(runs) or scan(runs))
+    assert index.refresh(runs=False).get("skipped")
+    assert scans == []
+
+    store.transition_model_version_stage("IrisDecisionTree", "2", "Production", False)
+    result = index.refresh(runs=False)
+    assert not result.get("skipped") and result["changed"] == 1
+    assert index.lookup("IrisDecisionTree", "Production")["version"] == 2
+
+    version = add_version(store, tmp_path)
+    assert not index.refresh(runs=False).get("skipped")
+    assert index.lookup("IrisDecisionTree")["version"] == int(version)
+
+    store.delete_model_version("IrisDecisionTree", version)
+    assert not index.refresh(runs=False).get("skipped")
+    assert index.lookup("IrisDecisionTree")["version"] == 3
+    assert index.refresh(runs=False).get("skipped")
+    assert len(scans) == 3
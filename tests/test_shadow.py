@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+import pytest
+
+import api
+from model_loading import LoadedModel
+
+ROWS = np.array([[5.1, 3.5, 1.4, 0.2], [6.2, 2.9, 4.3, 1.3], [7.7, 3.0, 6.1, 2.3], [5.0, 3.4, 1.5, 0.2]])
+
+
+class PetalModel:
+    """Challenger: 0, ha a petal_length < 2.5, különben 2."""
+
+    def predict(self, data):
+        return np.where(np.asarray(data)[:, 2] < 2.5, 0, 2)
+
+
+class StubHolder:
+    def __init__(self, model=None):
+        self.current = LoadedModel(model, "7", "stage", "models:/IrisDecisionTree/7", 0.0, 0.0, "default", 0.0) \
+            if model is not None else None
+
+    def info(self):
+        return {"loaded": self.current is not None}
+
+
+@pytest.fixture
+def scorers():
+    started = []
+
+    def make(holder, **kwargs):
+        scorer = api.ShadowScorer(holder, **kwargs)
+        started.append(scorer)
+        return scorer
+
+    yield make
+    for scorer in started:
+        scorer.stop()
+
+
+def wait_for_rows(scorer, rows, timeout=5):
+    deadline = time.monotonic() + timeout
+    while sum(scorer.stats()["rows"].values()) < rows and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return scorer.stats()
+
+
+def test_full_queue_sheds_without_blocking(scorers):
+    # A háttérszál nem fut, így a sor nem ürül
+    scorer = scorers(StubHolder(PetalModel()), queue_size=2)
+    before = api.shadow_rows.value("shed")
+    started = time.perf_counter()
+    accepted = [scorer.submit(ROWS[:2], [0, 1], "3") for _ in range(5)]
+    assert time.perf_counter() - started < 0.5
+    assert accepted == [True, True, False, False, False]
+    stats = scorer.stats()
+    assert (stats["queue_depth"], stats["rows"]["shed"]) == (2, 6)
+    assert api.shadow_rows.value("shed") - before == 6
+
+
+def test_agreement_counts_and_disagreement_samples(scorers):
+    scorer = scorers(StubHolder(PetalModel()), sample_size=10)
+    scorer.start()
+    # A kiszolgált predikciók a 2. sorban (1 vs 2) és a 4. sorban (2 vs 0) térnek el
+    scorer.submit(ROWS[:2], [0, 1], "3")
+    scorer.submit(ROWS[2:], [2, 2], "4")
+    stats = wait_for_rows(scorer, len(ROWS))
+    assert stats["rows"]["agree"] == 2
+    assert stats["rows"]["disagree"] == 2
+    assert stats["agreement_rate"] == 0.5
+    samples = sorted(stats["disagreement_samples"], key=lambda sample: sample["features"])
+    assert [(s["features"], s["primary"], s["challenger"], s["primary_version"]) for s in samples] == [
+        (ROWS[3].tolist(), 2, 0, "4"), (ROWS[1].tolist(), 1, 2, "3")]
+    assert {s["challenger_version"] for s in samples} == {"7"}
+
+
+def test_rows_are_unavailable_until_challenger_is_loaded(scorers):
+    holder = StubHolder()
+    scorer = scorers(holder)
+    scorer.start()
+    scorer.submit(ROWS, [0, 1, 2, 0], "3")
+    stats = wait_for_rows(scorer, len(ROWS))
+    assert stats["rows"]["unavailable"] == len(ROWS)
+    assert stats["compared"] == 0 and stats["agreement_rate"] is None
+
+    holder.current = StubHolder(PetalModel()).current
+    scorer.submit(ROWS, [0, 2, 2, 0], "3")
+    stats = wait_for_rows(scorer, 2 * len(ROWS))
+    assert (stats["rows"]["unavailable"], stats["rows"]["agree"]) == (len(ROWS), len(ROWS))
+
+
+def test_managed_holder_does_not_load_on_start():
+    # Pre-fork workerben a challenger-t a master tölti be; a worker holdere nem tölthet be sajátot
+    holder = api.ModelHolder(api.MODEL_NAME, api.SHADOW_STAGE, local_path=None, version="1", fallback_latest=False)
+    holder.managed = True
+    holder.start()
+    assert holder._thread is None and holder.current is None
@@ -0,0 +1,17 @@
+import os
+
+import startup_timing
+
+BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "800"))
+
+
+def test_import_api_skips_mlflow_and_fits_budget():
+    report = startup_timing.measure(repeat=3, load_model=False, forbidden=("mlflow",))
+    assert report["forbidden_modules"] == []
+    assert report["median"]["import_seconds"] * 1000 <= BUDGET_MS
+
+
+def test_cold_start_serves_local_model(served_model):
+    report = startup_timing.measure(repeat=1, load_model=True, forbidden=("mlflow",))
+    assert report["forbidden_modules"] == []
+    assert report["model_source"] == "local"
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+from supervisor import Service, Supervisor
+
+
+def stub(code):
+    return [sys.executable, "-c", code]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(supervisor, until, timeout=30):
+    """A felügyelő futtatása, amíg az until() feltétel teljesül; utána leállítja."""
+    async def main():
+        runner = asyncio.create_task(supervisor.run())
+        deadline = time.monotonic() + timeout
+        while not until() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        supervisor.stop()
+        await runner
+
+    asyncio.run(main())
+
+
+def read_report(log_dir):
+    with open(os.path.join(log_dir, "startup_report.json")) as f:
+        return json.load(f)
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    supervisor = Supervisor([], backoff_initial=0.5, backoff_max=3.0)
+    assert [supervisor._backoff(n) for n in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_crashing_service_is_restarted_with_backoff_then_given_up(tmp_path):
+    supervisor = Supervisor([Service("crasher", stub("import sys; print('boom'); sys.exit(3)"))],
+                            log_dir=str(tmp_path), backoff_initial=0.2, backoff_max=0.4, crash_loop_count=4)
+    state = supervisor.states["crasher"]
+    started = time.monotonic()
+    run(supervisor, state.finished.is_set)
+
+    # 4. összeomlásnál feladja; előtte 0.2 + 0.4 + 0.4 s backoff-fal indult újra
+    assert (state.status, state.restarts, len(state.crashes)) == ("crash-loop", 3, 4)
+    assert time.monotonic() - started >= 1.0
+    assert "boom" in state.last_lines
+    with open(os.path.join(str(tmp_path), "crasher.log")) as f:
+        assert f.read().count("boom") == 4
+
+
+def test_report_is_written_when_a_service_never_becomes_ready(tmp_path):
+    services = [
+        Service("step", stub("print('done')"), oneshot=True),
+        Service("worker", stub("import time; time.sleep(60)")),
+        # Fut, de a ready_url soha nem válaszol (mint a /readyz sikertelen tanítás után)
+        Service("api", stub("import time; time.sleep(60)"), depends_on={"step": "finished"},
+                ready_url=f"http://127.0.0.1:{free_port()}/readyz", ready_timeout=0.5),
+        Service("broken", stub("import sys; sys.exit(1)"), oneshot=True),
+    ]
+    supervisor = Supervisor(services, log_dir=str(tmp_path))
+    report_path = os.path.join(str(tmp_path), "startup_report.json")
+    run(supervisor, lambda: os.path.exists(report_path))
+
+    report = read_report(str(tmp_path))
+    assert report["seconds_to_all_ready"] is not None
+    statuses = {name: entry["status"] for name, entry in report["services"].items()}
+    assert statuses == {"step": "completed", "worker": "ready", "api": "not-ready", "broken": "failed"}
+    assert report["services"]["api"]["seconds_to_ready"] is None
+    assert report["services"]["worker"]["seconds_to_ready"] is not None
+
+
+def test_dependent_starts_when_the_http_probe_succeeds(tmp_path):
+    port = free_port()
+    services = [
+        Service("server", [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1"],
+                ready_url=f"http://127.0.0.1:{port}/"),
+        Service("client", stub("print('started')"), depends_on={"server": "ready"}, oneshot=True),
+        Service("skipped", stub("print('never')"), depends_on={"broken": "ready"}),
+        Service("broken", stub("import sys; sys.exit(1)"), oneshot=True),
+    ]
+    supervisor = Supervisor(services, log_dir=str(tmp_path))
+    run(supervisor, lambda: os.path.exists(os.path.join(str(tmp_path), "startup_report.json")))
+
+    states = supervisor.states
+    assert (states["server"].status, states["client"].status, states["skipped"].status) == \
+        ("ready", "completed", "skipped")
+    assert states["client"].ready_at >= states["server"].ready_at
+    assert states["skipped"].process is None